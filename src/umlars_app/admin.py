@@ -1,8 +1,52 @@
 from django.contrib import admin
 
-from .models import UmlModel, UmlFile, UserAccessToModel
+from .models import UmlModel, UmlFile, UserAccessToModel, TranslationOutboxMessage, TranslationRequestOrigin, UserTranslationQuota, TranslationFanOut, TranslationPart, MessageBrokerQueueSnapshot, BrokerQueueMessage, UmlFileBlob, UmlModelSummary, UmlFileRevision
+from .utils.translation_utils import schedule_translate_uml_model
 
-admin.site.register(UmlModel)
-admin.site.register(UmlFile)
-admin.site.register(UserAccessToModel)
 
+@admin.action(description="Translate selected UML models")
+def translate_uml_models(modeladmin, request, queryset):
+    for model in queryset.defer("formatted_data"):
+        source_files_ids = set(model.source_files.values_list("id", flat=True))
+        schedule_translate_uml_model(request, model, source_files_ids, reset_files_status=True, origin=TranslationRequestOrigin.MASS_RETRANSLATION)
+    modeladmin.message_user(request, f"{queryset.count()} UML models have been scheduled for translation.")
+
+
+class UmlModelAdmin(admin.ModelAdmin):
+    actions = [translate_uml_models]
+
+
+class UmlFileAdmin(admin.ModelAdmin):
+    raw_id_fields = ["blob"]
+    list_display = ["id", "filename", "format", "state", "model"]
+    list_select_related = ["model"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("model__formatted_data")
+
+
+class UmlFileBlobAdmin(admin.ModelAdmin):
+    list_display = ["id", "sha256", "storage", "size", "ref_count", "last_accessed_at"]
+
+    def get_queryset(self, request):
+        # Content isn't editable, so it's never needed by the admin
+        return super().get_queryset(request).defer("data")
+
+
+class UmlFileRevisionAdmin(admin.ModelAdmin):
+    raw_id_fields = ["file", "blob"]
+    list_display = ["id", "file_id", "number", "blob_id", "size", "tech_valid_from", "tech_active_flag"]
+
+
+admin.site.register(UmlModel, UmlModelAdmin)
+admin.site.register(UmlFile, UmlFileAdmin)
+admin.site.register(UserAccessToModel)
+admin.site.register(TranslationOutboxMessage)
+admin.site.register(UserTranslationQuota)
+admin.site.register(TranslationFanOut)
+admin.site.register(TranslationPart)
+admin.site.register(MessageBrokerQueueSnapshot)
+admin.site.register(BrokerQueueMessage)
+admin.site.register(UmlFileBlob, UmlFileBlobAdmin)
+admin.site.register(UmlModelSummary)
+admin.site.register(UmlFileRevision, UmlFileRevisionAdmin)
@@ -0,0 +1,113 @@
+from typing import Iterator, Optional
+
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from umlars_app.utils.compression_utils import (
+    DEFAULT_CHUNK_SIZE, CompressionHeader, read_header, compress_text, decompress_text, iter_decompressed_chunks
+)
+
+
+class CompressedValue:
+    """Value loaded from the database, decompressed only when the text is accessed for the first time."""
+
+    __slots__ = ("compressed", "_text")
+
+    def __init__(self, compressed: bytes) -> None:
+        self.compressed = compressed
+        self._text: Optional[str] = None
+
+    @property
+    def header(self) -> CompressionHeader:
+        return read_header(self.compressed)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = decompress_text(self.compressed)
+        return self._text
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        if self._text is not None:
+            return _iter_encoded_chunks(self._text, chunk_size)
+        return iter_decompressed_chunks(self.compressed, chunk_size)
+
+
+def _iter_encoded_chunks(text: str, chunk_size: int) -> Iterator[bytes]:
+    encoded = text.encode("utf-8")
+    for offset in range(0, len(encoded), chunk_size):
+        yield encoded[offset:offset + chunk_size]
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """Returns the decompressed text. Defines __set__, so that it's called also for the loaded values."""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = self.field.get_loaded_value(instance)
+        return value.text if isinstance(value, CompressedValue) else value
+
+    def __set__(self, instance, value) -> None:
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.BinaryField):
+    """
+    Text stored compressed, with the codec chosen per row by the header byte (see compression_utils).
+    Values loaded from the database are decompressed lazily and aren't compressed again when saved unchanged.
+    """
+
+    descriptor_class = CompressedTextDescriptor
+
+    def get_default(self):
+        default = super().get_default()
+        return "" if default == b"" else default
+
+    def pre_save(self, model_instance, add):
+        # Loaded value is saved as it is, without decompressing and compressing it again
+        return model_instance.__dict__.get(self.attname)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return CompressedValue(bytes(value))
+
+    def to_python(self, value):
+        if value is None or isinstance(value, (str, CompressedValue)):
+            return value
+        return CompressedValue(bytes(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, CompressedValue):
+            value = value.compressed
+        elif isinstance(value, str):
+            value = compress_text(value)
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj) -> str:
+        return self.value_from_object(obj)
+
+    def get_compressed_value(self, instance) -> Optional[CompressedValue]:
+        """Value of the instance as stored in the database, compressing the text assigned since loading."""
+        value = self.get_loaded_value(instance)
+        if value is None or isinstance(value, CompressedValue):
+            return value
+        return CompressedValue(compress_text(value))
+
+    def iter_chunks(self, instance, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """Streams the UTF-8 encoded text of the instance."""
+        value = self.get_loaded_value(instance)
+        if value is None:
+            return iter(())
+        if isinstance(value, CompressedValue):
+            return value.iter_chunks(chunk_size)
+        return _iter_encoded_chunks(value, chunk_size)
+
+    def get_loaded_value(self, instance):
+        """Value of the instance without decompressing it - deferred value is fetched as stored in the database."""
+        if self.attname not in instance.__dict__:
+            instance.__dict__[self.attname] = type(instance)._base_manager.using(instance._state.db).filter(
+                pk=instance.pk
+            ).values_list(self.attname, flat=True).get()
+        return instance.__dict__[self.attname]
@@ -195,7 +195,7 @@ class _AddUmlModelForm(forms.ModelForm):
 
     accessed_by = forms.ModelMultipleChoiceField(
         label="",
-        queryset=UserAccessToModel.objects.all(),
+        queryset=UserAccessToModel.objects.select_related("user", "model").defer("model__formatted_data"),
         widget=forms.CheckboxSelectMultiple(attrs={"class": "form-check-input d-none"}),
         required=False,
     )
@@ -277,6 +277,16 @@ class AddUmlFileForm(forms.ModelForm):
         initial='internal_file'
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Content isn't a model field, so it isn't taken from the instance by the ModelForm
+        if self.instance.pk is not None and "data" not in self.initial:
+            self.initial["data"] = self.instance.data
+
+    def _post_clean(self) -> None:
+        super()._post_clean()
+        if self.cleaned_data.get("data"):
+            self.instance.data = self.cleaned_data["data"]
         
     def clean(self) -> dict:
         cleaned_data =  super(AddUmlFileForm, self).clean()
@@ -292,14 +302,20 @@ class AddUmlFileForm(forms.ModelForm):
         return cleaned_data
     
 
+class _UmlFileInlineFormset(forms.BaseInlineFormSet):
+    def __init__(self, *args, queryset=None, **kwargs):
+        # Forms are initialized with the content of the files, which isn't loaded by default
+        super().__init__(*args, queryset=UmlFile.objects.with_data() if queryset is None else queryset, **kwargs)
+
+
 _AddUmlFileFormsetBase = forms.inlineformset_factory(
-    UmlModel, UmlFile, form=AddUmlFileForm, 
+    UmlModel, UmlFile, form=AddUmlFileForm, formset=_UmlFileInlineFormset,
     extra=1, can_delete=True, can_delete_extra=True, fields=("data", "format", "file", 'filename')
 )
 
 
 _EditUmlFileFormsetBase = forms.inlineformset_factory(
-    UmlModel, UmlFile, form=AddUmlFileForm, 
+    UmlModel, UmlFile, form=AddUmlFileForm, formset=_UmlFileInlineFormset,
     extra=0, can_delete=True, can_delete_extra=True, fields=("data", "format", "file", 'filename')
 )
 
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from umlars_app.utils.blob_utils import backfill_blobs_batch
+
+
+class Command(BaseCommand):
+    help = "Moves the content of the files saved before the blob store into the deduplicated blobs, in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of files moved in a single transaction")
+        parser.add_argument("--pause", type=float, default=0.1, help="Seconds between the batches, limiting the load of the database")
+
+    def handle(self, *args, **options):
+        moved_files_count = 0
+        last_file_id = 0
+        while True:
+            batch_result = backfill_blobs_batch(last_file_id, options["batch_size"])
+            if batch_result.last_file_id is None:
+                break
+            moved_files_count += batch_result.moved_files_count
+            last_file_id = batch_result.last_file_id
+            self.stdout.write(f"Moved {moved_files_count} files to blobs (last file ID: {last_file_id})")
+            time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Backfill finished - {moved_files_count} files moved to blobs"))
+        self.stdout.write("Files being edited during the backfill are skipped - run the command again to move them")
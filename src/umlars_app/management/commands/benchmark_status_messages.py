@@ -0,0 +1,55 @@
+import json
+import time
+from typing import Any, Callable, List
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from umlars_app.message_broker.messages import decode_translation_status_message
+from umlars_app.models import ProcessStatus
+from umlars_app.rest.serializers import UmlFileTranslationStatusSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compares the throughput of translation status messages decoding with the serializer and with the fast path.
+    Example:
+        manage.py benchmark_status_messages --messages 50000
+    """
+
+    help = "Measures how many translation status messages per second can be decoded"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--messages", type=int, default=20_000, help="Number of messages decoded by each decoder")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        states = ProcessStatus.values
+        bodies = [
+            json.dumps({"id": index, "state": states[index % len(states)], "process_id": f"process-{index}", "message": "Translated"}).encode()
+            for index in range(options["messages"])
+        ]
+
+        serializer_rate = self._measure(bodies, self._decode_with_serializer)
+        fast_path_rate = self._measure(bodies, self._decode_with_fast_path)
+
+        self.stdout.write(f"Serializer: {serializer_rate:,.0f} messages/s")
+        self.stdout.write(f"Fast path: {fast_path_rate:,.0f} messages/s")
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {fast_path_rate / serializer_rate:.1f}x"))
+
+    @staticmethod
+    def _measure(bodies: List[bytes], decode: Callable[[bytes], Any]) -> float:
+        start_time = time.perf_counter()
+        for body in bodies:
+            decode(body)
+        return len(bodies) / (time.perf_counter() - start_time)
+
+    @staticmethod
+    def _decode_with_serializer(body: bytes) -> Any:
+        serializer = UmlFileTranslationStatusSerializer(data=json.loads(body), partial=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    @staticmethod
+    def _decode_with_fast_path(body: bytes) -> Any:
+        status_message = decode_translation_status_message(json.loads(body))
+        assert status_message is not None
+        return status_message
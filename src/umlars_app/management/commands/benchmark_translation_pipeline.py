@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from umlars_app import settings
+from umlars_app.utils.benchmark_utils import run_translation_pipeline_benchmark
+
+
+class Command(BaseCommand):
+    help = "Measures the latency and throughput of the translation loop with the in-memory broker and a fake translator"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--models", type=int, default=100, help="Number of models driven through the loop")
+        parser.add_argument("--files-per-model", type=int, default=1, help="Number of source files of each model")
+        parser.add_argument("--file-size", type=int, default=1000, help="Size of each source file in characters")
+        parser.add_argument("--latency-ms", type=float, default=0, help="Simulated translation time of a single request")
+        parser.add_argument("--jitter-ms", type=float, default=0, help="Maximum random deviation of the translation time")
+        parser.add_argument("--failure-rate", type=float, default=0, help="Fraction of the requests reported as failed")
+        parser.add_argument("--translator-threads", type=int, default=4, help="Number of fake translator threads")
+        parser.add_argument("--consumer-threads", type=int, default=1, help="Number of status consumer threads")
+        parser.add_argument("--max-in-flight", type=int, default=settings.TRANSLATION_MAX_IN_FLIGHT_MESSAGES_PER_USER, help="Limit of requests being translated at once")
+        parser.add_argument("--timeout", type=float, default=300, help="Seconds after which the benchmark is stopped")
+        parser.add_argument("--keep-models", action="store_true", help="Don't delete the created models")
+
+    def handle(self, *args, **options):
+        benchmark_report = run_translation_pipeline_benchmark(
+            models_count=options["models"],
+            files_per_model=options["files_per_model"],
+            file_size=options["file_size"],
+            latency_seconds=options["latency_ms"] / 1000,
+            latency_jitter_seconds=options["jitter_ms"] / 1000,
+            failure_rate=options["failure_rate"],
+            translator_threads=options["translator_threads"],
+            consumer_threads=options["consumer_threads"],
+            max_in_flight_messages=options["max_in_flight"],
+            timeout_seconds=options["timeout"],
+            keep_models=options["keep_models"],
+            report=self.stdout.write,
+        )
+
+        def format_latency(latency_seconds):
+            return f"{latency_seconds * 1000:.1f} ms" if latency_seconds is not None else "-"
+
+        self.stdout.write(f"Completed models: {benchmark_report.completed_models_count}/{benchmark_report.models_count} in {benchmark_report.elapsed_seconds:.2f}s")
+        self.stdout.write(f"Failed files: {benchmark_report.failed_files_count}")
+        self.stdout.write(f"End-to-end latency: p50 {format_latency(benchmark_report.latency_p50_seconds)}, p95 {format_latency(benchmark_report.latency_p95_seconds)}, p99 {format_latency(benchmark_report.latency_p99_seconds)}")
+        self.stdout.write(f"Throughput: {benchmark_report.status_messages_per_second:.1f} status messages/s, {benchmark_report.models_per_second:.1f} models/s")
+        if benchmark_report.completed_models_count < benchmark_report.models_count:
+            self.stdout.write(self.style.WARNING(f"Benchmark timed out with {benchmark_report.models_count - benchmark_report.completed_models_count} models not translated"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+
+from umlars_app.models import UmlModel, UmlFile
+from umlars_app.utils.query_plan_utils import get_hot_path_querysets, explain_queryset
+
+
+class Command(BaseCommand):
+    help = "Explains the queries of the main views and flags the ones which scan whole tables instead of using an index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user-id", type=int, help="User whose queries are explained - the first user by default")
+        parser.add_argument("--model-id", type=int, help="Model whose queries are explained - the first model by default")
+        parser.add_argument("--verbose-plans", action="store_true", help="Print the plans of all the queries")
+        parser.add_argument("--fail-on-sequential-scan", action="store_true", help="Exit with an error when any query scans a whole table")
+
+    def handle(self, *args, **options):
+        # Plans don't depend on the exact values - any existing ones are used by default
+        user_id = options["user_id"] or User.objects.order_by("id").values_list("id", flat=True).first() or 0
+        model_id = options["model_id"] or UmlModel.objects.order_by("id").values_list("id", flat=True).first() or 0
+        file_id = UmlFile.objects.filter(model_id=model_id).order_by("id").values_list("id", flat=True).first() or 0
+        self.stdout.write(f"Explaining the queries on {connection.vendor} for user {user_id}, model {model_id} and file {file_id}")
+
+        flagged_queries_count = 0
+        for name, queryset in get_hot_path_querysets(user_id, model_id, file_id).items():
+            report = explain_queryset(name, queryset)
+            if report.sequentially_scanned_tables:
+                flagged_queries_count += 1
+                self.stdout.write(self.style.WARNING(f"{name}: sequential scan of {', '.join(report.sequentially_scanned_tables)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: uses indexes"))
+            if options["verbose_plans"] or report.sequentially_scanned_tables:
+                self.stdout.write(report.plan)
+
+        if flagged_queries_count and options["fail_on_sequential_scan"]:
+            raise CommandError(f"{flagged_queries_count} queries scan whole tables")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from umlars_app.utils.blob_utils import recount_blob_references, collect_unreferenced_blobs
+
+
+class Command(BaseCommand):
+    help = "Deletes the blobs of the file contents which are no longer referenced by any file or revision"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace-period-hours", type=float, default=1, help="Blobs referenced within this time are kept")
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of blobs processed in a single transaction")
+        parser.add_argument("--recount", action="store_true", help="Fix the reference counts before collecting the blobs")
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            fixed_blobs_count = recount_blob_references(options["batch_size"])
+            self.stdout.write(f"Fixed reference counts of {fixed_blobs_count} blobs")
+
+        deleted_blobs_count = collect_unreferenced_blobs(options["grace_period_hours"] * 3600, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted_blobs_count} unreferenced blobs"))
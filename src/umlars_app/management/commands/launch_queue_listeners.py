@@ -1,9 +1,13 @@
 import logging
 import concurrent.futures
+from typing import Any, Dict, Tuple, Type
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from umlars_app.message_broker.consumer import RabbitMQConsumer
+from umlars_app.message_broker.consumer import RabbitMQConsumer, BrokerBackendConsumer
+from umlars_app.message_broker.async_consumer import AsyncioRabbitMQConsumer
+from umlars_app.message_broker.supervisor import ConsumerPoolSupervisor
+from umlars_app.message_broker.sharding import get_shard_queues_names, assign_shards
 from umlars_app import settings
 
 
@@ -11,24 +15,46 @@ logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    help = "Starts a multi-threaded consumer for RabbitMQ"
+    help = "Starts a multi-threaded or multi-process consumer for RabbitMQ"
 
     def add_arguments(self, parser):
         parser.add_argument("numthreads", nargs="?", type=int, default=1, help="Number of threads to use for consuming messages")
+        parser.add_argument("--engine", choices=["blocking", "asyncio"], default=settings.MESSAGE_BROKER_CONSUMER_ENGINE, help="Consumer implementation: one blocking connection per thread or asyncio event loop")
+        parser.add_argument("--max-in-flight", type=int, default=settings.MESSAGE_BROKER_ASYNC_MAX_IN_FLIGHT_MESSAGES, help="Unacknowledged messages kept by a single asyncio consumer")
+        parser.add_argument("--db-workers", type=int, default=settings.MESSAGE_BROKER_ASYNC_DB_WORKERS, help="Threads executing database writes for a single asyncio consumer")
+        parser.add_argument("--batch-size", type=int, default=settings.MESSAGE_BROKER_CONSUMER_BATCH_SIZE, help="Number of messages processed and acknowledged together (1 disables batching, blocking engine only)")
+        parser.add_argument("--batch-timeout-ms", type=int, default=settings.MESSAGE_BROKER_CONSUMER_BATCH_TIMEOUT_MS, help="Maximum time a message waits in an incomplete batch")
+        parser.add_argument("--processes", type=int, default=None, help="Number of consumer processes to start with - enables the supervised process pool")
+        parser.add_argument("--threads-per-process", type=int, default=1, help="Number of consumer threads in each process of the pool")
+        parser.add_argument("--min-processes", type=int, default=settings.MESSAGE_BROKER_CONSUMER_MIN_PROCESSES, help="Lower bound of the process pool size")
+        parser.add_argument("--max-processes", type=int, default=settings.MESSAGE_BROKER_CONSUMER_MAX_PROCESSES, help="Upper bound of the process pool size")
+        parser.add_argument("--messages-per-process", type=int, default=settings.MESSAGE_BROKER_CONSUMER_MESSAGES_PER_PROCESS, help="Queue depth handled by a single process when autoscaling")
+        parser.add_argument("--autoscale-interval", type=int, default=settings.MESSAGE_BROKER_CONSUMER_AUTOSCALE_INTERVAL_SECONDS, help="Seconds between queue depth checks and throughput reports")
 
     def handle(self, *args, **options):
         numthreads = options.get("numthreads", 1)
-        self.stdout.write(f"Starting consumer with {numthreads} threads")
+        consumer_class, consumer_kwargs = self._get_consumer_class_and_kwargs(options)
+
+        if options["processes"] is not None:
+            return self._run_process_pool(options, consumer_class, consumer_kwargs)
+
+        # Shards are split between the threads, so that the messages of every shard are consumed in order
+        queues_names = get_shard_queues_names(settings.MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME)
+        threads_queues_names = assign_shards(queues_names, numthreads) if len(queues_names) > 1 else [None] * numthreads
+        if len(threads_queues_names) < numthreads:
+            self.stdout.write(f"Only {len(threads_queues_names)} threads started - each of {len(queues_names)} shards is consumed by a single thread")
+
+        self.stdout.write(f"Starting {options['engine']} consumer with {len(threads_queues_names)} threads")
         logger.info("Starting consumer command called...")
 
         # Function to create and start a RabbitMQConsumer instance
-        def consume():
-            consumer = RabbitMQConsumer(queue_name=settings.MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME, rabbitmq_host=settings.MESSAGE_BROKER_HOST)
+        def consume(queues_names):
+            consumer = consumer_class(queue_name=settings.MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME, rabbitmq_host=settings.MESSAGE_BROKER_HOST, queues_names=queues_names, **consumer_kwargs)
             consumer.start_consuming()
 
         # Set up a multithreaded daemon to monitor the RabbitMQ queue
-        with concurrent.futures.ThreadPoolExecutor(max_workers=numthreads) as executor:
-            futures = [executor.submit(consume) for _ in range(numthreads)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(threads_queues_names)) as executor:
+            futures = [executor.submit(consume, queues_names) for queues_names in threads_queues_names]
             try:
                 for future in concurrent.futures.as_completed(futures):
                     future.result()  # This will wait for each consume function to finish
@@ -37,3 +63,35 @@ class Command(BaseCommand):
                 logger.error("Error occurred: %s", e, exc_info=1)
 
         self.stdout.write(self.style.SUCCESS('Successfully started consumer daemon'))
+
+    def _get_consumer_class_and_kwargs(self, options) -> Tuple[Type[RabbitMQConsumer], Dict[str, Any]]:
+        if settings.MESSAGE_BROKER_BACKEND != "rabbitmq":
+            if settings.MESSAGE_BROKER_BACKEND == "memory" and options["processes"] is not None:
+                raise CommandError("Memory broker backend can't be shared between processes")
+            return BrokerBackendConsumer, {"batch_size": options["batch_size"], "batch_timeout_ms": options["batch_timeout_ms"]}
+        if options["engine"] == "asyncio":
+            return AsyncioRabbitMQConsumer, {"max_in_flight_messages": options["max_in_flight"], "db_workers": options["db_workers"]}
+        return RabbitMQConsumer, {"batch_size": options["batch_size"], "batch_timeout_ms": options["batch_timeout_ms"]}
+
+    def _run_process_pool(self, options, consumer_class: Type[RabbitMQConsumer], consumer_kwargs: Dict[str, Any]) -> None:
+        self.stdout.write(f"Starting {options['engine']} consumer pool with {options['processes']} processes, {options['threads_per_process']} threads each")
+        logger.info("Starting consumer pool command called...")
+
+        supervisor = ConsumerPoolSupervisor(
+            queue_name=settings.MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME,
+            rabbitmq_host=settings.MESSAGE_BROKER_HOST,
+            initial_processes=options["processes"],
+            threads_per_process=options["threads_per_process"],
+            min_processes=options["min_processes"],
+            max_processes=options["max_processes"],
+            messages_per_process=options["messages_per_process"],
+            autoscale_interval_seconds=options["autoscale_interval"],
+            consumer_class=consumer_class,
+            consumer_kwargs=consumer_kwargs,
+            report=self.stdout.write,
+            queues_names=get_shard_queues_names(settings.MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME),
+        )
+        try:
+            supervisor.run()
+        except KeyboardInterrupt:
+            self.stdout.write("Consumer pool stopped")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from umlars_app.models import BlobStorage
+from umlars_app.utils.blob_utils import move_blobs_batch
+
+
+class Command(BaseCommand):
+    help = "Moves the contents of the files between the database and the filesystem storage, in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--to", choices=BlobStorage.values, default=BlobStorage.FILESYSTEM, help="Storage to which the blobs are moved")
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of blobs moved in a single transaction")
+        parser.add_argument("--pause", type=float, default=0.1, help="Seconds between the batches, limiting the load of the database")
+
+    def handle(self, *args, **options):
+        storage = BlobStorage(options["to"])
+        moved_blobs_count = 0
+        last_blob_id = 0
+        while True:
+            batch_result = move_blobs_batch(last_blob_id, options["batch_size"], storage)
+            if batch_result.last_blob_id is None:
+                break
+            moved_blobs_count += batch_result.moved_blobs_count
+            last_blob_id = batch_result.last_blob_id
+            self.stdout.write(f"Moved {moved_blobs_count} blobs to the {storage.label.lower()} storage (last blob ID: {last_blob_id})")
+            time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Moving finished - {moved_blobs_count} blobs moved to the {storage.label.lower()} storage"))
+        self.stdout.write("Blobs locked during the move are skipped - run the command again to move them")
+        self.stdout.write("New blobs are stored according to UML_FILE_STORAGE_BACKEND")
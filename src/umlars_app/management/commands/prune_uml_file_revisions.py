@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from umlars_app import settings
+from umlars_app.utils.revision_utils import prune_revisions_batch
+
+
+class Command(BaseCommand):
+    help = "Deletes the revisions of the UML files replaced before the retention period, keeping the latest ones of each file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, default=settings.UML_FILE_REVISION_RETENTION_DAYS, help="Revisions replaced within this number of days are kept")
+        parser.add_argument("--keep", type=int, default=settings.UML_FILE_REVISION_KEEP_COUNT, help="Number of the latest revisions of each file which are always kept")
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of files pruned in a single batch")
+
+    def handle(self, *args, **options):
+        pruned_files_count = 0
+        deleted_revisions_count = 0
+        last_file_id = 0
+        while True:
+            result = prune_revisions_batch(last_file_id, options["batch_size"], options["days"], options["keep"])
+            if result.last_file_id is None:
+                break
+            pruned_files_count += result.pruned_files_count
+            deleted_revisions_count += result.deleted_revisions_count
+            last_file_id = result.last_file_id
+            self.stdout.write(f"Pruned {pruned_files_count} files (last file ID: {last_file_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted_revisions_count} revisions of {pruned_files_count} files"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from umlars_app import settings
+from umlars_app.utils.blob_utils import recompress_cold_blobs, recompress_archived_models_data
+
+
+class Command(BaseCommand):
+    help = "Recompresses at a higher level the file contents not accessed recently and the formatted data of archived models"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, default=settings.STORAGE_COLD_AFTER_DAYS, help="Contents not accessed within this number of days are recompressed")
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of rows recompressed in a single transaction")
+
+    def handle(self, *args, **options):
+        for name, recompress in (("file contents", recompress_cold_blobs), ("formatted data of models", recompress_archived_models_data)):
+            result = recompress(options["days"], options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Recompressed {result.recompressed_count} {name}: {result.size_before} -> {result.size_after} bytes"
+            ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from umlars_app.models import UmlModel, UmlModelSummary
+
+
+class Command(BaseCommand):
+    help = "Recalculates the summaries of the UML models from their files, e.g. to fill them for the models saved before"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of models refreshed at once")
+        parser.add_argument("--missing-only", action="store_true", help="Refresh only the models without a summary")
+
+    def handle(self, *args, **options):
+        uml_models = UmlModel.objects.order_by("id")
+        if options["missing_only"]:
+            uml_models = uml_models.filter(summary__isnull=True)
+
+        refreshed_models_count = 0
+        last_model_id = 0
+        while (models_ids := list(uml_models.filter(id__gt=last_model_id).values_list("id", flat=True)[:options["batch_size"]])):
+            UmlModelSummary.objects.refresh_for_models(models_ids)
+            refreshed_models_count += len(models_ids)
+            last_model_id = models_ids[-1]
+            self.stdout.write(f"Refreshed {refreshed_models_count} summaries (last model ID: {last_model_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed summaries of {refreshed_models_count} models"))
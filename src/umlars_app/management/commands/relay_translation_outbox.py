@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from umlars_app.message_broker.outbox import TranslationOutboxRelay
+from umlars_app import settings
+
+
+class Command(BaseCommand):
+    help = "Publishes translation requests saved in the outbox to RabbitMQ"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.TRANSLATION_OUTBOX_BATCH_SIZE, help="Number of outbox messages locked and published together")
+        parser.add_argument("--poll-interval", type=float, default=settings.TRANSLATION_OUTBOX_POLL_INTERVAL_SECONDS, help="Seconds between checks of an empty outbox")
+        parser.add_argument("--max-attempts", type=int, default=settings.TRANSLATION_OUTBOX_MAX_PUBLISH_ATTEMPTS, help="Failed publish attempts after which the message is marked as failed")
+        parser.add_argument("--once", action="store_true", help="Publish a single batch and exit")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Starting translation outbox relay with batches of {options['batch_size']} messages")
+        relay = TranslationOutboxRelay(
+            batch_size=options["batch_size"],
+            poll_interval_seconds=options["poll_interval"],
+            max_publish_attempts=options["max_attempts"],
+            report=self.stdout.write,
+        )
+        relay.run(run_once=options["once"])
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from umlars_app import settings
+from umlars_app.utils.benchmark_utils import replay_queue_capture
+
+
+class Command(BaseCommand):
+    help = "Replays the messages captured by the consumers through the consumer, reporting its throughput and database time. Statuses are applied to the configured database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Capture file written by the consumers (see RABBITMQ_CONSUMER_CAPTURE_PATH)")
+        speed_group = parser.add_mutually_exclusive_group()
+        speed_group.add_argument("--speed", type=float, default=1.0, help="Replay speed relative to the captured pace, e.g. 10 for 10x faster")
+        speed_group.add_argument("--as-fast-as-possible", action="store_true", help="Don't wait between the messages")
+        parser.add_argument("--batch-size", type=int, default=settings.MESSAGE_BROKER_CONSUMER_BATCH_SIZE, help="Number of messages processed together by the consumer (1 disables batching)")
+        parser.add_argument("--batch-timeout-ms", type=int, default=settings.MESSAGE_BROKER_CONSUMER_BATCH_TIMEOUT_MS, help="Maximum time a message waits in an incomplete batch")
+        parser.add_argument("--limit", type=int, default=None, help="Number of messages to replay")
+
+    def handle(self, *args, **options):
+        if not options["as_fast_as_possible"] and options["speed"] <= 0:
+            raise CommandError("Speed must be positive")
+
+        try:
+            replay_report = replay_queue_capture(
+                options["path"],
+                speed=None if options["as_fast_as_possible"] else options["speed"],
+                batch_size=options["batch_size"],
+                batch_timeout_ms=options["batch_timeout_ms"],
+                limit=options["limit"],
+            )
+        except FileNotFoundError as ex:
+            raise CommandError(f"Capture file not found: {ex.filename}") from ex
+
+        def format_milliseconds(seconds):
+            return f"{seconds * 1000:.2f} ms" if seconds is not None else "-"
+
+        self.stdout.write(f"Replayed {replay_report.messages_count} messages in {replay_report.elapsed_seconds:.2f}s: {replay_report.acked_count} acknowledged, {replay_report.rejected_count} rejected")
+        self.stdout.write(f"Throughput: {replay_report.messages_per_second:.1f} messages/s, consumer alone: {replay_report.max_messages_per_second:.1f} messages/s")
+        self.stdout.write(f"Processing time per message: p50 {format_milliseconds(replay_report.processing_p50_seconds)}, p95 {format_milliseconds(replay_report.processing_p95_seconds)}, p99 {format_milliseconds(replay_report.processing_p99_seconds)}")
+        self.stdout.write(f"Database per message: {replay_report.db_queries_per_message:.1f} queries, {format_milliseconds(replay_report.db_seconds_per_message)}")
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from umlars_app.message_broker.outbox import collect_user_dispatch_stats
+
+
+class Command(BaseCommand):
+    help = "Shows the per-user backlog, in-flight and wait time of the translation requests"
+
+    def handle(self, *args, **options):
+        users_stats = collect_user_dispatch_stats()
+        usernames = dict(User.objects.filter(id__in=[user_stats.user_id for user_stats in users_stats]).values_list("id", "username"))
+        now = timezone.now()
+
+        self.stdout.write(f"{'user':<30} {'pending':>8} {'in flight':>10} {'oldest wait [s]':>16} {'published (1h)':>15} {'mean wait (1h) [s]':>19}")
+        for user_stats in users_stats:
+            username = usernames.get(user_stats.user_id, "<anonymous>")
+            oldest_wait = f"{(now - user_stats.oldest_pending_created_at).total_seconds():.1f}" if user_stats.oldest_pending_created_at else "-"
+            mean_wait = f"{user_stats.mean_wait_seconds_last_hour:.1f}" if user_stats.mean_wait_seconds_last_hour is not None else "-"
+            self.stdout.write(f"{username:<30} {user_stats.pending_count:>8} {user_stats.in_flight_count:>10} {oldest_wait:>16} {user_stats.published_last_hour_count:>15} {mean_wait:>19}")
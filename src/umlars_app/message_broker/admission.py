@@ -0,0 +1,124 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.utils import timezone
+
+from umlars_app import settings
+from umlars_app.models import MessageBrokerQueueSnapshot
+from umlars_app.message_broker.queues import QueueDepthSampler, QueueStats
+from umlars_app.utils.logging import get_new_sublogger
+
+
+class TokenBucket:
+    """Thread-safe token bucket - tokens are added at the given rate, up to the capacity."""
+
+    def __init__(self, rate_per_second: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self._rate_per_second = rate_per_second
+        self._capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._last_refill_time = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens_count: int) -> int:
+        """Takes up to tokens_count tokens and returns how many were taken."""
+        with self._lock:
+            self._refill()
+            acquired_count = min(tokens_count, int(self._tokens))
+            self._tokens -= acquired_count
+            return acquired_count
+
+    def release(self, tokens_count: int) -> None:
+        with self._lock:
+            self._tokens = min(self._tokens + tokens_count, self._capacity)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self._tokens + (now - self._last_refill_time) * self._rate_per_second, self._capacity)
+        self._last_refill_time = now
+
+
+class AdmissionController:
+    """
+    Decides how many messages can be published to the queue now. Below the high-water mark publishing isn't limited,
+    above it publishing is throttled by the token bucket, and above the maximum depth (or without consumers) it's deferred.
+    Sampled depth is saved in the database, so the web workers can tell the users their requests wait locally.
+    """
+
+    def __init__(
+        self,
+        queue_name: str,
+        rabbitmq_host: str = settings.MESSAGE_BROKER_HOST,
+        high_water_mark: int = settings.MESSAGE_BROKER_ADMISSION_HIGH_WATER_MARK,
+        max_queue_depth: int = settings.MESSAGE_BROKER_ADMISSION_MAX_QUEUE_DEPTH,
+        throttled_rate: float = settings.MESSAGE_BROKER_ADMISSION_THROTTLED_RATE,
+        sampler: Optional[QueueDepthSampler] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._logger = get_new_sublogger(self.__class__.__name__)
+        self._queue_name = queue_name
+        self._high_water_mark = high_water_mark
+        self._max_queue_depth = max_queue_depth
+        self._sampler = sampler or QueueDepthSampler(queue_name, rabbitmq_host)
+        self._token_bucket = TokenBucket(throttled_rate, capacity=max(throttled_rate, 1), clock=clock)
+        self._last_saved_sample_time = None
+        self._is_admitted_by_token_bucket = False
+        self.is_throttled = False
+
+    def admit(self, messages_count: int) -> int:
+        queue_stats = self._sampler.get_stats()
+        if queue_stats is None:
+            # Depth is unknown - publishing fails anyway when the broker is unavailable
+            return messages_count
+
+        self._is_admitted_by_token_bucket = False
+        if queue_stats.messages_count >= self._max_queue_depth or queue_stats.consumers_count == 0 and queue_stats.messages_count >= self._high_water_mark:
+            admitted_count = 0
+        elif queue_stats.messages_count >= self._high_water_mark:
+            admitted_count = self._token_bucket.try_acquire(messages_count)
+            self._is_admitted_by_token_bucket = True
+        else:
+            admitted_count = messages_count
+
+        self._update_throttling(queue_stats, is_throttled=admitted_count < messages_count)
+        return admitted_count
+
+    def release(self, messages_count: int) -> None:
+        """Returns the admission of messages which weren't published after all."""
+        if self._is_admitted_by_token_bucket and messages_count > 0:
+            self._token_bucket.release(messages_count)
+
+    def close(self) -> None:
+        self._sampler.close()
+
+    def _update_throttling(self, queue_stats: QueueStats, is_throttled: bool) -> None:
+        is_state_changed = is_throttled != self.is_throttled
+        if is_state_changed:
+            self._logger.warning(
+                f"Publishing to queue {self._queue_name} {'throttled' if is_throttled else 'resumed'} - "
+                f"{queue_stats.messages_count} messages, {queue_stats.consumers_count} consumers"
+            )
+        self.is_throttled = is_throttled
+
+        if is_state_changed or self._last_saved_sample_time != self._sampler.last_sample_time:
+            self._last_saved_sample_time = self._sampler.last_sample_time
+            MessageBrokerQueueSnapshot.objects.update_or_create(queue_name=self._queue_name, defaults={
+                "messages_count": queue_stats.messages_count,
+                "consumers_count": queue_stats.consumers_count,
+                "is_throttled": is_throttled,
+                "sampled_at": timezone.now(),
+            })
+
+
+def is_publishing_deferred(queue_name: str = settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME) -> bool:
+    """
+    Tells whether new messages wait in the outbox instead of being published right away - because of throttling,
+    or because the relay hasn't sampled the queue for a long time.
+    """
+    snapshot = MessageBrokerQueueSnapshot.objects.filter(queue_name=queue_name).only("is_throttled", "sampled_at").first()
+    if snapshot is None:
+        return False
+    is_stale = timezone.now() - snapshot.sampled_at > timedelta(seconds=10 * settings.MESSAGE_BROKER_ADMISSION_SAMPLE_INTERVAL_SECONDS)
+    return snapshot.is_throttled or is_stale
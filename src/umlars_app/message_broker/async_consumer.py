@@ -0,0 +1,226 @@
+import asyncio
+import concurrent.futures
+from functools import partial
+from typing import Optional, Callable, List
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+from django.db import connection as db_connection
+
+from umlars_app import settings
+from umlars_app.exceptions import QueueUnavailableError, NotYetAvailableError
+from umlars_app.message_broker.consumer import RabbitMQConsumer
+from umlars_app.message_broker.queues import get_queue_arguments
+from umlars_app.utils.logging import get_new_sublogger
+from umlars_app.utils.connections_utils import async_retry, calculate_backoff_delay
+
+
+logger = get_new_sublogger(__name__)
+
+
+def create_event_loop(event_loop_name: str = settings.MESSAGE_BROKER_EVENT_LOOP) -> asyncio.AbstractEventLoop:
+    if event_loop_name == "uvloop":
+        try:
+            import uvloop
+            return uvloop.new_event_loop()
+        except ImportError:
+            logger.warning("uvloop is not installed - falling back to the default asyncio event loop")
+    return asyncio.new_event_loop()
+
+
+class AsyncioRabbitMQConsumer(RabbitMQConsumer):
+    """
+    Consumer built on the pika asyncio adapter. Single connection keeps up to max_in_flight_messages
+    unacknowledged messages, while the database writes are executed by a bounded pool of threads.
+    """
+
+    def __init__(
+        self,
+        queue_name: str,
+        rabbitmq_host: str,
+        max_in_flight_messages: int = settings.MESSAGE_BROKER_ASYNC_MAX_IN_FLIGHT_MESSAGES,
+        db_workers: int = settings.MESSAGE_BROKER_ASYNC_DB_WORKERS,
+        event_loop_name: str = settings.MESSAGE_BROKER_EVENT_LOOP,
+        on_messages_processed: Optional[Callable[[int], None]] = None,
+        queues_names: Optional[List[str]] = None,
+    ) -> None:
+        super().__init__(queue_name, rabbitmq_host, batch_size=1, prefetch_count=max_in_flight_messages, on_messages_processed=on_messages_processed, queues_names=queues_names)
+        self._db_workers = db_workers
+        self._event_loop_name = event_loop_name
+        self._executor = None
+        self._loop = None
+        self._consuming_finished = None
+        self._is_stopping = False
+
+    def start_consuming(self) -> None:
+        self._loop = create_event_loop(self._event_loop_name)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._db_workers, thread_name_prefix=f"{self.__class__.__name__}-db")
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self.consume())
+        finally:
+            self._executor.shutdown(wait=True)
+            self._loop.close()
+
+    def stop(self) -> None:
+        """Thread-safe request to close the connection and finish consuming."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._close_connection)
+
+    async def consume(self) -> None:
+        """Consumes messages until stopped, recovering the channel or the whole connection when the broker drops them."""
+        self._is_stopping = False
+        recovery_attempt_number = 0
+        while not self._is_stopping:
+            self._consuming_finished = self._loop.create_future()
+            consuming_started_at = self._loop.time()
+            try:
+                await self.connect_channel_async()
+                self._start_consuming_channel()
+                await self._consuming_finished
+            except QueueUnavailableError as ex:
+                self._logger.error(f"Consuming interrupted: {ex}")
+
+            if self._is_stopping:
+                break
+
+            if self._loop.time() - consuming_started_at > settings.MESSAGE_BROKER_RECONNECT_MAX_DELAY_SECONDS:
+                recovery_attempt_number = 0
+            delay_seconds = calculate_backoff_delay(recovery_attempt_number, settings.MESSAGE_BROKER_RECONNECT_BASE_DELAY_SECONDS, settings.MESSAGE_BROKER_RECONNECT_MAX_DELAY_SECONDS)
+            recovery_attempt_number += 1
+            self.reconnects_count += 1
+            self._logger.info(f"Reconnecting in {delay_seconds:.1f}s (reconnect number {self.reconnects_count})")
+            await asyncio.sleep(delay_seconds)
+
+    @async_retry(exception_class_raised_when_all_attempts_failed=QueueUnavailableError)
+    async def connect_channel_async(self) -> None:
+        self._logger.info(f"Connecting to RabbitMQ channel and queues: {self._rabbitmq_host}, {', '.join(self._queues_names)}...")
+        credentials = pika.PlainCredentials(settings.MESSAGE_BROKER_USER, settings.MESSAGE_BROKER_PASSWORD)
+        parameters = pika.ConnectionParameters(host=self._rabbitmq_host, port=settings.MESSAGE_BROKER_PORT, credentials=credentials)
+
+        connection_opened = self._loop.create_future()
+        self._connection = self._create_connection(
+            parameters,
+            on_open_callback=partial(self._resolve_future, connection_opened),
+            on_open_error_callback=lambda _, ex: self._fail_future(connection_opened, NotYetAvailableError(f"Failed to connect to the channel: {ex}")),
+            on_close_callback=self._on_connection_closed,
+        )
+        await connection_opened
+        await self._open_channel_async()
+        self._logger.info("Connected to RabbitMQ channel and queues")
+
+    async def _open_channel_async(self) -> None:
+        channel_opened = self._loop.create_future()
+        self._connection.channel(on_open_callback=partial(self._resolve_future, channel_opened))
+        self._channel = await self._wait_for_broker(channel_opened)
+        self._channel.add_on_close_callback(self._on_channel_closed)
+
+        for queue_name in self._queues_names:
+            queue_declared = self._loop.create_future()
+            self._channel.queue_declare(queue=queue_name, durable=True, arguments=get_queue_arguments(queue_name), callback=partial(self._resolve_future, queue_declared))
+            await self._wait_for_broker(queue_declared)
+
+        qos_applied = self._loop.create_future()
+        self._channel.basic_qos(prefetch_count=self._prefetch_count, callback=partial(self._resolve_future, qos_applied))
+        await self._wait_for_broker(qos_applied)
+
+    def _start_consuming_channel(self) -> None:
+        for queue_name in self._queues_names:
+            self._channel.basic_consume(queue=queue_name, on_message_callback=self._on_message, auto_ack=False)
+        self._logger.info("Starting to consume messages")
+
+    async def _recover_channel(self) -> None:
+        self.channel_recoveries_count += 1
+        self._logger.info(f"Reopening the channel (recovery number {self.channel_recoveries_count})")
+        try:
+            await self._open_channel_async()
+            self._start_consuming_channel()
+        except Exception as ex:
+            self._logger.error(f"Failed to reopen the channel - reconnecting: {ex}")
+            if not (self._connection.is_closing or self._connection.is_closed):
+                self._connection.close()
+
+    async def _wait_for_broker(self, response: asyncio.Future):
+        """Waits for the broker's response, unless the connection is lost in the meantime."""
+        await asyncio.wait((response, self._consuming_finished), return_when=asyncio.FIRST_COMPLETED)
+        if not response.done():
+            await self._consuming_finished
+            raise QueueUnavailableError("Connection closed while waiting for the broker")
+        return response.result()
+
+    def _create_connection(self, parameters: pika.ConnectionParameters, on_open_callback: Callable, on_open_error_callback: Callable, on_close_callback: Callable):
+        """Creates the connection on the consumer's event loop. Can be overridden to connect to a stand-in broker."""
+        return AsyncioConnection(
+            parameters,
+            on_open_callback=on_open_callback,
+            on_open_error_callback=on_open_error_callback,
+            on_close_callback=on_close_callback,
+            custom_ioloop=self._loop,
+        )
+
+    def _on_message(self, ch, method, properties, body) -> None:
+        self._logger.debug(f"Message received with delivery tag: {method.delivery_tag}")
+        self._capture_message(method.routing_key, body)
+        message_handled = self._loop.run_in_executor(self._executor, self._handle_message_body, body)
+        message_handled.add_done_callback(partial(self._on_message_handled, ch, method.delivery_tag))
+
+    def _handle_message_body(self, body: bytes) -> None:
+        try:
+            status_message = self._deserialize_message(body)
+            self.process_message(status_message)
+        except Exception:
+            # Executor threads are long living, so the broken database connection has to be dropped explicitly
+            db_connection.close_if_unusable_or_obsolete()
+            raise
+
+    def _on_message_handled(self, ch, delivery_tag: int, message_handled: asyncio.Future) -> None:
+        if ch.is_closed:
+            self._logger.warning(f"Channel closed before message {delivery_tag} was acknowledged - it will be redelivered")
+            return
+
+        if message_handled.cancelled():
+            # Handler was cancelled e.g. by the shutdown of the executor, so the message was possibly never processed
+            self._logger.warning(f"Handling of message {delivery_tag} was cancelled - it will be redelivered")
+            ch.basic_nack(delivery_tag=delivery_tag, requeue=True)
+            return
+
+        if (ex := message_handled.exception()) is not None:
+            self._logger.error(f"Failed to process message: {ex}")
+            ch.basic_nack(delivery_tag=delivery_tag, requeue=False)
+            return
+
+        ch.basic_ack(delivery_tag=delivery_tag)
+        self._report_processed_messages(1)
+
+    def _on_channel_closed(self, channel, reason: Exception) -> None:
+        self._logger.warning(f"Channel closed: {reason}")
+        if self._is_stopping or self._connection is None or self._connection.is_closing or self._connection.is_closed:
+            return
+        # Connection is still usable - only the channel is recreated, which is much cheaper than reconnecting
+        self._loop.create_task(self._recover_channel())
+
+    def _on_connection_closed(self, connection, reason: Exception) -> None:
+        if self._consuming_finished is None or self._consuming_finished.done():
+            return
+
+        if self._is_stopping:
+            self._logger.info("Connection closed")
+            self._consuming_finished.set_result(None)
+        else:
+            self._logger.error(f"Connection closed: {reason}")
+            self._consuming_finished.set_exception(QueueUnavailableError(f"Connection closed by broker: {reason}"))
+
+    def _close_connection(self) -> None:
+        self._is_stopping = True
+        if self._connection is not None and not (self._connection.is_closing or self._connection.is_closed):
+            self._connection.close()
+
+    @staticmethod
+    def _resolve_future(future: asyncio.Future, result=None) -> None:
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _fail_future(future: asyncio.Future, ex: Exception) -> None:
+        if not future.done():
+            future.set_exception(ex)
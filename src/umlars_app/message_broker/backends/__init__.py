@@ -0,0 +1,22 @@
+from typing import Optional
+
+from umlars_app import settings
+from umlars_app.message_broker.backends.base import BrokerBackend, ReceivedMessage
+
+
+BROKER_BACKEND_NAMES = ("rabbitmq", "database", "memory")
+
+
+def create_broker_backend(backend_name: Optional[str] = None, rabbitmq_host: str = settings.MESSAGE_BROKER_HOST) -> BrokerBackend:
+    """Creates the backend selected by the MESSAGE_BROKER_BACKEND setting, unless another one is named."""
+    backend_name = backend_name or settings.MESSAGE_BROKER_BACKEND
+    if backend_name == "rabbitmq":
+        from umlars_app.message_broker.backends.rabbitmq import RabbitMQBrokerBackend
+        return RabbitMQBrokerBackend(rabbitmq_host)
+    if backend_name == "database":
+        from umlars_app.message_broker.backends.database import DatabaseBrokerBackend
+        return DatabaseBrokerBackend()
+    if backend_name == "memory":
+        from umlars_app.message_broker.backends.memory import MemoryBrokerBackend
+        return MemoryBrokerBackend()
+    raise ValueError(f"Unknown message broker backend: {backend_name}. Available backends: {', '.join(BROKER_BACKEND_NAMES)}")
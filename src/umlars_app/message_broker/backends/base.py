@@ -0,0 +1,45 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+from umlars_app.message_broker.producer import PublishReport
+from umlars_app.message_broker.queues import QueueStats
+
+
+class ReceivedMessage(NamedTuple):
+    delivery_tag: Hashable
+    body: bytes
+
+
+class BrokerBackend(ABC):
+    """
+    Message broker used for the translation requests and statuses.
+    Every received message has to be acknowledged or rejected with its delivery tag.
+    Instances aren't thread-safe - each thread should create its own.
+    """
+
+    @abstractmethod
+    def publish_messages(self, queue_name: str, keyed_messages: Iterable[Tuple[Hashable, dict]], priorities: Optional[Dict[Hashable, int]] = None) -> PublishReport:
+        """Publishes the messages and reports which of them were stored by the broker."""
+
+    @abstractmethod
+    def get_messages(self, queue_name: str, max_count: int, timeout_seconds: float) -> List[ReceivedMessage]:
+        """Waits up to timeout_seconds for messages and returns up to max_count of them."""
+
+    @abstractmethod
+    def ack(self, queue_name: str, delivery_tags: Iterable[Hashable]) -> None:
+        """Removes the processed messages from the queue."""
+
+    @abstractmethod
+    def nack(self, queue_name: str, delivery_tags: Iterable[Hashable], requeue: bool = False) -> None:
+        """Rejects the messages - they are delivered again only when requeued."""
+
+    @abstractmethod
+    def get_queue_stats(self, queue_name: str) -> QueueStats:
+        """Number of messages ready for delivery and consumers of the queue."""
+
+    def get_publish_metrics(self) -> Optional[Dict[str, float]]:
+        """Latencies and counts of the publishes, when measured by the backend."""
+        return None
+
+    def close(self) -> None:
+        pass
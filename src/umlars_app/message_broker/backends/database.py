@@ -0,0 +1,112 @@
+import json
+import time
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from umlars_app import settings
+from umlars_app.models import BrokerQueueMessage
+from umlars_app.message_broker.backends.base import BrokerBackend, ReceivedMessage
+from umlars_app.message_broker.producer import PublishReport
+from umlars_app.message_broker.queues import QueueStats
+from umlars_app.utils.logging import get_new_sublogger
+
+
+logger = get_new_sublogger(__name__)
+
+DEAD_LETTER_QUEUE_SUFFIX = ".dead-letter"
+
+
+class DatabaseBrokerBackend(BrokerBackend):
+    """
+    Queues kept in a database table. Consumers claim batches of rows with SELECT ... FOR UPDATE SKIP LOCKED,
+    so they never receive the same message at once. Claimed message, which isn't acknowledged within
+    the visibility timeout, is delivered again - e.g. when its consumer was killed. Delivery tag contains
+    the delivery number, so a consumer which overran the timeout can't acknowledge the message delivered again.
+    Message delivered max_deliveries_count times is moved to the dead letter queue.
+    SKIP LOCKED is ignored by SQLite, where the writes are serialized anyway.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout_seconds: float = settings.MESSAGE_BROKER_DATABASE_VISIBILITY_TIMEOUT_SECONDS,
+        poll_interval_seconds: float = settings.MESSAGE_BROKER_DATABASE_POLL_INTERVAL_SECONDS,
+        max_deliveries_count: int = settings.MESSAGE_BROKER_DATABASE_MAX_DELIVERIES,
+    ) -> None:
+        self._visibility_timeout_seconds = visibility_timeout_seconds
+        self._poll_interval_seconds = poll_interval_seconds
+        self._max_deliveries_count = max_deliveries_count
+
+    def publish_messages(self, queue_name: str, keyed_messages: Iterable[Tuple[Hashable, dict]], priorities: Optional[Dict[Hashable, int]] = None) -> PublishReport:
+        priorities = priorities or {}
+        keyed_messages = list(keyed_messages)
+        # Rows are visible to the consumers together with the commit of the caller's transaction
+        BrokerQueueMessage.objects.bulk_create([
+            BrokerQueueMessage(queue_name=queue_name, body=json.dumps(message_data), priority=priorities.get(key) or 0)
+            for key, message_data in keyed_messages
+        ])
+        return PublishReport(confirmed_keys=[key for key, _ in keyed_messages], failed_keys=[])
+
+    def get_messages(self, queue_name: str, max_count: int, timeout_seconds: float) -> List[ReceivedMessage]:
+        deadline = time.monotonic() + timeout_seconds
+        while True:
+            if (received_messages := self._claim_messages(queue_name, max_count)):
+                return received_messages
+            remaining_seconds = deadline - time.monotonic()
+            if remaining_seconds <= 0:
+                return []
+            time.sleep(min(self._poll_interval_seconds, remaining_seconds))
+
+    def _claim_messages(self, queue_name: str, max_count: int) -> List[ReceivedMessage]:
+        now = timezone.now()
+        with transaction.atomic():
+            self._dead_letter_messages(queue_name, now)
+            claimed_messages = list(
+                self._get_ready_messages(queue_name, now).select_for_update(skip_locked=True)
+                .order_by("-priority", "id").only("id", "body", "delivery_count")[:max_count]
+            )
+            if claimed_messages:
+                BrokerQueueMessage.objects.filter(id__in=[message.id for message in claimed_messages]).update(
+                    claimed_until=now + timedelta(seconds=self._visibility_timeout_seconds), delivery_count=F("delivery_count") + 1
+                )
+        return [ReceivedMessage((message.id, message.delivery_count + 1), message.body.encode("utf-8")) for message in claimed_messages]
+
+    def _dead_letter_messages(self, queue_name: str, now) -> None:
+        """
+        Moves the messages which weren't acknowledged in any of their deliveries, so that they aren't delivered forever.
+        Deliveries are counted anew in the dead letter queue - otherwise reading it would move its messages further.
+        """
+        dead_lettered_count = self._get_ready_messages(queue_name, now).filter(delivery_count__gte=self._max_deliveries_count).update(
+            queue_name=f"{queue_name}{DEAD_LETTER_QUEUE_SUFFIX}", claimed_until=None, delivery_count=0
+        )
+        if dead_lettered_count:
+            logger.error(f"Moved {dead_lettered_count} messages delivered {self._max_deliveries_count} times to the dead letter queue of {queue_name}")
+
+    def ack(self, queue_name: str, delivery_tags: Iterable[Hashable]) -> None:
+        self._get_claimed_messages(queue_name, delivery_tags).delete()
+
+    def nack(self, queue_name: str, delivery_tags: Iterable[Hashable], requeue: bool = False) -> None:
+        messages = self._get_claimed_messages(queue_name, delivery_tags)
+        if requeue:
+            messages.update(claimed_until=None)
+        else:
+            messages.delete()
+
+    def _get_claimed_messages(self, queue_name: str, delivery_tags: Iterable[Hashable]):
+        """Messages still claimed with the given deliveries - not the ones delivered again since then."""
+        deliveries = [Q(id=message_id, delivery_count=delivery_count) for message_id, delivery_count in delivery_tags]
+        if not deliveries:
+            return BrokerQueueMessage.objects.none()
+        return BrokerQueueMessage.objects.filter(reduce(or_, deliveries), queue_name=queue_name)
+
+    def get_queue_stats(self, queue_name: str) -> QueueStats:
+        # Consumers aren't registered in the database - the queue is assumed to be consumed
+        return QueueStats(self._get_ready_messages(queue_name, timezone.now()).count(), 1)
+
+    def _get_ready_messages(self, queue_name: str, now):
+        return BrokerQueueMessage.objects.filter(queue_name=queue_name).filter(Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
@@ -0,0 +1,107 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from umlars_app.message_broker.backends.base import BrokerBackend, ReceivedMessage
+from umlars_app.message_broker.producer import PublishReport
+from umlars_app.message_broker.queues import QueueStats
+
+
+class _MemoryQueue:
+    def __init__(self) -> None:
+        self.condition = threading.Condition()
+        # Entries are (-priority, sequence number, body) - higher priority first, then in the order of publishing
+        self.ready_messages: List[Tuple[int, int, bytes]] = []
+        self.unacked_messages: Dict[int, Tuple[int, int, bytes]] = dict()
+        self.delivery_tags = itertools.count(1)
+        self.consumers_count = 0
+
+
+_queues: Dict[str, _MemoryQueue] = defaultdict(_MemoryQueue)
+_queues_lock = threading.Lock()
+_sequence_numbers = itertools.count()
+
+
+def _get_queue(queue_name: str) -> _MemoryQueue:
+    with _queues_lock:
+        return _queues[queue_name]
+
+
+def purge_memory_queues() -> None:
+    with _queues_lock:
+        _queues.clear()
+
+
+class MemoryBrokerBackend(BrokerBackend):
+    """
+    Queues kept in the memory of the process, shared by all its backend instances. Publishing is confirmed immediately.
+    Intended for tests and load tests - messages are lost with the process and aren't visible to other processes.
+    """
+
+    def __init__(self) -> None:
+        self._consumed_queues_names = set()
+
+    def publish_messages(self, queue_name: str, keyed_messages: Iterable[Tuple[Hashable, dict]], priorities: Optional[Dict[Hashable, int]] = None) -> PublishReport:
+        priorities = priorities or {}
+        queue = _get_queue(queue_name)
+        confirmed_keys = list()
+        with queue.condition:
+            for key, message_data in keyed_messages:
+                body = json.dumps(message_data).encode("utf-8")
+                heapq.heappush(queue.ready_messages, (-(priorities.get(key) or 0), next(_sequence_numbers), body))
+                confirmed_keys.append(key)
+            queue.condition.notify_all()
+        return PublishReport(confirmed_keys=confirmed_keys, failed_keys=[])
+
+    def get_messages(self, queue_name: str, max_count: int, timeout_seconds: float) -> List[ReceivedMessage]:
+        queue = _get_queue(queue_name)
+        deadline = time.monotonic() + timeout_seconds
+        with queue.condition:
+            if queue_name not in self._consumed_queues_names:
+                self._consumed_queues_names.add(queue_name)
+                queue.consumers_count += 1
+
+            while not queue.ready_messages:
+                remaining_seconds = deadline - time.monotonic()
+                if remaining_seconds <= 0:
+                    return []
+                queue.condition.wait(remaining_seconds)
+
+            received_messages = list()
+            while queue.ready_messages and len(received_messages) < max_count:
+                entry = heapq.heappop(queue.ready_messages)
+                delivery_tag = next(queue.delivery_tags)
+                queue.unacked_messages[delivery_tag] = entry
+                received_messages.append(ReceivedMessage(delivery_tag, entry[2]))
+            return received_messages
+
+    def ack(self, queue_name: str, delivery_tags: Iterable[Hashable]) -> None:
+        queue = _get_queue(queue_name)
+        with queue.condition:
+            for delivery_tag in delivery_tags:
+                queue.unacked_messages.pop(delivery_tag, None)
+
+    def nack(self, queue_name: str, delivery_tags: Iterable[Hashable], requeue: bool = False) -> None:
+        queue = _get_queue(queue_name)
+        with queue.condition:
+            for delivery_tag in delivery_tags:
+                entry = queue.unacked_messages.pop(delivery_tag, None)
+                if entry is not None and requeue:
+                    heapq.heappush(queue.ready_messages, entry)
+            queue.condition.notify_all()
+
+    def get_queue_stats(self, queue_name: str) -> QueueStats:
+        queue = _get_queue(queue_name)
+        with queue.condition:
+            return QueueStats(len(queue.ready_messages), queue.consumers_count)
+
+    def close(self) -> None:
+        for queue_name in self._consumed_queues_names:
+            queue = _get_queue(queue_name)
+            with queue.condition:
+                queue.consumers_count -= 1
+        self._consumed_queues_names.clear()
@@ -0,0 +1,125 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import pika
+
+from umlars_app import settings
+from umlars_app.exceptions import QueueUnavailableError
+from umlars_app.message_broker.backends.base import BrokerBackend, ReceivedMessage
+from umlars_app.message_broker.producer import MessageBrokerProducer, MessageBrokerProducerPool, PublishReport
+from umlars_app.message_broker.queues import QueueStats, fetch_queue_stats, get_connection_parameters, get_queue_arguments
+from umlars_app.utils.logging import get_new_sublogger
+
+
+class RabbitMQBrokerBackend(BrokerBackend):
+    """
+    Backend publishing with confirms through a pool of long-lived connections, which are health checked
+    and replaced when a publish fails. Messages are received over a separate connection, on a single channel
+    with a consumer registered for each polled queue (shard). Prefetch limits the unacknowledged messages
+    of each consumer - they wait in the buffer of their queue until it is polled.
+    Delivery tags are valid only on the channel which delivered them, so they carry the generation of the channel.
+    Tags of a channel lost since then are dropped, as the broker delivers their messages again anyway.
+    """
+
+    def __init__(self, rabbitmq_host: str = settings.MESSAGE_BROKER_HOST, prefetch_count: int = settings.MESSAGE_BROKER_PREFETCH_COUNT) -> None:
+        self._logger = get_new_sublogger(self.__class__.__name__)
+        self._rabbitmq_host = rabbitmq_host
+        self._prefetch_count = prefetch_count
+        self._producer_pool = MessageBrokerProducerPool(rabbitmq_host=rabbitmq_host)
+        # Passive declaration of a missing queue closes the channel, so the stats aren't read on the consuming one
+        self._producer = MessageBrokerProducer(queue_name=settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME, rabbitmq_host=rabbitmq_host)
+        self._connection = None
+        self._channel = None
+        self._channel_generation = 0
+        self._delivered_messages: Dict[str, Deque[ReceivedMessage]] = dict()
+
+    def publish_messages(self, queue_name: str, keyed_messages: Iterable[Tuple[Hashable, dict]], priorities: Optional[Dict[Hashable, int]] = None) -> PublishReport:
+        return self._producer_pool.send_messages_with_confirms(keyed_messages, queue_name=queue_name, priorities=priorities)
+
+    def get_messages(self, queue_name: str, max_count: int, timeout_seconds: float) -> List[ReceivedMessage]:
+        deadline = time.monotonic() + timeout_seconds
+        try:
+            channel = self._get_consuming_channel()
+            if queue_name not in self._delivered_messages:
+                self._consume_queue(channel, queue_name)
+            delivered_messages = self._delivered_messages[queue_name]
+            # Services the heartbeats and collects the messages delivered since the last call
+            self._connection.process_data_events(time_limit=0)
+            while not delivered_messages and (remaining_seconds := deadline - time.monotonic()) > 0:
+                self._connection.process_data_events(time_limit=remaining_seconds)
+        except pika.exceptions.AMQPError as ex:
+            self._logger.error(f"Failed to receive messages from {queue_name}: {ex}")
+            self._close_consuming_connection()
+            raise QueueUnavailableError(f"Failed to receive messages from {queue_name}") from ex
+        return [delivered_messages.popleft() for _ in range(min(max_count, len(delivered_messages)))]
+
+    def ack(self, queue_name: str, delivery_tags: Iterable[Hashable]) -> None:
+        self._settle(delivery_tags, lambda delivery_tag: self._channel.basic_ack(delivery_tag=delivery_tag))
+
+    def nack(self, queue_name: str, delivery_tags: Iterable[Hashable], requeue: bool = False) -> None:
+        self._settle(delivery_tags, lambda delivery_tag: self._channel.basic_nack(delivery_tag=delivery_tag, requeue=requeue))
+
+    def _settle(self, delivery_tags: Iterable[Hashable], settle_delivery: Callable[[int], None]) -> None:
+        delivery_tags = list(delivery_tags)
+        is_channel_open = self._channel is not None and self._channel.is_open
+        current_delivery_tags = [delivery_tag for channel_generation, delivery_tag in delivery_tags if is_channel_open and channel_generation == self._channel_generation]
+        if (stale_delivery_tags_count := len(delivery_tags) - len(current_delivery_tags)):
+            # Acknowledging a tag unknown to the channel would make the broker close it
+            self._logger.warning(f"Dropped {stale_delivery_tags_count} delivery tags of a closed channel - their messages are delivered again")
+
+        try:
+            for delivery_tag in current_delivery_tags:
+                settle_delivery(delivery_tag)
+        except pika.exceptions.AMQPError as ex:
+            self._logger.error(f"Failed to settle the messages: {ex}")
+            self._close_consuming_connection()
+            raise QueueUnavailableError("Failed to settle the messages") from ex
+
+    def _get_consuming_channel(self):
+        if self._connection is None or self._connection.is_closed:
+            self._connection = pika.BlockingConnection(get_connection_parameters(self._rabbitmq_host))
+            self._channel = None
+
+        if self._channel is None or self._channel.is_closed:
+            self._channel = self._connection.channel()
+            self._channel.basic_qos(prefetch_count=self._prefetch_count)
+            # Consumers and unacknowledged messages of the previous channel are gone with it
+            self._channel_generation += 1
+            self._delivered_messages = dict()
+            self._logger.info(f"Opened consuming channel number {self._channel_generation}")
+        return self._channel
+
+    def _consume_queue(self, channel, queue_name: str) -> None:
+        channel.queue_declare(queue=queue_name, durable=True, arguments=get_queue_arguments(queue_name))
+        delivered_messages = deque()
+        channel_generation = self._channel_generation
+
+        def on_message(ch, method, properties, body) -> None:
+            delivered_messages.append(ReceivedMessage((channel_generation, method.delivery_tag), body))
+
+        channel.basic_consume(queue=queue_name, on_message_callback=on_message, auto_ack=False)
+        self._delivered_messages[queue_name] = delivered_messages
+
+    def _close_consuming_connection(self) -> None:
+        try:
+            if self._connection is not None and not self._connection.is_closed:
+                self._connection.close()
+        except pika.exceptions.AMQPError as ex:
+            self._logger.debug(f"Error while closing the connection: {ex}")
+        finally:
+            self._connection = None
+            self._channel = None
+            self._delivered_messages = dict()
+
+    def get_queue_stats(self, queue_name: str) -> QueueStats:
+        with self._producer.connect_channel(queue_name=queue_name) as channel:
+            return fetch_queue_stats(channel, queue_name)
+
+    def get_publish_metrics(self) -> Optional[Dict[str, float]]:
+        return self._producer_pool.metrics.snapshot()
+
+    def close(self) -> None:
+        self._close_consuming_connection()
+        self._producer_pool.close()
+        self._producer.close()
@@ -0,0 +1,71 @@
+import base64
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, NamedTuple
+
+from umlars_app.utils.logging import get_new_sublogger
+
+
+logger = get_new_sublogger(__name__)
+
+
+class CapturedMessage(NamedTuple):
+    timestamp: float
+    queue_name: str
+    body: bytes
+
+
+class QueueCaptureWriter:
+    """
+    Appends the consumed messages to an NDJSON file - one {"t": timestamp, "q": queue, "b": body} object per line.
+    Bodies which aren't valid UTF-8 are saved in base64 under "b64" instead. Each line is written with a single
+    append, so that the threads and forked processes of the consumer can share the file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write(self, queue_name: str, body: bytes) -> None:
+        record = {"t": round(time.time(), 6), "q": queue_name}
+        try:
+            record["b"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            record["b64"] = base64.b64encode(body).decode("ascii")
+        try:
+            os.write(self._fd, (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+        except OSError as ex:
+            # Capture must never stop the consumption
+            logger.warning(f"Failed to capture message to {self.path}: {ex}")
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+_capture_writers: Dict[str, QueueCaptureWriter] = dict()
+_capture_writers_lock = threading.Lock()
+
+
+def get_capture_writer(path: str) -> QueueCaptureWriter:
+    """Writer shared by all consumers of the process capturing to the same file."""
+    with _capture_writers_lock:
+        if path not in _capture_writers:
+            _capture_writers[path] = QueueCaptureWriter(path)
+            logger.info(f"Capturing consumed messages to {path}")
+        return _capture_writers[path]
+
+
+def read_capture(path: str) -> Iterator[CapturedMessage]:
+    with open(path, encoding="utf-8") as capture_file:
+        for line_number, line in enumerate(capture_file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                body = record["b"].encode("utf-8") if "b" in record else base64.b64decode(record["b64"])
+                yield CapturedMessage(record["t"], record["q"], body)
+            except (ValueError, KeyError) as ex:
+                # Last line may be cut off when the consumer was killed while writing
+                logger.warning(f"Skipping malformed line {line_number} of {path}: {ex}")
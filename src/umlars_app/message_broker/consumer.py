@@ -1,43 +1,70 @@
-from typing import Optional
+from typing import Optional, List, NamedTuple, Tuple, Callable
 import json
+import time
 
 import pika
 
 from umlars_app import settings
 from umlars_app.exceptions import QueueUnavailableError, NotYetAvailableError, InputDataError
 from umlars_app.utils.logging import get_new_sublogger
+from umlars_app.message_broker.queues import get_queue_arguments
+from umlars_app.message_broker.backends import BrokerBackend, ReceivedMessage, create_broker_backend
+from umlars_app.message_broker.capture import get_capture_writer
 from umlars_app.rest.serializers import UmlFileTranslationStatusSerializer
-from umlars_app.models import UmlFile, ProcessStatus
-from umlars_app.utils.connections_utils import retry
+from umlars_app.message_broker.messages import TranslationStatusMessage, decode_translation_status_message
+from umlars_app.models import UmlFile, UmlModelSummary, ProcessStatus
+from umlars_app.utils.connections_utils import retry, calculate_backoff_delay
+from umlars_app.utils.fan_out_utils import TERMINAL_PROCESS_STATES, is_fan_out_enabled, update_fan_in_progress
 from django.db import transaction
 
 
+class PendingMessage(NamedTuple):
+    delivery_tag: int
+    body: bytes
+
+
 class RabbitMQConsumer:
-    def __init__(self, queue_name: str, rabbitmq_host: str) -> None:
+    def __init__(self, queue_name: str, rabbitmq_host: str, batch_size: int = settings.MESSAGE_BROKER_CONSUMER_BATCH_SIZE, batch_timeout_ms: int = settings.MESSAGE_BROKER_CONSUMER_BATCH_TIMEOUT_MS, prefetch_count: int = settings.MESSAGE_BROKER_PREFETCH_COUNT, on_messages_processed: Optional[Callable[[int], None]] = None, queues_names: Optional[List[str]] = None, capture_path: Optional[str] = settings.MESSAGE_BROKER_CONSUMER_CAPTURE_PATH) -> None:
         self._logger = get_new_sublogger(self.__class__.__name__)
         self._queue_name = queue_name
+        # Shards of the queue assigned to the consumer - by default the queue isn't sharded
+        self._queues_names = list(queues_names or [queue_name])
         self._rabbitmq_host = rabbitmq_host
         self._connection = None
         self._channel = None
         self._queue = None
+        self._prefetch_count = max(prefetch_count, batch_size)
+        self._batch_size = batch_size
+        self._batch_timeout_ms = batch_timeout_ms
+        self._pending_batch: List[PendingMessage] = []
+        self._batch_timer_id = None
+        self._on_messages_processed = on_messages_processed
+        self._capture_writer = get_capture_writer(capture_path) if capture_path else None
+        self._is_stopped = False
+        self.reconnects_count = 0
+        self.channel_recoveries_count = 0
+
+    @property
+    def is_batch_mode(self) -> bool:
+        return self._batch_size > 1
 
     @retry(exception_class_raised_when_all_attempts_failed=QueueUnavailableError)
     def connect_channel(self, rabbitmq_host: Optional[str] = None, queue_name: Optional[str] = None, is_queue_durable: bool = True) -> None:
         try:
             if self._connection and not self._connection.is_closed:
                 self._connection.close()
+            # Timers of the previous connection never fire after it is closed
+            self._batch_timer_id = None
 
             rabbitmq_host = rabbitmq_host or self._rabbitmq_host
-            queue_name = queue_name or self._queue_name
 
-            self._logger.info(f"Connecting to RabbitMQ channel and queue: {rabbitmq_host}, {queue_name}...")
+            self._logger.info(f"Connecting to RabbitMQ channel and queues: {rabbitmq_host}, {queue_name or ', '.join(self._queues_names)}...")
             credentials = pika.PlainCredentials(settings.MESSAGE_BROKER_USER, settings.MESSAGE_BROKER_PASSWORD)
             parameters = pika.ConnectionParameters(host=rabbitmq_host, port=settings.MESSAGE_BROKER_PORT, credentials=credentials)
             self._connection = pika.BlockingConnection(parameters)
-            self._channel = self._connection.channel()
-            self._channel.queue_declare(queue=queue_name, durable=is_queue_durable)
+            self._open_channel(queue_name, is_queue_durable)
 
-            self._logger.info("Connected to RabbitMQ channel and queue")
+            self._logger.info("Connected to RabbitMQ channel and queues")
         except pika.exceptions.AMQPConnectionError as ex:
             error_message = f"Failed to connect to the channel: {ex}"
             self._logger.error(error_message)
@@ -46,65 +73,285 @@ class RabbitMQConsumer:
             self._logger.error(f"Unexpected error: {ex}")
             raise QueueUnavailableError("Unexpected error while connecting to the channel") from ex
 
+    def _open_channel(self, queue_name: Optional[str] = None, is_queue_durable: bool = True) -> None:
+        self._channel = self._connection.channel()
+        for declared_queue_name in [queue_name] if queue_name else self._queues_names:
+            self._channel.queue_declare(queue=declared_queue_name, durable=is_queue_durable, arguments=get_queue_arguments(declared_queue_name))
+        self._channel.basic_qos(prefetch_count=self._prefetch_count)
+        # Unacknowledged messages of the previous channel are redelivered by the broker
+        self._pending_batch = []
+        if self._batch_timer_id is not None:
+            # Timer of the same connection would flush the messages of the new channel through the closed one
+            self._connection.remove_timeout(self._batch_timer_id)
+            self._batch_timer_id = None
+
     def _callback(self, ch, method, properties, body) -> None:
+        self._capture_message(method.routing_key, body)
+        if self.is_batch_mode:
+            self._buffer_message(ch, PendingMessage(method.delivery_tag, body))
+            return
+
         self._logger.info(f"Callback execution started with body: {body}")
 
         try:
-            serializer = self._deserialize_message(body)
-            self._logger.info(f"Deserialized message: {serializer.validated_data}")
-            self.process_message(serializer)
+            status_message = self._deserialize_message(body)
+            self._logger.info(f"Deserialized message: {status_message}")
+            self.process_message(status_message)
             ch.basic_ack(delivery_tag=method.delivery_tag)
             self._logger.info("Message acknowledged")
+            self._report_processed_messages(1)
         except Exception as ex:
             self._logger.error(f"Failed to process message: {ex}")
             ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
-    def _deserialize_message(self, body: bytes) -> UmlFileTranslationStatusSerializer:
-        serializer = UmlFileTranslationStatusSerializer(data=json.loads(body), partial=True)
+    def _buffer_message(self, ch, message: PendingMessage) -> None:
+        self._pending_batch.append(message)
+        if len(self._pending_batch) >= self._batch_size:
+            self._flush_batch(ch)
+        elif self._batch_timer_id is None:
+            self._batch_timer_id = self._connection.call_later(self._batch_timeout_ms / 1000, lambda: self._flush_batch(ch))
+
+    def _flush_batch(self, ch) -> None:
+        if ch is not self._channel:
+            self._logger.warning("Batch flush of a closed channel skipped - its messages are redelivered by the broker")
+            return
+
+        if self._batch_timer_id is not None:
+            self._connection.remove_timeout(self._batch_timer_id)
+            self._batch_timer_id = None
+
+        batch, self._pending_batch = self._pending_batch, []
+        if batch:
+            self._process_batch(ch, batch)
+
+    def _process_batch(self, ch, batch: List[PendingMessage]) -> None:
+        self._logger.info(f"Processing batch of {len(batch)} messages")
+        deserialized_messages = []
+        for message in batch:
+            try:
+                deserialized_messages.append((message, self._deserialize_message(message.body)))
+            except Exception as ex:
+                self._logger.error(f"Failed to deserialize message from batch: {ex}")
+                ch.basic_nack(delivery_tag=message.delivery_tag, requeue=False)
+
+        if not deserialized_messages:
+            return
+
+        try:
+            self.process_messages([status_message for _, status_message in deserialized_messages])
+            # Messages which failed deserialization are already nacked - multiple ack has to reference the last outstanding delivery tag
+            last_message, _ = deserialized_messages[-1]
+            ch.basic_ack(delivery_tag=last_message.delivery_tag, multiple=True)
+            self._logger.info(f"Batch of {len(deserialized_messages)} messages acknowledged")
+            self._report_processed_messages(len(deserialized_messages))
+        except Exception as ex:
+            self._logger.warning(f"Failed to process batch: {ex}. Falling back to processing messages one by one")
+            for message, status_message in deserialized_messages:
+                try:
+                    self.process_message(status_message)
+                    ch.basic_ack(delivery_tag=message.delivery_tag)
+                    self._report_processed_messages(1)
+                except Exception as ex:
+                    self._logger.error(f"Failed to process message: {ex}")
+                    ch.basic_nack(delivery_tag=message.delivery_tag, requeue=False)
+
+    def _capture_message(self, queue_name: str, body: bytes) -> None:
+        if self._capture_writer is not None:
+            self._capture_writer.write(queue_name, body)
+
+    def _report_processed_messages(self, messages_count: int) -> None:
+        if self._on_messages_processed is not None:
+            self._on_messages_processed(messages_count)
+
+    def _deserialize_message(self, body: bytes) -> TranslationStatusMessage:
+        payload = json.loads(body)
+        if (status_message := decode_translation_status_message(payload)) is not None:
+            return status_message
+
+        # Unknown schema versions and non-trivial payloads are validated by the serializer
+        serializer = UmlFileTranslationStatusSerializer(data=payload, partial=True)
         if not serializer.is_valid():
             error_message = f"Failed to deserialize message: {serializer.errors}"
             self._logger.error(error_message)
             raise InputDataError(error_message)
-        return serializer
+        return TranslationStatusMessage.from_validated_data(serializer.validated_data, serializer.context.get('message'))
 
-    def process_message(self, serializer: UmlFileTranslationStatusSerializer) -> None:
-        if (message_from_translation_service := serializer.context.get('message')):
-            self._logger.info(f"Message from translation service: {message_from_translation_service}")
+    def process_message(self, status_message: TranslationStatusMessage) -> None:
+        if status_message.message:
+            self._logger.info(f"Message from translation service: {status_message.message}")
 
+        file_id, state, process_id = self._get_status_transition(status_message)
         with transaction.atomic():
-            try:
-                uml_file = UmlFile.objects.get(id=serializer.validated_data['id'])
-            except UmlFile.DoesNotExist as ex:
-                error_message = f"Failed to get UmlFile: {ex}"
+            previous_state = UmlFile.objects.transition_state(file_id, state, process_id)
+            if previous_state is not None:
+                UmlModelSummary.objects.apply_state_transitions([(file_id, previous_state, state)])
+
+        if previous_state is None:
+            if not UmlFile.objects.filter(id=file_id).exists():
+                error_message = f"Failed to get UmlFile with ID: {file_id}"
                 self._logger.error(error_message)
-                raise InputDataError(error_message) from ex
-            
-            self._logger.debug(f"Processing UmlFile: {uml_file}\n with status: {serializer.validated_data.get('state')} and current state: {uml_file.state}")
-            self._logger.debug(f"Received process ID: {serializer.validated_data.get('last_process_id')} and current last process ID: {uml_file.last_process_id}")
+                raise InputDataError(error_message)
+            self._logger.info(f"Transition of UmlFile {file_id} to state {state} for process ID {process_id} is not allowed. Skipping...")
+        elif state in TERMINAL_PROCESS_STATES and is_fan_out_enabled():
+            update_fan_in_progress([file_id])
+
+    def process_messages(self, status_messages: List[TranslationStatusMessage]) -> None:
+        for status_message in status_messages:
+            if status_message.message:
+                self._logger.info(f"Message from translation service: {status_message.message}")
+
+        # Files are updated in the order of their IDs, so that concurrent batches lock them in the same order
+        status_transitions = sorted((self._get_status_transition(status_message) for status_message in status_messages), key=lambda transition: transition[0])
+        with transaction.atomic():
+            states_transitions: List[Tuple[int, int, int]] = list()
+            rejected_transitions = list()
+            for file_id, state, process_id in status_transitions:
+                previous_state = UmlFile.objects.transition_state(file_id, state, process_id)
+                if previous_state is None:
+                    rejected_transitions.append((file_id, state, process_id))
+                else:
+                    states_transitions.append((file_id, previous_state, state))
+
+            if rejected_transitions:
+                ids_of_rejected_files = {file_id for file_id, _, _ in rejected_transitions}
+                if (ids_of_missing_files := ids_of_rejected_files - set(UmlFile.objects.filter(id__in=ids_of_rejected_files).values_list("id", flat=True))):
+                    raise InputDataError(f"Failed to get UmlFiles with IDs: {ids_of_missing_files}")
+                for file_id, state, process_id in rejected_transitions:
+                    self._logger.info(f"Transition of UmlFile {file_id} to state {state} for process ID {process_id} is not allowed. Skipping...")
+
+            UmlModelSummary.objects.apply_state_transitions(states_transitions)
+            self._logger.info(f"Applied {len(states_transitions)} status transitions from batch of {len(status_messages)} messages")
 
-            if serializer.validated_data.get('state') == ProcessStatus.RUNNING and uml_file.state != ProcessStatus.QUEUED:
-                process_id = serializer.validated_data.get('last_process_id')
-                last_process_id = uml_file.last_process_id
-                if process_id is not None and last_process_id == process_id:
-                    self._logger.info(f"Process ID {process_id} hase already been processed. Skipping...")
-                    return
+        # Translated files are visible to other consumers only after the commit
+        files_states = {file_id: state for file_id, _, state in states_transitions}
+        if is_fan_out_enabled() and (ids_of_translated_files := [file_id for file_id, state in files_states.items() if state in TERMINAL_PROCESS_STATES]):
+            update_fan_in_progress(ids_of_translated_files)
 
-            serializer.instance = uml_file
-            serializer.save()
+    def _get_status_transition(self, status_message: TranslationStatusMessage) -> Tuple[int, ProcessStatus, Optional[str]]:
+        if status_message.state is None:
+            raise InputDataError(f"Status message for UmlFile {status_message.id} does not contain the state")
+        return status_message.id, status_message.state, status_message.process_id
 
     def start_consuming(self) -> None:
-        try:
+        """Consumes messages until stopped, recovering the channel or the whole connection when the broker drops them."""
+        self._is_stopped = False
+        recovery_attempt_number = 0
+        while not self._is_stopped:
+            consuming_started_at = time.monotonic()
+            try:
+                self._ensure_channel()
+                for queue_name in self._queues_names:
+                    self._channel.basic_consume(queue=queue_name, on_message_callback=self._callback, auto_ack=False)
+                self._logger.info("Starting to consume messages")
+                self._channel.start_consuming()
+            except (pika.exceptions.AMQPError, QueueUnavailableError) as ex:
+                self._logger.error(f"Consuming interrupted: {ex}")
+            except Exception as ex:
+                self._logger.error(f"Unexpected error during messages consumption: {ex}")
+                raise QueueUnavailableError("Unexpected error during messages consumption") from ex
+
+            if self._is_stopped:
+                break
+
+            if time.monotonic() - consuming_started_at > settings.MESSAGE_BROKER_RECONNECT_MAX_DELAY_SECONDS:
+                recovery_attempt_number = 0
+            delay_seconds = calculate_backoff_delay(recovery_attempt_number, settings.MESSAGE_BROKER_RECONNECT_BASE_DELAY_SECONDS, settings.MESSAGE_BROKER_RECONNECT_MAX_DELAY_SECONDS)
+            recovery_attempt_number += 1
+            self._logger.info(f"Recovering consumer in {delay_seconds:.1f}s (attempt {recovery_attempt_number})")
+            time.sleep(delay_seconds)
+
+        self._close_connection()
+
+    def stop(self) -> None:
+        """Thread-safe request to finish consuming."""
+        self._is_stopped = True
+        if self._connection is not None and self._connection.is_open:
+            self._connection.add_callback_threadsafe(self._stop_consuming)
+
+    def _stop_consuming(self) -> None:
+        if self._channel is not None and self._channel.is_open:
+            self._channel.stop_consuming()
+
+    def _ensure_channel(self) -> None:
+        if self._connection is None:
+            self.connect_channel()
+        elif self._connection.is_closed:
+            self.reconnects_count += 1
+            self._logger.info(f"Reconnecting to RabbitMQ (reconnect number {self.reconnects_count})")
             self.connect_channel()
+        elif self._channel is None or self._channel.is_closed:
+            self.channel_recoveries_count += 1
+            self._logger.info(f"Reopening the channel (recovery number {self.channel_recoveries_count})")
+            self._open_channel()
+
+    def _close_connection(self) -> None:
+        try:
+            if self._connection is not None and not self._connection.is_closed:
+                self._connection.close()
+        except pika.exceptions.AMQPError as ex:
+            self._logger.debug(f"Error while closing the connection: {ex}")
 
-            self._channel.basic_consume(queue=self._queue_name, on_message_callback=self._callback, auto_ack=False)
-            self._logger.info("Starting to consume messages")
-            self._channel.start_consuming()
-        except pika.exceptions.ConnectionClosed as ex:
-            self._logger.error(f"Connection closed: {ex}")
-            raise QueueUnavailableError("Connection closed by broker") from ex
-        except QueueUnavailableError as ex:
-            self._logger.error(f"Queue unavailable: {ex}")
-            raise QueueUnavailableError("Queue unavailable") from ex
+
+class BrokerBackendConsumer(RabbitMQConsumer):
+    """Consumer pulling batches of messages from the broker backend selected in the settings."""
+
+    def __init__(self, queue_name: str, rabbitmq_host: str, batch_size: int = settings.MESSAGE_BROKER_CONSUMER_BATCH_SIZE, batch_timeout_ms: int = settings.MESSAGE_BROKER_CONSUMER_BATCH_TIMEOUT_MS, prefetch_count: int = settings.MESSAGE_BROKER_PREFETCH_COUNT, on_messages_processed: Optional[Callable[[int], None]] = None, queues_names: Optional[List[str]] = None, broker_backend: Optional[BrokerBackend] = None) -> None:
+        super().__init__(queue_name, rabbitmq_host, batch_size, batch_timeout_ms, prefetch_count, on_messages_processed, queues_names)
+        self._broker_backend = broker_backend or create_broker_backend(rabbitmq_host=rabbitmq_host)
+
+    def start_consuming(self) -> None:
+        self._is_stopped = False
+        self._logger.info(f"Starting to consume messages with {self._broker_backend.__class__.__name__}")
+        recovery_attempt_number = 0
+        try:
+            # Waiting time is split between the assigned shards, which are polled in turns
+            timeout_seconds = self._batch_timeout_ms / 1000 / len(self._queues_names)
+            while not self._is_stopped:
+                queue_name = self._queues_names[0]
+                self._queues_names.append(self._queues_names.pop(0))
+                try:
+                    received_messages = self._broker_backend.get_messages(queue_name, self._batch_size, timeout_seconds)
+                    recovery_attempt_number = 0
+                except Exception as ex:
+                    delay_seconds = calculate_backoff_delay(recovery_attempt_number, settings.MESSAGE_BROKER_RECONNECT_BASE_DELAY_SECONDS, settings.MESSAGE_BROKER_RECONNECT_MAX_DELAY_SECONDS)
+                    recovery_attempt_number += 1
+                    self._logger.error(f"Failed to receive messages: {ex}. Retrying in {delay_seconds:.1f}s")
+                    time.sleep(delay_seconds)
+                    continue
+
+                if received_messages:
+                    self._process_received_messages(queue_name, received_messages)
+        finally:
+            self._broker_backend.close()
+
+    def stop(self) -> None:
+        """Consuming finishes after the current batch, or when waiting for messages times out."""
+        self._is_stopped = True
+
+    def _process_received_messages(self, queue_name: str, received_messages: List[ReceivedMessage]) -> None:
+        deserialized_messages = []
+        for message in received_messages:
+            self._capture_message(queue_name, message.body)
+            try:
+                deserialized_messages.append((message, self._deserialize_message(message.body)))
+            except Exception as ex:
+                self._logger.error(f"Failed to deserialize message: {ex}")
+                self._broker_backend.nack(queue_name, [message.delivery_tag])
+
+        if not deserialized_messages:
+            return
+
+        try:
+            self.process_messages([status_message for _, status_message in deserialized_messages])
+            self._broker_backend.ack(queue_name, [message.delivery_tag for message, _ in deserialized_messages])
+            self._report_processed_messages(len(deserialized_messages))
         except Exception as ex:
-            self._logger.error(f"Unexpected error during messages consumption: {ex}")
-            raise QueueUnavailableError("Unexpected error during messages consumption") from ex
+            self._logger.warning(f"Failed to process batch: {ex}. Falling back to processing messages one by one")
+            for message, status_message in deserialized_messages:
+                try:
+                    self.process_message(status_message)
+                    self._broker_backend.ack(queue_name, [message.delivery_tag])
+                    self._report_processed_messages(1)
+                except Exception as ex:
+                    self._logger.error(f"Failed to process message: {ex}")
+                    self._broker_backend.nack(queue_name, [message.delivery_tag])
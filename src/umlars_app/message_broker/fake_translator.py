@@ -0,0 +1,72 @@
+import json
+import random
+import threading
+import uuid
+from typing import List, Optional
+
+from umlars_app import settings
+from umlars_app.models import ProcessStatus
+from umlars_app.message_broker.backends import BrokerBackend, ReceivedMessage
+from umlars_app.message_broker.sharding import get_shard_queues_names, get_shard_queue_name
+
+
+class FakeTranslator:
+    """
+    Stand-in for the translation service, used to benchmark the pipeline. Consumes the translation requests
+    and reports every source file as RUNNING, then - after the simulated latency - as FINISHED or FAILED.
+    """
+
+    def __init__(
+        self,
+        broker_backend: BrokerBackend,
+        latency_seconds: float = 0.0,
+        latency_jitter_seconds: float = 0.0,
+        failure_rate: float = 0.0,
+        batch_size: int = 10,
+        uploaded_files_queue_name: str = settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME,
+        translated_models_queue_name: str = settings.MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME,
+        seed: Optional[int] = None,
+    ) -> None:
+        self._broker_backend = broker_backend
+        self._latency_seconds = latency_seconds
+        self._latency_jitter_seconds = latency_jitter_seconds
+        self._failure_rate = failure_rate
+        self._batch_size = batch_size
+        self._queues_names = get_shard_queues_names(uploaded_files_queue_name)
+        self._translated_models_queue_name = translated_models_queue_name
+        self._random = random.Random(seed)
+        self._is_stopped = threading.Event()
+        self.translated_requests_count = 0
+
+    def run(self) -> None:
+        try:
+            while not self._is_stopped.is_set():
+                for queue_name in self._queues_names:
+                    received_messages = self._broker_backend.get_messages(queue_name, self._batch_size, 0.05)
+                    if received_messages:
+                        self._translate(queue_name, received_messages)
+        finally:
+            self._broker_backend.close()
+
+    def stop(self) -> None:
+        self._is_stopped.set()
+
+    def _translate(self, queue_name: str, received_messages: List[ReceivedMessage]) -> None:
+        for received_message in received_messages:
+            translation_request = json.loads(received_message.body)
+            process_id = str(uuid.uuid4())
+            ids_of_files = translation_request["ids_of_source_files"]
+            self._report_status(translation_request["id"], ids_of_files, ProcessStatus.RUNNING, process_id)
+
+            self._is_stopped.wait(max(self._latency_seconds + self._random.uniform(-1, 1) * self._latency_jitter_seconds, 0))
+            state = ProcessStatus.FAILED if self._random.random() < self._failure_rate else ProcessStatus.FINISHED
+            self._report_status(translation_request["id"], ids_of_files, state, process_id)
+            self.translated_requests_count += 1
+
+        self._broker_backend.ack(queue_name, [received_message.delivery_tag for received_message in received_messages])
+
+    def _report_status(self, model_id: int, ids_of_files: List[int], state: ProcessStatus, process_id: str) -> None:
+        self._broker_backend.publish_messages(
+            get_shard_queue_name(self._translated_models_queue_name, model_id),
+            ((file_id, {"id": file_id, "state": int(state), "process_id": process_id}) for file_id in ids_of_files),
+        )
@@ -0,0 +1,58 @@
+from typing import Any, Dict, Optional
+
+from umlars_app.models import ProcessStatus, UmlFile
+
+
+TRANSLATION_STATUS_SCHEMA_VERSION = 1
+
+_PROCESS_STATUS_VALUES = frozenset(ProcessStatus.values)
+_PROCESS_ID_MAX_LENGTH = UmlFile._meta.get_field("last_process_id").max_length
+
+
+class TranslationStatusMessage:
+    """Status of the UmlFile translation reported by the translation service."""
+
+    __slots__ = ("id", "state", "process_id", "message")
+
+    def __init__(self, id: int, state: Optional[int] = None, process_id: Optional[str] = None, message: Optional[str] = None) -> None:
+        self.id = id
+        self.state = state
+        self.process_id = process_id
+        self.message = message
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(id={self.id}, state={self.state}, process_id={self.process_id})"
+
+    @classmethod
+    def from_validated_data(cls, validated_data: Dict[str, Any], message: Optional[str] = None) -> "TranslationStatusMessage":
+        return cls(validated_data["id"], validated_data.get("state"), validated_data.get("last_process_id"), message)
+
+
+def decode_translation_status_message(payload: Any) -> Optional[TranslationStatusMessage]:
+    """
+    Decodes the message in the current schema version without the serializer.
+    Returns None for any payload which is not trivially valid - such payload has to be validated by the serializer.
+    """
+    if type(payload) is not dict or payload.get("schema_version", TRANSLATION_STATUS_SCHEMA_VERSION) != TRANSLATION_STATUS_SCHEMA_VERSION:
+        return None
+
+    file_id = payload.get("id")
+    if type(file_id) is not int:
+        return None
+
+    state = payload.get("state")
+    if state is not None and (type(state) is not int or state not in _PROCESS_STATUS_VALUES):
+        return None
+
+    # Null, blank, padded and too long strings are left to the serializer to keep its validation rules
+    process_id = payload.get("process_id")
+    if "process_id" in payload and not (
+        type(process_id) is str and process_id and len(process_id) <= _PROCESS_ID_MAX_LENGTH and process_id == process_id.strip()
+    ):
+        return None
+
+    message = payload.get("message")
+    if "message" in payload and not (type(message) is str and message and message == message.strip()):
+        return None
+
+    return TranslationStatusMessage(file_id, state, process_id, message)
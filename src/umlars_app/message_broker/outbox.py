@@ -0,0 +1,259 @@
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional
+
+from django.db import transaction, connection as db_connection
+from django.db.models import Count, Exists, Min, OuterRef, QuerySet
+from django.utils import timezone
+
+from umlars_app import settings
+from umlars_app.models import TranslationOutboxMessage, OutboxMessageStatus, UmlFile, ProcessStatus, UserTranslationQuota
+from umlars_app.message_broker.admission import AdmissionController
+from umlars_app.message_broker.backends import BrokerBackend, create_broker_backend
+from umlars_app.message_broker.queues import QueueDepthSampler, sum_queues_stats
+from umlars_app.message_broker.sharding import get_shard_queues_names
+from umlars_app.utils.logging import get_new_sublogger
+from umlars_app.utils.connections_utils import calculate_backoff_delay
+
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class RelayBatchResult(NamedTuple):
+    published_count: int
+    failed_count: int
+
+
+class UserDispatchStats(NamedTuple):
+    user_id: Optional[int]
+    pending_count: int
+    in_flight_count: int
+    oldest_pending_created_at: Optional[datetime]
+    published_last_hour_count: int
+    mean_wait_seconds_last_hour: Optional[float]
+
+
+def allocate_fair_share_slots(backlogs: Dict[Hashable, int], weights: Dict[Hashable, int], slots_count: int) -> Dict[Hashable, int]:
+    """
+    Weighted round-robin - in each round every user gets as many slots as their weight, until the slots run out.
+    Users are served in the order of the backlogs, so the users waiting the longest get the remainder of the slots.
+    """
+    allocated_slots = defaultdict(int)
+    remaining_backlogs = {key: backlog for key, backlog in backlogs.items() if backlog > 0}
+    while slots_count > 0 and remaining_backlogs:
+        for key in list(remaining_backlogs):
+            granted_slots = min(max(weights.get(key, 1), 1), remaining_backlogs[key], slots_count)
+            allocated_slots[key] += granted_slots
+            remaining_backlogs[key] -= granted_slots
+            slots_count -= granted_slots
+            if remaining_backlogs[key] == 0:
+                del remaining_backlogs[key]
+            if slots_count == 0:
+                break
+    return dict(allocated_slots)
+
+
+def get_in_flight_messages() -> QuerySet:
+    """Published messages which are still being translated. Messages not completed within the timeout are considered lost."""
+    return TranslationOutboxMessage.objects.filter(
+        status=OutboxMessageStatus.PUBLISHED,
+        completed_at__isnull=True,
+        published_at__gte=timezone.now() - timedelta(seconds=settings.TRANSLATION_IN_FLIGHT_TIMEOUT_SECONDS),
+    )
+
+
+def collect_user_dispatch_stats() -> List[UserDispatchStats]:
+    now = timezone.now()
+    pending_by_user = {
+        row["user"]: row for row in TranslationOutboxMessage.objects.filter(status=OutboxMessageStatus.PENDING)
+        .values("user").annotate(pending_count=Count("id"), oldest_created_at=Min("created_at")).order_by()
+    }
+    in_flight_by_user = dict(get_in_flight_messages().values("user").annotate(in_flight_count=Count("id")).order_by().values_list("user", "in_flight_count"))
+
+    wait_seconds_by_user = defaultdict(list)
+    for user_id, created_at, published_at in TranslationOutboxMessage.objects.filter(published_at__gte=now - timedelta(hours=1)).values_list("user", "created_at", "published_at"):
+        wait_seconds_by_user[user_id].append((published_at - created_at).total_seconds())
+
+    stats = list()
+    for user_id in set(pending_by_user) | set(in_flight_by_user) | set(wait_seconds_by_user):
+        pending = pending_by_user.get(user_id, {})
+        wait_seconds = wait_seconds_by_user.get(user_id, [])
+        stats.append(UserDispatchStats(
+            user_id=user_id,
+            pending_count=pending.get("pending_count", 0),
+            in_flight_count=in_flight_by_user.get(user_id, 0),
+            oldest_pending_created_at=pending.get("oldest_created_at"),
+            published_last_hour_count=len(wait_seconds),
+            mean_wait_seconds_last_hour=sum(wait_seconds) / len(wait_seconds) if wait_seconds else None,
+        ))
+    return sorted(stats, key=lambda user_stats: user_stats.pending_count, reverse=True)
+
+
+class TranslationOutboxRelay:
+    """
+    Publishes pending outbox messages to the broker backend in batches.
+    Rows are locked with SKIP LOCKED, so multiple relays can run side by side without publishing a message twice.
+    Batch is shared between the users by weighted round-robin and every user has a limit of messages being translated,
+    so that a large upload of one user doesn't take the whole capacity of the translation service.
+    """
+
+    def __init__(
+        self,
+        rabbitmq_host: str = settings.MESSAGE_BROKER_HOST,
+        batch_size: int = settings.TRANSLATION_OUTBOX_BATCH_SIZE,
+        poll_interval_seconds: float = settings.TRANSLATION_OUTBOX_POLL_INTERVAL_SECONDS,
+        max_publish_attempts: int = settings.TRANSLATION_OUTBOX_MAX_PUBLISH_ATTEMPTS,
+        retention_hours: float = settings.TRANSLATION_OUTBOX_RETENTION_HOURS,
+        max_in_flight_messages_per_user: int = settings.TRANSLATION_MAX_IN_FLIGHT_MESSAGES_PER_USER,
+        broker_backend: Optional[BrokerBackend] = None,
+        admission_controller: Optional[AdmissionController] = None,
+        report: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self._logger = get_new_sublogger(self.__class__.__name__)
+        self._batch_size = batch_size
+        self._poll_interval_seconds = poll_interval_seconds
+        self._max_publish_attempts = max_publish_attempts
+        self._retention_hours = retention_hours
+        self._max_in_flight_messages_per_user = max_in_flight_messages_per_user
+        self._broker_backend = broker_backend or create_broker_backend(rabbitmq_host=rabbitmq_host)
+        self._admission_controller = admission_controller or self._create_admission_controller(settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME, rabbitmq_host)
+        self._report = report or self._logger.info
+        self._last_purge_time = float("-inf")
+        self._is_stopped = False
+
+    def run(self, run_once: bool = False) -> None:
+        """Relays the batches until stopped. Failed batch is retried after a backoff, as the messages wait in the outbox meanwhile."""
+        self._is_stopped = False
+        failed_attempt_number = 0
+        try:
+            while not self._is_stopped:
+                try:
+                    batch_result = self.relay_batch()
+                    self._purge_published_messages()
+                except Exception as ex:
+                    if run_once:
+                        raise
+                    delay_seconds = calculate_backoff_delay(failed_attempt_number, settings.MESSAGE_BROKER_RECONNECT_BASE_DELAY_SECONDS, settings.MESSAGE_BROKER_RECONNECT_MAX_DELAY_SECONDS)
+                    failed_attempt_number += 1
+                    self._logger.error(f"Failed to relay outbox messages: {ex}. Retrying in {delay_seconds:.1f}s (attempt {failed_attempt_number})")
+                    time.sleep(delay_seconds)
+                    continue
+
+                failed_attempt_number = 0
+                if batch_result.published_count or batch_result.failed_count:
+                    self._report(f"Published {batch_result.published_count} outbox messages, {batch_result.failed_count} failed")
+                    if (publish_metrics := self._broker_backend.get_publish_metrics()) is not None:
+                        self._logger.debug(f"Publish metrics: {publish_metrics}")
+                if run_once:
+                    return
+                # Full batch means there are probably more pending messages
+                if batch_result.published_count + batch_result.failed_count < self._batch_size:
+                    time.sleep(self._poll_interval_seconds)
+        finally:
+            self._broker_backend.close()
+            self._admission_controller.close()
+
+    def stop(self) -> None:
+        """Thread-safe request to finish relaying after the current batch."""
+        self._is_stopped = True
+
+    def _create_admission_controller(self, queue_name: str, rabbitmq_host: str) -> AdmissionController:
+        shard_queues_names = get_shard_queues_names(queue_name)
+        sampler = QueueDepthSampler(queue_name, rabbitmq_host, fetch_stats=lambda: sum_queues_stats(
+            self._broker_backend.get_queue_stats(shard_queue_name) for shard_queue_name in shard_queues_names
+        ))
+        return AdmissionController(queue_name, rabbitmq_host, sampler=sampler)
+
+    def relay_batch(self) -> RelayBatchResult:
+        try:
+            with transaction.atomic():
+                self._complete_translated_messages()
+                # Admission is checked even with an empty outbox, to keep the shared queue snapshot fresh
+                admitted_count = self._admission_controller.admit(self._batch_size)
+                outbox_messages = self._lock_fair_share_batch(admitted_count) if admitted_count else []
+                self._admission_controller.release(admitted_count - len(outbox_messages))
+                if not outbox_messages:
+                    return RelayBatchResult(0, 0)
+
+                failed_messages_ids = self._publish(outbox_messages)
+                self._mark_published([message for message in outbox_messages if message.id not in failed_messages_ids])
+                self._mark_failed([message for message in outbox_messages if message.id in failed_messages_ids])
+                return RelayBatchResult(len(outbox_messages) - len(failed_messages_ids), len(failed_messages_ids))
+        except Exception:
+            # Relay is long living, so the broken database connection has to be dropped explicitly
+            db_connection.close_if_unusable_or_obsolete()
+            raise
+
+    def _complete_translated_messages(self) -> None:
+        """Marks the messages as completed, when none of the model's files is waiting for the translation."""
+        files_being_translated = UmlFile.objects.filter(model=OuterRef("model"), state__in=(ProcessStatus.QUEUED, ProcessStatus.RUNNING))
+        get_in_flight_messages().filter(~Exists(files_being_translated)).update(completed_at=timezone.now())
+
+    def _lock_fair_share_batch(self, batch_size: int) -> List[TranslationOutboxMessage]:
+        pending_messages = TranslationOutboxMessage.objects.filter(status=OutboxMessageStatus.PENDING, available_at__lte=timezone.now())
+        # Users waiting the longest are served first
+        backlogs = dict(
+            pending_messages.values("user").annotate(pending_count=Count("id"), oldest_created_at=Min("created_at"))
+            .order_by("oldest_created_at").values_list("user", "pending_count")
+        )
+        if not backlogs:
+            return []
+
+        in_flight_counts = dict(get_in_flight_messages().values("user").annotate(in_flight_count=Count("id")).order_by().values_list("user", "in_flight_count"))
+        quotas = {quota.user_id: quota for quota in UserTranslationQuota.objects.filter(user_id__in=[user_id for user_id in backlogs if user_id is not None])}
+        for user_id in backlogs:
+            quota = quotas.get(user_id)
+            max_in_flight_messages = quota.max_in_flight_messages if quota is not None and quota.max_in_flight_messages is not None else self._max_in_flight_messages_per_user
+            backlogs[user_id] = min(backlogs[user_id], max(max_in_flight_messages - in_flight_counts.get(user_id, 0), 0))
+
+        weights = {user_id: quota.weight for user_id, quota in quotas.items()}
+        outbox_messages = list()
+        for user_id, slots_count in allocate_fair_share_slots(backlogs, weights, batch_size).items():
+            user_messages = pending_messages.filter(user=user_id) if user_id is not None else pending_messages.filter(user__isnull=True)
+            outbox_messages.extend(user_messages.select_for_update(skip_locked=True).order_by("-priority", "id")[:slots_count])
+
+        outbox_messages.sort(key=lambda message: (-message.priority, message.id))
+        return outbox_messages
+
+    def _publish(self, outbox_messages: List[TranslationOutboxMessage]) -> set:
+        messages_by_queue: Dict[str, List[TranslationOutboxMessage]] = defaultdict(list)
+        for outbox_message in outbox_messages:
+            messages_by_queue[outbox_message.queue_name].append(outbox_message)
+
+        failed_messages_ids = set()
+        for queue_name, queue_messages in messages_by_queue.items():
+            publish_report = self._broker_backend.publish_messages(
+                queue_name,
+                ((message.id, message.payload) for message in queue_messages),
+                priorities={message.id: message.priority for message in queue_messages},
+            )
+            failed_messages_ids.update(publish_report.failed_keys)
+        return failed_messages_ids
+
+    def _mark_published(self, outbox_messages: List[TranslationOutboxMessage]) -> None:
+        TranslationOutboxMessage.objects.filter(id__in=[message.id for message in outbox_messages]).update(
+            status=OutboxMessageStatus.PUBLISHED, published_at=timezone.now(), last_error=None
+        )
+
+    def _mark_failed(self, outbox_messages: List[TranslationOutboxMessage]) -> None:
+        for outbox_message in outbox_messages:
+            outbox_message.publish_attempts_count += 1
+            outbox_message.last_error = "Message was not confirmed by the broker"
+            outbox_message.available_at = timezone.now() + timedelta(seconds=calculate_backoff_delay(
+                outbox_message.publish_attempts_count - 1, settings.MESSAGE_BROKER_RECONNECT_BASE_DELAY_SECONDS, settings.MESSAGE_BROKER_RECONNECT_MAX_DELAY_SECONDS
+            ))
+            if outbox_message.publish_attempts_count >= self._max_publish_attempts:
+                self._logger.error(f"Giving up on outbox message {outbox_message.id} after {outbox_message.publish_attempts_count} attempts")
+                outbox_message.status = OutboxMessageStatus.FAILED
+        TranslationOutboxMessage.objects.bulk_update(outbox_messages, ["publish_attempts_count", "last_error", "available_at", "status"])
+
+    def _purge_published_messages(self) -> None:
+        if time.monotonic() - self._last_purge_time < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge_time = time.monotonic()
+        deleted_count, _ = TranslationOutboxMessage.objects.filter(
+            status=OutboxMessageStatus.PUBLISHED, published_at__lt=timezone.now() - timedelta(hours=self._retention_hours)
+        ).delete()
+        if deleted_count:
+            self._logger.info(f"Purged {deleted_count} published outbox messages")
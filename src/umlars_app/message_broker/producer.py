@@ -1,5 +1,9 @@
 import json
-from typing import Optional, Iterator
+import queue
+import threading
+import time
+from collections import deque
+from typing import Optional, Iterator, Iterable, Set, Dict, List, Tuple, Hashable, NamedTuple, Callable
 
 import pika
 from contextlib import contextmanager
@@ -7,10 +11,17 @@ from contextlib import contextmanager
 from umlars_app import settings
 from umlars_app.exceptions import QueueUnavailableError
 from umlars_app.utils.logging import get_new_sublogger
+from umlars_app.message_broker.queues import get_queue_arguments, get_connection_parameters
 from umlars_app.rest.serializers import UmlFilesTranslationQueueMessageSerializer
 from umlars_app.models import UmlModel
 
 
+class PublishReport(NamedTuple):
+    """Outcome of publishing with confirms - keys of the messages confirmed and not confirmed by the broker."""
+    confirmed_keys: List[Hashable]
+    failed_keys: List[Hashable]
+
+
 class MessageBrokerProducer:
     def __init__(self, queue_name: str, rabbitmq_host: str) -> None:
         self._logger = get_new_sublogger(self.__class__.__name__)
@@ -18,26 +29,28 @@ class MessageBrokerProducer:
         self._rabbitmq_host = rabbitmq_host
         self._connection = None
         self._channel = None
+        self._confirm_channel = None
         self._queue = None
+        self._declared_queues: Set[str] = set()
+        self.last_used_at = time.monotonic()
 
     @contextmanager
     def connect_channel(self, rabbitmq_host: Optional[str] = None, queue_name: Optional[str] = None, is_queue_durable: bool = True, reset_connection: bool = False, close_connection: bool = False) -> None:
         try:
             if not self._connection or reset_connection or self._connection.is_closed:
                 rabbitmq_host = rabbitmq_host or self._rabbitmq_host
-                queue_name = queue_name or self._queue_name
-
-                self._connection = pika.BlockingConnection(pika.ConnectionParameters(
-                    host=rabbitmq_host,
-                    port=settings.MESSAGE_BROKER_PORT,
-                    credentials=pika.PlainCredentials(
-                        username=settings.MESSAGE_BROKER_USER,
-                        password=settings.MESSAGE_BROKER_PASSWORD
-                    )
-                ))
-            self._channel = self._connection.channel()
-            self._channel.queue_declare(queue=queue_name, durable=is_queue_durable)
-            self._logger.info("Connected to RabbitMQ channel and queue")
+
+                self._connection = pika.BlockingConnection(get_connection_parameters(rabbitmq_host))
+                self._channel = None
+                self._confirm_channel = None
+                self._declared_queues = set()
+
+            if self._channel is None or self._channel.is_closed:
+                self._channel = self._connection.channel()
+                self._declared_queues = set()
+                self._logger.info("Connected to RabbitMQ channel")
+
+            self._declare_queue(queue_name or self._queue_name, is_queue_durable)
             yield self._channel
         except pika.exceptions.AMQPConnectionError as ex:
             self._logger.error(f"Failed to connect to the channel: {ex}")
@@ -48,25 +61,294 @@ class MessageBrokerProducer:
 
         finally:
             if close_connection:
+                self.close()
+
+    def _declare_queue(self, queue_name: str, is_queue_durable: bool = True) -> None:
+        # Declaration is a broker round trip, so it is done once per channel
+        if queue_name not in self._declared_queues:
+            self._channel.queue_declare(queue=queue_name, durable=is_queue_durable, arguments=get_queue_arguments(queue_name))
+            self._declared_queues.add(queue_name)
+
+    def is_healthy(self) -> bool:
+        if self._connection is None or not self._connection.is_open or self._channel is None or not self._channel.is_open:
+            return False
+        try:
+            # Services heartbeats and detects connections dropped by the broker
+            self._connection.process_data_events(time_limit=0)
+            return True
+        except pika.exceptions.AMQPError as ex:
+            self._logger.warning(f"Connection health check failed: {ex}")
+            return False
+
+    def close(self) -> None:
+        try:
+            if self._connection is not None and not self._connection.is_closed:
                 self._connection.close()
+        except pika.exceptions.AMQPError as ex:
+            self._logger.debug(f"Error while closing the connection: {ex}")
+        finally:
+            self._connection = None
+            self._channel = None
+            self._confirm_channel = None
+            self._declared_queues = set()
 
-    def send_message(self, message_data: dict) -> None:
-        with self.connect_channel(close_connection=True):
+    def send_message(self, message_data: dict, queue_name: Optional[str] = None, close_connection: bool = False, priority: Optional[int] = None) -> None:
+        queue_name = queue_name or self._queue_name
+        self.last_used_at = time.monotonic()
+        with self.connect_channel(queue_name=queue_name, close_connection=close_connection):
             try:
 
                 self._channel.basic_publish(
                     exchange='',
-                    routing_key=self._queue_name,
+                    routing_key=queue_name,
                     body=json.dumps(message_data),
                     properties=pika.BasicProperties(
                         delivery_mode=2,  # make message persistent
+                        priority=priority,
                     )
                 )
                 self._logger.info("Message sent")
             except Exception as ex:
                 self._logger.error(f"Error while sending message: {ex}")
+                # Connection is recreated on the next use
+                self.close()
                 raise ValueError(f"Error while sending message: {ex}") from ex
 
+    def send_messages_with_confirms(
+        self,
+        keyed_messages: Iterable[Tuple[Hashable, dict]],
+        queue_name: Optional[str] = None,
+        max_unconfirmed_messages: int = settings.MESSAGE_BROKER_PRODUCER_MAX_UNCONFIRMED_MESSAGES,
+        confirm_timeout_seconds: float = settings.MESSAGE_BROKER_PRODUCER_CONFIRM_TIMEOUT_SECONDS,
+        on_confirmed: Optional[Callable[[float], None]] = None,
+        priorities: Optional[Dict[Hashable, int]] = None,
+    ) -> PublishReport:
+        """
+        Publishes the messages without waiting for each confirm separately. Up to max_unconfirmed_messages
+        are in flight and the broker confirms them in batches (multiple acks).
+        Messages nacked, returned as unroutable, not confirmed in time or lost with the connection are reported as failed.
+        Priorities of the messages can be given by their keys.
+        """
+        queue_name = queue_name or self._queue_name
+        self.last_used_at = time.monotonic()
+        confirmed_keys, failed_keys = [], []
+        # Delivery tag -> (message key, publish time)
+        unconfirmed_messages: Dict[int, Tuple[Hashable, float]] = dict()
+        returned_tags: Set[int] = set()
+
+        def resolve(delivery_tag: int, is_confirmed: bool) -> None:
+            key, published_at = unconfirmed_messages.pop(delivery_tag)
+            if is_confirmed and delivery_tag not in returned_tags:
+                confirmed_keys.append(key)
+                if on_confirmed is not None:
+                    on_confirmed(time.perf_counter() - published_at)
+            else:
+                failed_keys.append(key)
+            returned_tags.discard(delivery_tag)
+
+        def on_delivery_confirmation(frame) -> None:
+            is_confirmed = isinstance(frame.method, pika.spec.Basic.Ack)
+            if frame.method.multiple:
+                for delivery_tag in sorted(tag for tag in unconfirmed_messages if tag <= frame.method.delivery_tag):
+                    resolve(delivery_tag, is_confirmed)
+            elif frame.method.delivery_tag in unconfirmed_messages:
+                resolve(frame.method.delivery_tag, is_confirmed)
+
+        def on_message_returned(channel, method, properties, body) -> None:
+            # Return always precedes the ack of the same message
+            returned_tags.add(int(properties.message_id))
+
+        keyed_messages = iter(keyed_messages)
+        try:
+            with self.connect_channel(queue_name=queue_name):
+                channel = self._open_confirm_channel(on_delivery_confirmation, on_message_returned)
+                for delivery_tag, (key, message_data) in enumerate(keyed_messages, start=1):
+                    if len(unconfirmed_messages) >= max_unconfirmed_messages:
+                        self._wait_for_confirms(unconfirmed_messages, max_unconfirmed_messages - 1, confirm_timeout_seconds)
+
+                    unconfirmed_messages[delivery_tag] = (key, time.perf_counter())
+                    channel.basic_publish(
+                        exchange='',
+                        routing_key=queue_name,
+                        body=json.dumps(message_data),
+                        properties=pika.BasicProperties(
+                            delivery_mode=2,  # make message persistent
+                            message_id=str(delivery_tag),
+                            priority=priorities.get(key) if priorities else None,
+                        ),
+                        mandatory=True,
+                    )
+
+                self._wait_for_confirms(unconfirmed_messages, 0, confirm_timeout_seconds)
+                # Late confirms must not reach the callbacks after the report is returned
+                self._close_confirm_channel()
+
+        except Exception as ex:
+            self._logger.error(f"Error while sending messages with confirms: {ex}")
+            # Connection is recreated on the next use
+            self.close()
+
+        if unconfirmed_messages:
+            self._logger.warning(f"{len(unconfirmed_messages)} messages were not confirmed by the broker")
+        failed_keys.extend(key for key, _ in unconfirmed_messages.values())
+        failed_keys.extend(key for key, _ in keyed_messages)
+
+        self._logger.info(f"Messages confirmed: {len(confirmed_keys)}, failed: {len(failed_keys)}")
+        return PublishReport(confirmed_keys, failed_keys)
+
+    def _open_confirm_channel(self, on_delivery_confirmation: Callable, on_message_returned: Callable):
+        """
+        Opens a separate channel in the confirm mode. The underlying channel is used directly, as the blocking one
+        waits for the confirm of every published message.
+        """
+        # Delivery tags are numbered per channel, so every batch gets a fresh channel
+        self._close_confirm_channel()
+        self._confirm_channel = self._connection.channel()
+        confirm_mode_selected = []
+        self._confirm_channel._impl.confirm_delivery(ack_nack_callback=on_delivery_confirmation, callback=confirm_mode_selected.append)
+        self._confirm_channel._impl.add_on_return_callback(on_message_returned)
+        while not confirm_mode_selected:
+            self._connection.process_data_events(time_limit=None)
+        return self._confirm_channel._impl
+
+    def _close_confirm_channel(self) -> None:
+        if self._confirm_channel is not None and self._confirm_channel.is_open:
+            self._confirm_channel.close()
+        self._confirm_channel = None
+
+    def _wait_for_confirms(self, unconfirmed_messages: Dict[int, Tuple[Hashable, float]], max_unconfirmed_messages: int, timeout_seconds: float) -> None:
+        deadline = time.monotonic() + timeout_seconds
+        while len(unconfirmed_messages) > max_unconfirmed_messages:
+            remaining_seconds = deadline - time.monotonic()
+            if remaining_seconds <= 0:
+                raise QueueUnavailableError(f"{len(unconfirmed_messages)} messages not confirmed within {timeout_seconds}s")
+            self._connection.process_data_events(time_limit=remaining_seconds)
+
+
+class PublishMetrics:
+    """Thread-safe statistics of publish latency."""
+
+    def __init__(self, recent_samples_count: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._recent_latencies = deque(maxlen=recent_samples_count)
+        self.published_count = 0
+        self.failed_count = 0
+        self.total_latency_seconds = 0.0
+        self.max_latency_seconds = 0.0
+
+    def observe(self, latency_seconds: float, is_successful: bool = True) -> None:
+        with self._lock:
+            if not is_successful:
+                self.failed_count += 1
+                return
+            self.published_count += 1
+            self.total_latency_seconds += latency_seconds
+            self.max_latency_seconds = max(self.max_latency_seconds, latency_seconds)
+            self._recent_latencies.append(latency_seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            recent_latencies = sorted(self._recent_latencies)
+            published_count = self.published_count
+            return {
+                "published_count": published_count,
+                "failed_count": self.failed_count,
+                "mean_latency_ms": 1000 * self.total_latency_seconds / published_count if published_count else 0.0,
+                "p50_latency_ms": 1000 * recent_latencies[len(recent_latencies) // 2] if recent_latencies else 0.0,
+                "p95_latency_ms": 1000 * recent_latencies[int(len(recent_latencies) * 0.95)] if recent_latencies else 0.0,
+                "max_latency_ms": 1000 * self.max_latency_seconds,
+            }
+
+
+class MessageBrokerProducerPool:
+    """
+    Bounded, thread-safe pool of producers with long-lived connections.
+    Each producer is used by a single thread at a time, since pika connections are not thread-safe.
+    """
+
+    def __init__(self, rabbitmq_host: str, max_size: int = settings.MESSAGE_BROKER_PRODUCER_POOL_SIZE, health_check_interval_seconds: float = settings.MESSAGE_BROKER_PRODUCER_HEALTH_CHECK_INTERVAL_SECONDS, acquire_timeout_seconds: float = settings.MESSAGE_BROKER_PRODUCER_ACQUIRE_TIMEOUT_SECONDS) -> None:
+        self._logger = get_new_sublogger(self.__class__.__name__)
+        self._rabbitmq_host = rabbitmq_host
+        self._max_size = max_size
+        self._health_check_interval_seconds = health_check_interval_seconds
+        self._acquire_timeout_seconds = acquire_timeout_seconds
+        self._idle_producers: queue.LifoQueue[MessageBrokerProducer] = queue.LifoQueue()
+        self._created_producers_count = 0
+        self._lock = threading.Lock()
+        self.metrics = PublishMetrics()
+
+    @contextmanager
+    def acquire(self) -> Iterator[MessageBrokerProducer]:
+        producer = self._get_producer()
+        try:
+            yield producer
+        finally:
+            self._idle_producers.put(producer)
+
+    def send_message(self, message_data: dict, queue_name: str = settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME, priority: Optional[int] = None) -> None:
+        with self.acquire() as producer:
+            start_time = time.perf_counter()
+            try:
+                producer.send_message(message_data, queue_name=queue_name, priority=priority)
+            except Exception as ex:
+                # Long-lived connection may have been dropped since the last health check - retry once on a fresh one
+                self._logger.warning(f"Publish failed, retrying with a new connection: {ex}")
+                try:
+                    producer.send_message(message_data, queue_name=queue_name, priority=priority)
+                except Exception:
+                    self.metrics.observe(time.perf_counter() - start_time, is_successful=False)
+                    raise
+            self.metrics.observe(time.perf_counter() - start_time)
+
+    def send_messages_with_confirms(self, keyed_messages: Iterable[Tuple[Hashable, dict]], queue_name: str = settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME, priorities: Optional[Dict[Hashable, int]] = None) -> PublishReport:
+        """
+        Publishes the messages with confirms. Failed messages are published once more with a new connection,
+        so a message which was stored by the broker, but whose confirm was lost, may be delivered twice.
+        """
+        messages_by_key = dict(keyed_messages)
+        with self.acquire() as producer:
+            report = producer.send_messages_with_confirms(messages_by_key.items(), queue_name=queue_name, on_confirmed=self.metrics.observe, priorities=priorities)
+            if report.failed_keys:
+                self._logger.warning(f"Publishing {len(report.failed_keys)} messages failed, retrying with a new connection")
+                retry_report = producer.send_messages_with_confirms(((key, messages_by_key[key]) for key in report.failed_keys), queue_name=queue_name, on_confirmed=self.metrics.observe, priorities=priorities)
+                report = PublishReport(report.confirmed_keys + retry_report.confirmed_keys, retry_report.failed_keys)
+
+        for _ in report.failed_keys:
+            self.metrics.observe(0.0, is_successful=False)
+        return report
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle_producers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _get_producer(self) -> MessageBrokerProducer:
+        try:
+            producer = self._idle_producers.get_nowait()
+        except queue.Empty:
+            producer = self._create_producer_if_below_limit()
+            if producer is None:
+                try:
+                    producer = self._idle_producers.get(timeout=self._acquire_timeout_seconds)
+                except queue.Empty as ex:
+                    raise QueueUnavailableError(f"No producer available within {self._acquire_timeout_seconds}s") from ex
+
+        if time.monotonic() - producer.last_used_at > self._health_check_interval_seconds and not producer.is_healthy():
+            # Reconnection happens lazily on the next publish
+            producer.close()
+        return producer
+
+    def _create_producer_if_below_limit(self) -> Optional[MessageBrokerProducer]:
+        with self._lock:
+            if self._created_producers_count >= self._max_size:
+                return None
+            self._created_producers_count += 1
+
+        self._logger.info(f"Creating producer {self._created_producers_count} of {self._max_size}")
+        return MessageBrokerProducer(queue_name=settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME, rabbitmq_host=self._rabbitmq_host)
+
 
 def create_message_data(model: UmlModel, ids_of_source_files: Optional[Iterator[int]] = None, ids_of_edited_files: Optional[Iterator[int]] = None, ids_of_new_submitted_files: Optional[Iterator[int]] = None, ids_of_deleted_files: Optional[Iterator[int]] = None) -> dict:
     serializer = UmlFilesTranslationQueueMessageSerializer(model, context={
@@ -77,13 +359,3 @@ def create_message_data(model: UmlModel, ids_of_source_files: Optional[Iterator[
     })
 
     return serializer.data
-
-
-def send_uploaded_model_message(message_data: dict, producer: Optional[MessageBrokerProducer] = None, queue_name: str = settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME) -> None:
-    try:
-        if producer is None:
-            producer = MessageBrokerProducer(queue_name=queue_name, rabbitmq_host=settings.MESSAGE_BROKER_HOST)
-
-        producer.send_message(message_data)
-    except Exception as ex:
-        raise ValueError(f"Error while sending message: {ex}") from ex
\ No newline at end of file
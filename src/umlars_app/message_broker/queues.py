@@ -0,0 +1,103 @@
+import time
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional
+
+import pika
+
+from umlars_app import settings
+from umlars_app.message_broker.sharding import get_shard_queues_names
+from umlars_app.utils.logging import get_new_sublogger
+
+
+class QueueStats(NamedTuple):
+    messages_count: int
+    consumers_count: int
+
+
+def get_queue_arguments(queue_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Arguments the queue is declared with. They have to be the same for every declaration of the queue,
+    including the one made by the translation service - otherwise the broker closes the channel.
+    """
+    if queue_name in get_shard_queues_names(settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME) and settings.MESSAGE_BROKER_QUEUE_MAX_PRIORITY > 0:
+        return {"x-max-priority": settings.MESSAGE_BROKER_QUEUE_MAX_PRIORITY}
+    return None
+
+
+def get_connection_parameters(rabbitmq_host: str) -> pika.ConnectionParameters:
+    return pika.ConnectionParameters(
+        host=rabbitmq_host,
+        port=settings.MESSAGE_BROKER_PORT,
+        credentials=pika.PlainCredentials(
+            username=settings.MESSAGE_BROKER_USER,
+            password=settings.MESSAGE_BROKER_PASSWORD
+        ),
+        # Publishing connection blocked by the broker's resource alarm is closed, instead of blocking forever
+        blocked_connection_timeout=settings.MESSAGE_BROKER_BLOCKED_CONNECTION_TIMEOUT_SECONDS,
+    )
+
+
+def fetch_queue_stats(channel, queue_name: str) -> QueueStats:
+    """Reads the queue depth using passive queue declaration - the queue itself is not modified."""
+    declare_ok = channel.queue_declare(queue=queue_name, passive=True)
+    return QueueStats(declare_ok.method.message_count, declare_ok.method.consumer_count)
+
+
+def sum_queues_stats(queues_stats: Iterable[QueueStats]) -> QueueStats:
+    """Stats of the sharded queue - consumers of the shards are counted separately."""
+    queues_stats = list(queues_stats)
+    return QueueStats(sum(stats.messages_count for stats in queues_stats), sum(stats.consumers_count for stats in queues_stats))
+
+
+class QueueDepthSampler:
+    """
+    Samples the queue depth over a long-lived connection and caches the last sample.
+    Queues of other broker backends are sampled with the given fetch_stats function instead.
+    """
+
+    def __init__(self, queue_name: str, rabbitmq_host: str, sample_interval_seconds: float = settings.MESSAGE_BROKER_ADMISSION_SAMPLE_INTERVAL_SECONDS, fetch_stats: Optional[Callable[[], QueueStats]] = None) -> None:
+        self._logger = get_new_sublogger(self.__class__.__name__)
+        self._queue_name = queue_name
+        self._rabbitmq_host = rabbitmq_host
+        self._sample_interval_seconds = sample_interval_seconds
+        self._fetch_stats = fetch_stats
+        self._connection = None
+        self._channel = None
+        self.last_stats: Optional[QueueStats] = None
+        self.last_sample_time: Optional[float] = None
+
+    def sample(self) -> QueueStats:
+        try:
+            if self._fetch_stats is not None:
+                self.last_stats = self._fetch_stats()
+                return self.last_stats
+            if self._connection is None or self._connection.is_closed:
+                self._connection = pika.BlockingConnection(get_connection_parameters(self._rabbitmq_host))
+                self._channel = None
+            if self._channel is None or self._channel.is_closed:
+                self._channel = self._connection.channel()
+            self.last_stats = fetch_queue_stats(self._channel, self._queue_name)
+        except Exception:
+            self.close()
+            raise
+        finally:
+            # Failed sample isn't retried before the next interval either
+            self.last_sample_time = time.monotonic()
+        return self.last_stats
+
+    def get_stats(self) -> Optional[QueueStats]:
+        """Returns the cached stats, sampling the queue again when they are older than the interval."""
+        if self.last_sample_time is None or time.monotonic() - self.last_sample_time >= self._sample_interval_seconds:
+            try:
+                self.sample()
+            except Exception as ex:
+                self._logger.warning(f"Failed to read the depth of queue {self._queue_name}: {ex}")
+        return self.last_stats
+
+    def close(self) -> None:
+        try:
+            if self._connection is not None and not self._connection.is_closed:
+                self._connection.close()
+        except Exception as ex:
+            self._logger.debug(f"Error while closing the connection: {ex}")
+        self._connection = None
+        self._channel = None
@@ -0,0 +1,65 @@
+import bisect
+import functools
+import hashlib
+from typing import Hashable, List, Sequence
+
+from umlars_app import settings
+
+
+SHARD_QUEUE_NAME_SEPARATOR = "."
+# Points of each shard on the ring - more points spread the keys more evenly
+SHARD_RING_VIRTUAL_NODES = 160
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """
+    Maps the keys to the nodes, so that adding a node moves only the keys of its part of the ring.
+    Every client routing the messages (including the translation service) has to build the same ring:
+    node points are MD5 hashes of "<node>#<point number>", key points are MD5 hashes of the key as string,
+    both taken as the first 8 bytes in big-endian order. Key belongs to the first node point after it.
+    """
+
+    def __init__(self, nodes: Sequence[str], virtual_nodes: int = SHARD_RING_VIRTUAL_NODES) -> None:
+        if not nodes:
+            raise ValueError("Consistent hash ring requires at least one node")
+        ring = sorted((_hash(f"{node}#{point_number}"), node) for node in nodes for point_number in range(virtual_nodes))
+        self._points = [point for point, _ in ring]
+        self._nodes = [node for _, node in ring]
+
+    def get_node(self, key: Hashable) -> str:
+        index = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._nodes[index]
+
+
+def get_shard_queues_names(queue_name: str, shards_count: int = settings.MESSAGE_BROKER_SHARDS_COUNT) -> List[str]:
+    if shards_count <= 1:
+        return [queue_name]
+    return [f"{queue_name}{SHARD_QUEUE_NAME_SEPARATOR}{shard_index}" for shard_index in range(shards_count)]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_shard_ring(queue_name: str, shards_count: int) -> ConsistentHashRing:
+    return ConsistentHashRing(get_shard_queues_names(queue_name, shards_count))
+
+
+def get_shard_queue_name(queue_name: str, key: Hashable, shards_count: int = settings.MESSAGE_BROKER_SHARDS_COUNT) -> str:
+    """Shard of the queue for the messages of the given key, e.g. the model ID - so that they are consumed in order."""
+    if shards_count <= 1:
+        return queue_name
+    return _get_shard_ring(queue_name, shards_count).get_node(key)
+
+
+def assign_shards(queues_names: Sequence[str], consumers_count: int) -> List[List[str]]:
+    """
+    Splits the shards between the consumers, so that every shard has a single consumer.
+    There are never more consumers than shards - additional consumers would only compete for the order of messages.
+    """
+    consumers_count = min(max(consumers_count, 1), len(queues_names))
+    assigned_queues_names = [[] for _ in range(consumers_count)]
+    for shard_index, queue_name in enumerate(queues_names):
+        assigned_queues_names[shard_index % consumers_count].append(queue_name)
+    return assigned_queues_names
@@ -0,0 +1,201 @@
+import dataclasses
+import math
+import multiprocessing
+import os
+import time
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from django.db import connections
+
+from umlars_app import settings
+from umlars_app.message_broker.consumer import RabbitMQConsumer
+from umlars_app.message_broker.queues import QueueDepthSampler, sum_queues_stats
+from umlars_app.message_broker.sharding import assign_shards
+from umlars_app.message_broker.backends import create_broker_backend
+from umlars_app.utils.logging import get_new_sublogger
+
+
+# Workers are forked, so that they inherit the already configured Django application
+_multiprocessing_context = multiprocessing.get_context("fork")
+
+
+def run_consumer_worker(consumer_class: Type[RabbitMQConsumer], queue_name: str, rabbitmq_host: str, threads_count: int, consumer_kwargs: Dict[str, Any], processed_messages_counter, threads_queues_names: Optional[List[List[str]]] = None) -> None:
+    logger = get_new_sublogger("ConsumerWorker")
+    # Connections inherited from the parent process can't be shared with it
+    connections.close_all()
+
+    def count_processed_messages(messages_count: int) -> None:
+        with processed_messages_counter.get_lock():
+            processed_messages_counter.value += messages_count
+
+    def consume(queues_names: Optional[List[str]]):
+        consumer = consumer_class(queue_name=queue_name, rabbitmq_host=rabbitmq_host, on_messages_processed=count_processed_messages, queues_names=queues_names, **consumer_kwargs)
+        consumer.start_consuming()
+
+    # Each thread consumes its own shards of the queue, or all threads compete for the whole queue
+    threads_queues_names = threads_queues_names or [None] * threads_count
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(threads_queues_names))
+    futures = [executor.submit(consume, queues_names) for queues_names in threads_queues_names]
+    done_futures, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+    for future in done_futures:
+        if (ex := future.exception()) is not None:
+            logger.error(f"Consumer thread failed: {ex}")
+
+    # Remaining threads are blocked on consuming - the whole process exits, so that the supervisor starts a fresh worker
+    os._exit(1)
+
+
+@dataclasses.dataclass
+class ConsumerWorker:
+    index: int
+    process: multiprocessing.Process
+    processed_messages_counter: Any
+    last_reported_count: int = 0
+    shards_slot: Optional[int] = None
+
+
+class ConsumerPoolSupervisor:
+    """
+    Runs consumers in multiple processes, restarts the crashed ones
+    and scales the number of processes based on the queue depth.
+    Shards of a sharded queue are split between the threads of all processes - every shard has a single consumer,
+    which keeps the order of its messages. Restarted process takes over the shards of the crashed one,
+    and the number of processes is fixed, as scaling would reassign the shards.
+    """
+
+    def __init__(
+        self,
+        queue_name: str,
+        rabbitmq_host: str,
+        initial_processes: int,
+        threads_per_process: int = 1,
+        min_processes: int = settings.MESSAGE_BROKER_CONSUMER_MIN_PROCESSES,
+        max_processes: int = settings.MESSAGE_BROKER_CONSUMER_MAX_PROCESSES,
+        messages_per_process: int = settings.MESSAGE_BROKER_CONSUMER_MESSAGES_PER_PROCESS,
+        autoscale_interval_seconds: int = settings.MESSAGE_BROKER_CONSUMER_AUTOSCALE_INTERVAL_SECONDS,
+        consumer_class: Type[RabbitMQConsumer] = RabbitMQConsumer,
+        consumer_kwargs: Optional[Dict[str, Any]] = None,
+        report: Optional[Callable[[str], None]] = None,
+        queues_names: Optional[List[str]] = None,
+    ) -> None:
+        self._logger = get_new_sublogger(self.__class__.__name__)
+        self._queue_name = queue_name
+        self._rabbitmq_host = rabbitmq_host
+        self._min_processes = max(min_processes, 1)
+        self._max_processes = max(max_processes, self._min_processes)
+        self._initial_processes = min(max(initial_processes, self._min_processes), self._max_processes)
+        self._threads_per_process = threads_per_process
+        self._messages_per_process = messages_per_process
+        self._autoscale_interval_seconds = autoscale_interval_seconds
+        self._consumer_class = consumer_class
+        self._consumer_kwargs = consumer_kwargs or dict()
+        self._report = report or self._logger.info
+        self._workers: List[ConsumerWorker] = []
+        self._next_worker_index = 0
+        self._last_report_time = time.monotonic()
+        self._queues_names = list(queues_names or [queue_name])
+        self._shards_assignment = assign_shards(self._queues_names, self._initial_processes * threads_per_process) if len(self._queues_names) > 1 else None
+        self._broker_backend = create_broker_backend(rabbitmq_host=rabbitmq_host)
+        self._queue_depth_sampler = QueueDepthSampler(queue_name, rabbitmq_host, fetch_stats=lambda: sum_queues_stats(
+            self._broker_backend.get_queue_stats(shard_queue_name) for shard_queue_name in self._queues_names
+        ))
+
+    def run(self) -> None:
+        if self._shards_assignment is None:
+            for _ in range(self._initial_processes):
+                self._start_worker()
+        else:
+            self._report(f"Consuming {len(self._queues_names)} shards with {len(self._shards_assignment)} consumers - autoscaling disabled")
+            for shards_slot in range(math.ceil(len(self._shards_assignment) / self._threads_per_process)):
+                self._start_worker(shards_slot)
+
+        try:
+            while True:
+                time.sleep(self._autoscale_interval_seconds)
+                self._restart_crashed_workers()
+                self._autoscale()
+                self._report_throughput()
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        for worker in self._workers:
+            worker.process.terminate()
+        for worker in self._workers:
+            worker.process.join()
+        self._workers = []
+
+        self._queue_depth_sampler.close()
+        self._broker_backend.close()
+
+    def _start_worker(self, shards_slot: Optional[int] = None) -> ConsumerWorker:
+        processed_messages_counter = _multiprocessing_context.Value("Q", 0)
+        threads_queues_names = None
+        if shards_slot is not None:
+            threads_queues_names = self._shards_assignment[shards_slot * self._threads_per_process:(shards_slot + 1) * self._threads_per_process]
+        process = _multiprocessing_context.Process(
+            target=run_consumer_worker,
+            args=(self._consumer_class, self._queue_name, self._rabbitmq_host, self._threads_per_process, self._consumer_kwargs, processed_messages_counter, threads_queues_names),
+            daemon=True,
+        )
+        # Forked process must not reuse the supervisor's database connections
+        connections.close_all()
+        process.start()
+
+        worker = ConsumerWorker(self._next_worker_index, process, processed_messages_counter, shards_slot=shards_slot)
+        self._next_worker_index += 1
+        self._workers.append(worker)
+        self._logger.info(f"Started consumer worker {worker.index} with PID {process.pid}")
+        return worker
+
+    def _stop_worker(self, worker: ConsumerWorker) -> None:
+        # Unacknowledged messages of the stopped worker are redelivered by the broker
+        worker.process.terminate()
+        worker.process.join()
+        self._workers.remove(worker)
+        self._logger.info(f"Stopped consumer worker {worker.index} with PID {worker.process.pid}")
+
+    def _restart_crashed_workers(self) -> None:
+        for worker in list(self._workers):
+            if not worker.process.is_alive():
+                self._logger.warning(f"Consumer worker {worker.index} with PID {worker.process.pid} exited with code {worker.process.exitcode}. Restarting...")
+                self._workers.remove(worker)
+                self._start_worker(worker.shards_slot)
+
+    def _autoscale(self) -> None:
+        if self._shards_assignment is not None:
+            return
+        try:
+            queue_stats = self._queue_depth_sampler.sample()
+        except Exception as ex:
+            self._logger.warning(f"Failed to read the queue depth - skipping autoscaling: {ex}")
+            return
+
+        desired_processes = math.ceil(queue_stats.messages_count / self._messages_per_process)
+        desired_processes = min(max(desired_processes, self._min_processes), self._max_processes)
+        self._logger.debug(f"Queue {self._queue_name} has {queue_stats.messages_count} messages and {queue_stats.consumers_count} consumers - desired processes: {desired_processes}")
+
+        if desired_processes > len(self._workers):
+            self._report(f"Scaling up from {len(self._workers)} to {desired_processes} processes - queue depth: {queue_stats.messages_count}")
+            while len(self._workers) < desired_processes:
+                self._start_worker()
+        elif desired_processes < len(self._workers):
+            # Scaling down one worker at a time to avoid flapping on short queue depth drops
+            self._report(f"Scaling down from {len(self._workers)} to {len(self._workers) - 1} processes - queue depth: {queue_stats.messages_count}")
+            self._stop_worker(self._workers[-1])
+
+    def _report_throughput(self) -> None:
+        now = time.monotonic()
+        elapsed_seconds = max(now - self._last_report_time, 1e-9)
+        self._last_report_time = now
+
+        total_rate = 0.0
+        for worker in self._workers:
+            processed_messages_count = worker.processed_messages_counter.value
+            rate = (processed_messages_count - worker.last_reported_count) / elapsed_seconds
+            worker.last_reported_count = processed_messages_count
+            total_rate += rate
+            self._report(f"Worker {worker.index} (PID {worker.process.pid}): {rate:.1f} messages/s, {processed_messages_count} messages in total")
+
+        self._report(f"Pool of {len(self._workers)} processes: {total_rate:.1f} messages/s")
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0002_umlfile_last_process_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationOutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queue_name', models.CharField(max_length=200)),
+                ('payload', models.JSONField()),
+                ('status', models.IntegerField(choices=[(10, 'Pending'), (20, 'Published'), (30, 'Failed')], default=10)),
+                ('publish_attempts_count', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default=None, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('published_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='translation_outbox_messages', to='umlars_app.umlmodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'available_at'], name='umlars_app__status_f5ccbd_idx')],
+            },
+        ),
+    ]
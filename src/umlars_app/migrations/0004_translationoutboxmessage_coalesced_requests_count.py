@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0003_translationoutboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationoutboxmessage',
+            name='coalesced_requests_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0004_translationoutboxmessage_coalesced_requests_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationoutboxmessage',
+            name='origin',
+            field=models.IntegerField(choices=[(10, 'Interactive'), (20, 'Bulk Upload'), (30, 'Mass Retranslation')], default=10),
+        ),
+        migrations.AddField(
+            model_name='translationoutboxmessage',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
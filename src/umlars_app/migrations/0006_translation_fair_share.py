@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0005_translationoutboxmessage_origin_priority'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTranslationQuota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('max_in_flight_messages', models.PositiveIntegerField(blank=True, default=None, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='translationoutboxmessage',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='translationoutboxmessage',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='translation_outbox_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='translationoutboxmessage',
+            index=models.Index(fields=['user', 'status'], name='umlars_app__user_id_577b1c_idx'),
+        ),
+        migrations.AddField(
+            model_name='usertranslationquota',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='translation_quota', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
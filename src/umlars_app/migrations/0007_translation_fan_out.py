@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0006_translation_fair_share'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationFanOut',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parts_count', models.PositiveIntegerField()),
+                ('state', models.IntegerField(choices=[(10, 'Queued'), (20, 'Running'), (30, 'Finished'), (40, 'Partial Success'), (50, 'Failed')], default=10)),
+                ('is_superseded', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='translation_fan_outs', to='umlars_app.umlmodel')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TranslationPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('state', models.IntegerField(choices=[(10, 'Queued'), (20, 'Running'), (30, 'Finished'), (40, 'Partial Success'), (50, 'Failed')], default=10)),
+                ('completed_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('fan_out', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='umlars_app.translationfanout')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='translationoutboxmessage',
+            name='translation_part',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='translation_outbox_messages', to='umlars_app.translationpart'),
+        ),
+        migrations.AddField(
+            model_name='umlfile',
+            name='translation_part',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='files', to='umlars_app.translationpart'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0007_translation_fan_out'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageBrokerQueueSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queue_name', models.CharField(max_length=200, unique=True)),
+                ('messages_count', models.PositiveIntegerField(default=0)),
+                ('consumers_count', models.PositiveIntegerField(default=0)),
+                ('is_throttled', models.BooleanField(default=False)),
+                ('sampled_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0008_messagebrokerqueuesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BrokerQueueMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queue_name', models.CharField(max_length=200)),
+                ('body', models.TextField()),
+                ('priority', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_until', models.DateTimeField(blank=True, null=True)),
+                ('delivery_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['queue_name', 'priority', 'id'], name='umlars_app__queue_n_9c256c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0009_brokerqueuemessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UmlFileBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('data', models.TextField()),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_referenced_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        # Content column is kept under its name - only the field is renamed
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name='umlfile',
+                    old_name='data',
+                    new_name='inline_data',
+                ),
+                migrations.AlterField(
+                    model_name='umlfile',
+                    name='inline_data',
+                    field=models.TextField(blank=True, db_column='data', default=''),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='umlfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='files', to='umlars_app.umlfileblob'),
+        ),
+    ]
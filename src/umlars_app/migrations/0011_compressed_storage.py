@@ -0,0 +1,81 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+import umlars_app.fields
+
+
+def copy_data(apps, schema_editor, model_name, source_field, target_field):
+    model_class = apps.get_model('umlars_app', model_name)
+    for instance in model_class.objects.only('id', source_field).iterator(chunk_size=200):
+        setattr(instance, target_field, getattr(instance, source_field))
+        instance.save(update_fields=[target_field])
+
+
+def compress_data(apps, schema_editor):
+    copy_data(apps, schema_editor, 'UmlFileBlob', 'data', 'compressed_data')
+    copy_data(apps, schema_editor, 'UmlModel', 'formatted_data', 'compressed_formatted_data')
+
+
+def decompress_data(apps, schema_editor):
+    copy_data(apps, schema_editor, 'UmlFileBlob', 'compressed_data', 'data')
+    copy_data(apps, schema_editor, 'UmlModel', 'compressed_formatted_data', 'formatted_data')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0010_umlfileblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='umlfileblob',
+            name='last_accessed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='umlfileblob',
+            name='recompressed_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        # Compressed columns are filled next to the raw ones and then take their place
+        migrations.AddField(
+            model_name='umlfileblob',
+            name='compressed_data',
+            field=umlars_app.fields.CompressedTextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='umlmodel',
+            name='compressed_formatted_data',
+            field=umlars_app.fields.CompressedTextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='umlfileblob',
+            name='data',
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(compress_data, decompress_data),
+        migrations.RemoveField(
+            model_name='umlfileblob',
+            name='data',
+        ),
+        migrations.RemoveField(
+            model_name='umlmodel',
+            name='formatted_data',
+        ),
+        migrations.RenameField(
+            model_name='umlfileblob',
+            old_name='compressed_data',
+            new_name='data',
+        ),
+        migrations.RenameField(
+            model_name='umlmodel',
+            old_name='compressed_formatted_data',
+            new_name='formatted_data',
+        ),
+        migrations.AlterField(
+            model_name='umlfileblob',
+            name='data',
+            field=umlars_app.fields.CompressedTextField(),
+        ),
+    ]
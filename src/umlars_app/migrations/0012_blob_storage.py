@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:32
+
+import umlars_app.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0011_compressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='umlfileblob',
+            name='storage',
+            field=models.CharField(choices=[('database', 'Database'), ('filesystem', 'Filesystem')], default='database', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='umlfileblob',
+            name='data',
+            field=umlars_app.fields.CompressedTextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:34
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0012_blob_storage'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='umlfile',
+            options={'base_manager_name': 'objects'},
+        ),
+    ]
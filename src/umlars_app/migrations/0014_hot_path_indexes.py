@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def delete_duplicated_accesses(apps, schema_editor):
+    """Merges the duplicated access rows, keeping the highest access level, before the unique constraint is added."""
+    UserAccessToModel = apps.get_model('umlars_app', 'UserAccessToModel')
+    duplicates = (
+        UserAccessToModel.objects.values('user', 'model').order_by()
+        .annotate(kept_id=Min('id'), access_level=Max('access_level'), rows_count=Count('id'))
+        .filter(rows_count__gt=1)
+    )
+    for duplicate in duplicates:
+        UserAccessToModel.objects.filter(id=duplicate['kept_id']).update(access_level=duplicate['access_level'])
+        UserAccessToModel.objects.filter(user=duplicate['user'], model=duplicate['model']).exclude(id=duplicate['kept_id']).delete()
+
+
+def create_name_trigram_index(apps, schema_editor):
+    # Other databases fall back to the sequential scan of the search by name
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Expression matches the one of the name__icontains lookup
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS umlmodel_name_trgm_idx ON umlars_app_umlmodel USING gin ((UPPER("name"::text)) gin_trgm_ops)'
+    )
+
+
+def drop_name_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS umlmodel_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0013_umlfile_base_manager'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='umlfile',
+            index=models.Index(fields=['model', 'state'], name='umlfile_model_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='umlmodel',
+            index=models.Index(condition=models.Q(('tech_active_flag', True)), fields=['id'], name='umlmodel_active_idx'),
+        ),
+        migrations.RunPython(delete_duplicated_accesses, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='useraccesstomodel',
+            constraint=models.UniqueConstraint(fields=('user', 'model'), name='unique_user_access_to_model'),
+        ),
+        migrations.RunPython(create_name_trigram_index, drop_name_trigram_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0014_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UmlModelSummary',
+            fields=[
+                ('model', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='umlars_app.umlmodel')),
+                ('files_count', models.PositiveIntegerField(default=0)),
+                ('queued_files_count', models.PositiveIntegerField(default=0)),
+                ('running_files_count', models.PositiveIntegerField(default=0)),
+                ('finished_files_count', models.PositiveIntegerField(default=0)),
+                ('partial_success_files_count', models.PositiveIntegerField(default=0)),
+                ('failed_files_count', models.PositiveIntegerField(default=0)),
+                ('total_size', models.PositiveBigIntegerField(default=0)),
+                ('status', models.IntegerField(choices=[(10, 'Queued'), (20, 'Running'), (30, 'Finished'), (40, 'Partial Success'), (50, 'Failed')], default=40)),
+                ('last_activity_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
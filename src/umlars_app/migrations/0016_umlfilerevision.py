@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:43
+
+import django.db.models.deletion
+import umlars_app.fields
+from django.db import migrations, models
+from django.db.models import F
+
+
+def create_first_revisions(apps, schema_editor):
+    """Current contents of the files become their first revisions - snapshots referencing the existing blobs."""
+    UmlFile = apps.get_model('umlars_app', 'UmlFile')
+    UmlFileBlob = apps.get_model('umlars_app', 'UmlFileBlob')
+    UmlFileRevision = apps.get_model('umlars_app', 'UmlFileRevision')
+    uml_files = UmlFile.objects.filter(blob__isnull=False).select_related('blob').only('id', 'blob__sha256', 'blob__size')
+    revisions = [
+        UmlFileRevision(
+            file_id=uml_file.id, number=1, blob_id=uml_file.blob_id, content_hash=uml_file.blob.sha256,
+            size=uml_file.blob.size,
+        )
+        for uml_file in uml_files.iterator(chunk_size=500)
+    ]
+    UmlFileRevision.objects.bulk_create(revisions, batch_size=500)
+    for revision in revisions:
+        UmlFileBlob.objects.filter(id=revision.blob_id).update(ref_count=F('ref_count') + 1)
+
+
+def delete_revisions(apps, schema_editor):
+    UmlFileBlob = apps.get_model('umlars_app', 'UmlFileBlob')
+    UmlFileRevision = apps.get_model('umlars_app', 'UmlFileRevision')
+    for blob_id in UmlFileRevision.objects.filter(blob__isnull=False).values_list('blob_id', flat=True).iterator(chunk_size=500):
+        UmlFileBlob.objects.filter(id=blob_id).update(ref_count=F('ref_count') - 1)
+    UmlFileRevision.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('umlars_app', '0015_umlmodelsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UmlFileRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tech_valid_from', models.DateTimeField(auto_now_add=True)),
+                ('tech_valid_to', models.DateTimeField(blank=True, null=True)),
+                ('tech_active_flag', models.BooleanField(default=True)),
+                ('number', models.PositiveIntegerField()),
+                ('delta', umlars_app.fields.CompressedTextField(blank=True, default=None, null=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('blob', models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='revisions', to='umlars_app.umlfileblob')),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='umlars_app.umlfile')),
+            ],
+            options={
+                'base_manager_name': 'objects',
+                'constraints': [models.UniqueConstraint(fields=('file', 'number'), name='unique_uml_file_revision_number')],
+            },
+        ),
+        migrations.RunPython(create_first_revisions, delete_revisions),
+    ]
@@ -1,10 +1,26 @@
-from datetime import datetime
+import hashlib
+import os
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from enum import Enum
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Greatest
+from django.db.models.lookups import GreaterThan
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import User
 
+from umlars_app import settings
+from umlars_app.fields import CompressedTextField
+from umlars_app.utils.compression_utils import DEFAULT_CHUNK_SIZE
+from umlars_app.utils.delta_utils import calculate_delta, apply_delta
+from umlars_app.utils.storage_utils import Buffer, get_blob_file_path, write_blob_file, open_blob_file, iter_buffer_chunks
+
 
 class ObjectAccessLevel(models.IntegerChoices):
     """Enum representing the access level to an object."""
@@ -43,15 +59,204 @@ class UmlModel(SCD2Model):
 
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
-    formatted_data = models.TextField(blank=True, null=True)
+    formatted_data = CompressedTextField(blank=True, null=True)
     accessed_by = models.ManyToManyField(
         User, through="UserAccessToModel", related_name="models"
     )
 
+    class Meta:
+        indexes = [
+            # Archived versions are rarely read - only the active ones are indexed
+            models.Index(fields=["id"], condition=models.Q(tech_active_flag=True), name="umlmodel_active_idx"),
+        ]
+        # Trigram index for the search by name is created on PostgreSQL by the migration (umlmodel_name_trgm_idx)
+
     def __str__(self):
         return f"{self.name}"
 
 
+class TranslationFanOut(models.Model):
+    """Translation of the model split into parts, which are translated independently of each other."""
+    model = models.ForeignKey(
+        UmlModel, on_delete=models.CASCADE, related_name="translation_fan_outs"
+    )
+    parts_count = models.PositiveIntegerField()
+    state = models.IntegerField(
+        choices=ProcessStatus.choices, default=ProcessStatus.QUEUED
+    )
+    # Later translation of the same model took over the files
+    is_superseded = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True, default=None)
+
+    def __str__(self):
+        return f"Translation of model {self.model_id} in {self.parts_count} parts ({self.get_state_display()})"
+
+
+class TranslationPart(models.Model):
+    """Group of files translated together, e.g. Papyrus .uml file with its .notation file."""
+    fan_out = models.ForeignKey(
+        TranslationFanOut, on_delete=models.CASCADE, related_name="parts"
+    )
+    index = models.PositiveIntegerField()
+    state = models.IntegerField(
+        choices=ProcessStatus.choices, default=ProcessStatus.QUEUED
+    )
+    completed_at = models.DateTimeField(blank=True, null=True, default=None)
+
+    def __str__(self):
+        return f"Part {self.index} of {self.fan_out}"
+
+
+def calculate_content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class UmlFileBlobQuerySet(models.QuerySet):
+    def get_or_create_for_contents(self, contents: Iterable[str]) -> Dict[str, "UmlFileBlob"]:
+        """Returns the blobs with the given contents by their SHA-256, creating the missing ones."""
+        contents_by_hash = {calculate_content_hash(content): content for content in contents}
+        blobs = self.in_bulk(list(contents_by_hash), field_name="sha256")
+        if (missing_hashes := contents_by_hash.keys() - blobs.keys()):
+            storage = BlobStorage(settings.UML_FILE_STORAGE_BACKEND)
+            if storage == BlobStorage.FILESYSTEM:
+                # File is written before the row, so that the row never points to a missing file
+                for content_hash in missing_hashes:
+                    write_blob_file(content_hash, contents_by_hash[content_hash].encode("utf-8"))
+            # Blob with the same content may be created at the same time by another upload
+            self.bulk_create([
+                UmlFileBlob(
+                    sha256=content_hash, storage=storage, size=len(contents_by_hash[content_hash]),
+                    data=contents_by_hash[content_hash] if storage == BlobStorage.DATABASE else "",
+                )
+                for content_hash in missing_hashes
+            ], ignore_conflicts=True)
+            blobs.update(self.in_bulk(list(missing_hashes), field_name="sha256"))
+        return blobs
+
+    def add_references(self, references_counts: Dict[int, int]) -> None:
+        """Changes the reference counts of the blobs by the given numbers - negative for removed references."""
+        for blob_id, references_count in references_counts.items():
+            if blob_id is None or references_count == 0:
+                continue
+            updated_values = {"ref_count": models.F("ref_count") + references_count}
+            if references_count > 0:
+                updated_values["last_referenced_at"] = timezone.now()
+            self.filter(id=blob_id).update(**updated_values)
+
+    def mark_accessed(self, blobs_ids: Iterable[int]) -> None:
+        """Updates the access time used for cold tiering - at most once a day, to avoid a write on every read."""
+        now = timezone.now()
+        self.filter(id__in=[blob_id for blob_id in blobs_ids if blob_id is not None], last_accessed_at__lt=now - timedelta(days=1)).update(last_accessed_at=now)
+
+
+class BlobStorage(models.TextChoices):
+    DATABASE = "database", _("Database")
+    FILESYSTEM = "filesystem", _("Filesystem")
+
+
+class UmlFileBlob(models.Model):
+    """Content of the UML files, stored once for all the files with the same content."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    storage = models.CharField(max_length=20, choices=BlobStorage.choices, default=BlobStorage.DATABASE)
+    # Content of the blobs stored in the database - empty for the blobs stored in the filesystem
+    data = CompressedTextField(blank=True)
+    # Length of the content in characters
+    size = models.PositiveBigIntegerField()
+    # Number of files and revisions referencing the blob - unreferenced blobs are deleted by collect_uml_file_blobs
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_referenced_at = models.DateTimeField(default=timezone.now)
+    last_accessed_at = models.DateTimeField(default=timezone.now)
+    # Set when the content is recompressed at the cold level by recompress_cold_uml_files
+    recompressed_at = models.DateTimeField(blank=True, null=True, default=None)
+
+    objects = UmlFileBlobQuerySet.as_manager()
+
+    @contextmanager
+    def open_content(self) -> Iterator[Buffer]:
+        """UTF-8 encoded content - blobs stored in the filesystem are memory mapped instead of being read."""
+        if self.storage == BlobStorage.FILESYSTEM:
+            with open_blob_file(self.sha256) as buffer:
+                yield buffer
+        else:
+            yield self.data.encode("utf-8")
+
+    def read_text(self) -> str:
+        if self.storage == BlobStorage.FILESYSTEM:
+            with open_blob_file(self.sha256) as buffer:
+                return str(buffer, "utf-8")
+        return self.data
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Streams the byte range of the UTF-8 encoded content."""
+        if self.storage == BlobStorage.DATABASE and start == 0 and end is None:
+            # Decompressed chunk by chunk
+            yield from UmlFileBlob._meta.get_field("data").iter_chunks(self, chunk_size)
+            return
+        with self.open_content() as buffer:
+            yield from iter_buffer_chunks(buffer, chunk_size, start, end)
+
+    def get_content_length(self) -> int:
+        """Size of the UTF-8 encoded content in bytes."""
+        if self.storage == BlobStorage.FILESYSTEM:
+            return os.path.getsize(get_blob_file_path(self.sha256))
+        return len(self.data.encode("utf-8"))
+
+    def __str__(self):
+        return f"Blob {self.sha256} ({self.size} characters, {self.ref_count} references)"
+
+
+class UmlFileQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Stores the contents of the files in the blobs, as bulk_create doesn't call save()."""
+        objs = list(objs)
+        files_with_pending_data = [uml_file for uml_file in objs if uml_file._pending_data is not None]
+        if not files_with_pending_data:
+            return super().bulk_create(objs, *args, **kwargs)
+
+        with transaction.atomic(using=self.db):
+            blobs = UmlFileBlob.objects.get_or_create_for_contents(uml_file._pending_data for uml_file in files_with_pending_data)
+            for uml_file in files_with_pending_data:
+                uml_file._assign_blob(blobs[calculate_content_hash(uml_file._pending_data)])
+            created_files = super().bulk_create(objs, *args, **kwargs)
+            # First revisions of the new files are snapshots referencing the same blobs
+            UmlFileRevision.objects.bulk_create([
+                UmlFileRevision.create_snapshot(uml_file.id, 1, uml_file.blob) for uml_file in files_with_pending_data if uml_file.id is not None
+            ])
+            references_counts = Counter(uml_file.blob_id for uml_file in files_with_pending_data)
+            references_counts.update(uml_file.blob_id for uml_file in files_with_pending_data if uml_file.id is not None)
+            UmlFileBlob.objects.add_references(references_counts)
+        return created_files
+
+    def with_data(self) -> "UmlFileQuerySet":
+        """Opts in to loading the content of the files, which is otherwise deferred. Clears the other deferred fields."""
+        return self.defer(None).select_related("blob")
+
+    def transition_state(self, file_id: int, state: ProcessStatus, process_id: Optional[str] = None) -> Optional[ProcessStatus]:
+        """
+        Applies the status transition with guarded UPDATEs, which touch only the status columns.
+        Each UPDATE expects one previous state, starting with the most likely ones, so the first UPDATE which
+        changes the row tells its previous state without selecting it. Returns the previous state of the applied
+        transition, or None when it isn't allowed or the file doesn't exist.
+        """
+        updated_values = {"state": state}
+        if process_id is not None:
+            updated_values["last_process_id"] = process_id
+
+        for previous_state in UmlFile.get_likely_state_predecessors(state):
+            if self.filter(UmlFile.state_transition_condition(state, process_id), id=file_id, state=previous_state).update(**updated_values):
+                return previous_state
+        return None
+
+
+class UmlFileManager(models.Manager.from_queryset(UmlFileQuerySet)):
+    """Loads the files without their content - listing, status and permission checks never need it."""
+
+    def get_queryset(self) -> UmlFileQuerySet:
+        return super().get_queryset().defer("inline_data")
+
+
 class UmlFile(models.Model):
     """
     Model representing an UML file.
@@ -65,7 +270,12 @@ class UmlFile(models.Model):
         PAPYRUS_NOTATION = "notation_papyrus", _("Papyrus Notation")
         STARUML_MDJ = "mdj_staruml", _("StarUML XMI")
 
-    data = models.TextField()
+    # Content of the files saved before the blob store - moved to the blobs by backfill_uml_file_blobs
+    inline_data = models.TextField(db_column="data", blank=True, default="")
+    blob = models.ForeignKey(
+        UmlFileBlob, on_delete=models.PROTECT, related_name="files",
+        blank=True, null=True, default=None
+    )
     filename = models.CharField(max_length=200, default=None, blank=True, null=True)
     
     format = models.CharField(
@@ -81,11 +291,454 @@ class UmlFile(models.Model):
         blank=True, null=True
     )
     date_uploaded = models.DateTimeField(auto_now_add=True)
+    translation_part = models.ForeignKey(
+        TranslationPart, on_delete=models.SET_NULL, related_name="files",
+        blank=True, null=True, default=None
+    )
+
+    objects = UmlFileManager()
+
+    class Meta:
+        # Files loaded for the cascade deletion of their models are also loaded without the content
+        base_manager_name = "objects"
+        indexes = [
+            models.Index(fields=["model", "state"], name="umlfile_model_state_idx"),
+        ]
+
+    # Content assigned to the file, which is moved to the blob when the file is saved
+    _pending_data: Optional[str] = None
+
+    # States from which the file can be moved to the given state by the same translation process.
+    # Status reported by a different process than the last one is always applied.
+    ALLOWED_STATE_PREDECESSORS = {
+        ProcessStatus.QUEUED: tuple(ProcessStatus),
+        ProcessStatus.RUNNING: (ProcessStatus.QUEUED,),
+        ProcessStatus.FINISHED: (ProcessStatus.RUNNING, ProcessStatus.QUEUED),
+        ProcessStatus.PARTIAL_SUCCESS: (ProcessStatus.RUNNING, ProcessStatus.QUEUED),
+        ProcessStatus.FAILED: (ProcessStatus.RUNNING, ProcessStatus.QUEUED),
+    }
+
+    @classmethod
+    def state_transition_condition(cls, state: ProcessStatus, process_id: Optional[str] = None) -> models.Q:
+        """Condition equivalent to `state IN (allowed predecessors) OR last_process_id IS DISTINCT FROM process_id`."""
+        if process_id is None:
+            return models.Q()
+        return models.Q(state__in=cls.ALLOWED_STATE_PREDECESSORS[state]) | ~models.Q(last_process_id=process_id)
+
+    @classmethod
+    def get_likely_state_predecessors(cls, state: ProcessStatus) -> Tuple[ProcessStatus, ...]:
+        """All the states, starting with the allowed predecessors, which are ordered from the most likely one."""
+        allowed_predecessors = cls.ALLOWED_STATE_PREDECESSORS[state]
+        return allowed_predecessors + tuple(previous_state for previous_state in ProcessStatus if previous_state not in allowed_predecessors)
+
+    def can_transition_to(self, state: ProcessStatus, process_id: Optional[str] = None) -> bool:
+        if process_id is None:
+            return True
+        return self.last_process_id != process_id or self.state in self.ALLOWED_STATE_PREDECESSORS[state]
+
+    @property
+    def data(self) -> str:
+        if self._pending_data is not None:
+            return self._pending_data
+        if self.blob_id is not None:
+            return self.blob.read_text()
+        return self.inline_data
+
+    @data.setter
+    def data(self, value: str) -> None:
+        self._pending_data = value
+
+    def iter_data_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Streams the byte range of the UTF-8 encoded content, without loading the whole blob."""
+        if self._pending_data is None and self.blob_id is not None:
+            return self.blob.iter_chunks(chunk_size, start, end)
+        return iter_buffer_chunks(self.data.encode("utf-8"), chunk_size, start, end)
+
+    def get_data_length(self) -> int:
+        """Size of the UTF-8 encoded content in bytes."""
+        if self._pending_data is None and self.blob_id is not None:
+            return self.blob.get_content_length()
+        return len(self.data.encode("utf-8"))
+
+    def save(self, *args, **kwargs) -> None:
+        if self._pending_data is None:
+            return super().save(*args, **kwargs)
+
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "blob", "inline_data"} - {"data"}
+
+        with transaction.atomic():
+            # Reference of the blob currently saved in the database is released, even if this instance is outdated
+            previous_blob_id = UmlFile.objects.select_for_update().filter(pk=self.pk).values_list("blob_id", flat=True).first() if self.pk else None
+            content = self._pending_data
+            blob = UmlFileBlob.objects.get_or_create_for_contents([content])[calculate_content_hash(content)]
+            self._assign_blob(blob)
+            super().save(*args, **kwargs)
+            if blob.id != previous_blob_id:
+                UmlFileBlob.objects.add_references({blob.id: 1, previous_blob_id: -1})
+                UmlFileRevision.objects.record(self.pk, blob, content, previous_blob_id)
+
+    def _assign_blob(self, blob: UmlFileBlob) -> None:
+        self.blob = blob
+        self.inline_data = ""
+        self._pending_data = None
 
     def __str__(self):
         return f"File: {self.filename} for model {self.model.name} in format {self.format}"
     
 
+@receiver(post_delete, sender=UmlFile)
+def release_uml_file_blob(sender, instance: UmlFile, **kwargs) -> None:
+    UmlFileBlob.objects.add_references({instance.blob_id: -1})
+
+
+class UmlFileRevisionQuerySet(models.QuerySet):
+    def record(self, uml_file_id: int, blob: UmlFileBlob, content: str, previous_blob_id: Optional[int] = None) -> "UmlFileRevision":
+        """
+        Records the content of the blob as the next revision of the file, replacing the current one.
+        Files without revisions, saved before the history, get their previous content recorded as the first revision.
+        """
+        last_revision = self.filter(file_id=uml_file_id).order_by("-number").first()
+        if last_revision is None and previous_blob_id is not None:
+            last_revision = self.create_snapshot(uml_file_id, 1, UmlFileBlob.objects.get(id=previous_blob_id))
+        if last_revision is not None and last_revision.content_hash == blob.sha256:
+            return last_revision
+
+        if last_revision is None:
+            revision = UmlFileRevision.create_snapshot(uml_file_id, 1, blob)
+        else:
+            revision = self._create_next_revision(last_revision, blob, content, previous_blob_id)
+            self.filter(file_id=uml_file_id, tech_active_flag=True).update(tech_valid_to=timezone.now(), tech_active_flag=False)
+        revision.save()
+        if revision.blob_id is not None:
+            UmlFileBlob.objects.add_references({revision.blob_id: 1})
+        return revision
+
+    def create_snapshot(self, uml_file_id: int, number: int, blob: UmlFileBlob) -> "UmlFileRevision":
+        revision = UmlFileRevision.create_snapshot(uml_file_id, number, blob)
+        revision.save()
+        UmlFileBlob.objects.add_references({blob.id: 1})
+        return revision
+
+    def _create_next_revision(self, last_revision: "UmlFileRevision", blob: UmlFileBlob, content: str, previous_blob_id: Optional[int]) -> "UmlFileRevision":
+        """
+        Delta against the last revision - or a snapshot, when the chain since the last one is long enough,
+        the file is too large to calculate the delta during the request or the delta isn't smaller.
+        """
+        number = last_revision.number + 1
+        last_snapshot_number = self.filter(file_id=last_revision.file_id, blob__isnull=False).aggregate(models.Max("number"))["number__max"] or 0
+        # Counted line breaks are a cheap lower bound of the lines, which spares reading the previous content of large files
+        if number - last_snapshot_number >= settings.UML_FILE_REVISION_SNAPSHOT_INTERVAL or content.count("\n") > settings.UML_FILE_REVISION_DELTA_MAX_LINES:
+            return UmlFileRevision.create_snapshot(last_revision.file_id, number, blob)
+
+        # Previous content is normally still in the replaced blob, without reconstructing it from the deltas
+        previous_blob = UmlFileBlob.objects.filter(id=previous_blob_id, sha256=last_revision.content_hash).first()
+        previous_content = previous_blob.read_text() if previous_blob is not None else last_revision.read_text()
+        delta = calculate_delta(previous_content, content, max_lines_count=settings.UML_FILE_REVISION_DELTA_MAX_LINES)
+        if delta is None or len(delta) >= len(content):
+            return UmlFileRevision.create_snapshot(last_revision.file_id, number, blob)
+        return UmlFileRevision(file_id=last_revision.file_id, number=number, delta=delta, content_hash=blob.sha256, size=blob.size)
+
+
+class UmlFileRevisionManager(models.Manager.from_queryset(UmlFileRevisionQuerySet)):
+    """Loads the revisions without their deltas, which are needed only to reconstruct the content."""
+
+    def get_queryset(self) -> UmlFileRevisionQuerySet:
+        return super().get_queryset().defer("delta")
+
+
+class UmlFileRevision(SCD2Model):
+    """
+    Content of the UML file at some point of its history - the active revision is the current content.
+    Snapshots reference the blob with the whole content, the other revisions store the delta against the previous one.
+    """
+    file = models.ForeignKey(UmlFile, on_delete=models.CASCADE, related_name="revisions")
+    number = models.PositiveIntegerField()
+    blob = models.ForeignKey(
+        UmlFileBlob, on_delete=models.PROTECT, related_name="revisions",
+        blank=True, null=True, default=None
+    )
+    delta = CompressedTextField(blank=True, null=True, default=None)
+    content_hash = models.CharField(max_length=64)
+    # Length of the content in characters
+    size = models.PositiveBigIntegerField()
+
+    objects = UmlFileRevisionManager()
+
+    class Meta:
+        # Revisions loaded for the cascade deletion of their files are also loaded without the deltas
+        base_manager_name = "objects"
+        constraints = [
+            models.UniqueConstraint(fields=["file", "number"], name="unique_uml_file_revision_number"),
+        ]
+
+    @classmethod
+    def create_snapshot(cls, uml_file_id: int, number: int, blob: UmlFileBlob) -> "UmlFileRevision":
+        """Unsaved snapshot - reference of the blob has to be added by the caller."""
+        return cls(file_id=uml_file_id, number=number, blob=blob, content_hash=blob.sha256, size=blob.size)
+
+    @property
+    def is_snapshot(self) -> bool:
+        return self.blob_id is not None
+
+    def read_text(self) -> str:
+        """Reconstructs the content from the last snapshot and the deltas recorded since then."""
+        revisions = list(
+            UmlFileRevision.objects.filter(file_id=self.file_id, number__lte=self.number, number__gte=models.Subquery(
+                UmlFileRevision.objects.filter(file_id=self.file_id, number__lte=self.number, blob__isnull=False)
+                .order_by("-number").values("number")[:1]
+            )).defer(None).select_related("blob").order_by("number")
+        )
+        if not revisions or not revisions[0].is_snapshot:
+            raise ValueError(f"Revision {self.number} of file {self.file_id} has no snapshot to be reconstructed from")
+        content = revisions[0].blob.read_text()
+        for revision in revisions[1:]:
+            content = apply_delta(content, revision.delta)
+        if calculate_content_hash(content) != self.content_hash:
+            raise ValueError(f"Reconstructed revision {self.number} of file {self.file_id} doesn't match its hash")
+        return content
+
+    def __str__(self):
+        return f"Revision {self.number} of file {self.file_id}"
+
+
+@receiver(post_delete, sender=UmlFileRevision)
+def release_uml_file_revision_blob(sender, instance: UmlFileRevision, **kwargs) -> None:
+    UmlFileBlob.objects.add_references({instance.blob_id: -1})
+
+
+class UmlModelSummaryQuerySet(models.QuerySet):
+    def refresh_for_models(self, models_ids: Iterable[int]) -> None:
+        """
+        Recalculates the summaries of the given models with a single grouped query over their files,
+        served by the (model, state) index. Called after the files of the models are added, edited or deleted -
+        status changes are applied incrementally by apply_state_transitions.
+        """
+        models_ids = {model_id for model_id in models_ids if model_id is not None}
+        if not models_ids:
+            return
+
+        with transaction.atomic():
+            # Lock waits for the consumers applying the transitions, whose changes are then counted - or applied afterwards
+            list(self.select_for_update().filter(model_id__in=models_ids).order_by("model_id").values_list("model_id", flat=True))
+            self._recalculate(models_ids)
+
+    def _recalculate(self, models_ids: Iterable[int]) -> None:
+        summaries = {
+            model_id: UmlModelSummary(model_id=model_id, last_activity_at=timezone.now())
+            for model_id in UmlModel.objects.filter(id__in=models_ids).values_list("id", flat=True)
+        }
+        files_groups = (
+            UmlFile.objects.filter(model_id__in=summaries.keys()).values("model_id", "state").order_by()
+            .annotate(files_count=models.Count("id"), total_size=models.Sum("blob__size"))
+        )
+        for files_group in files_groups:
+            summary = summaries[files_group["model_id"]]
+            summary.files_count += files_group["files_count"]
+            summary.total_size += files_group["total_size"] or 0
+            count_field_name = UmlModelSummary.STATE_COUNT_FIELDS[files_group["state"]]
+            setattr(summary, count_field_name, getattr(summary, count_field_name) + files_group["files_count"])
+        for summary in summaries.values():
+            summary.status = summary.derive_status()
+
+        self.bulk_create(
+            summaries.values(), update_conflicts=True, unique_fields=["model"],
+            update_fields=["files_count", *UmlModelSummary.STATE_COUNT_FIELDS.values(), "total_size", "status", "last_activity_at"],
+        )
+
+    def apply_state_transitions(self, transitions: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Moves the files between the state counters of their models - transitions are (file ID, previous state, new state).
+        Has to be called in the transaction which changed the states. Model of the file is found by the UPDATE itself
+        and the status is derived from the changed counters in it, so concurrent consumers never overwrite each other's changes.
+        """
+        counters_changes: Dict[int, Counter] = defaultdict(Counter)
+        for file_id, previous_state, state in transitions:
+            counters_changes[file_id][UmlModelSummary.STATE_COUNT_FIELDS[previous_state]] -= 1
+            counters_changes[file_id][UmlModelSummary.STATE_COUNT_FIELDS[state]] += 1
+
+        files_without_summary_ids = []
+        for file_id, counter_changes in counters_changes.items():
+            if not any(counter_changes.values()):
+                continue
+            counters = {
+                field_name: Greatest(models.F(field_name) + counter_changes[field_name], models.Value(0))
+                for field_name in UmlModelSummary.STATE_COUNT_FIELDS.values()
+            }
+            file_model_id = models.Subquery(UmlFile.objects.filter(id=file_id).values("model_id"))
+            if not self.filter(model_id=file_model_id).update(**counters, status=UmlModelSummary.derive_status_expression(counters), last_activity_at=timezone.now()):
+                files_without_summary_ids.append(file_id)
+
+        if files_without_summary_ids:
+            # Summaries of the models saved before the read model are calculated with the changed states
+            self._recalculate(UmlFile.objects.filter(id__in=files_without_summary_ids, model__isnull=False).values_list("model_id", flat=True))
+
+    def get_or_refresh(self, models_ids: Iterable[int]) -> Dict[int, "UmlModelSummary"]:
+        """Summaries of the models by their IDs - summaries of the models saved before the read model are calculated."""
+        models_ids = list(models_ids)
+        summaries = self.in_bulk(models_ids)
+        if (missing_models_ids := set(models_ids) - summaries.keys()):
+            self.refresh_for_models(missing_models_ids)
+            summaries.update(self.in_bulk(list(missing_models_ids)))
+        return summaries
+
+
+class UmlModelSummary(models.Model):
+    """Read model of the files of the UML model, so that the listings don't have to load the files."""
+    model = models.OneToOneField(UmlModel, on_delete=models.CASCADE, primary_key=True, related_name="summary")
+    files_count = models.PositiveIntegerField(default=0)
+    queued_files_count = models.PositiveIntegerField(default=0)
+    running_files_count = models.PositiveIntegerField(default=0)
+    finished_files_count = models.PositiveIntegerField(default=0)
+    partial_success_files_count = models.PositiveIntegerField(default=0)
+    failed_files_count = models.PositiveIntegerField(default=0)
+    # Length of the contents of the files in characters - files not moved to the blobs yet are counted by backfill_uml_file_blobs
+    total_size = models.PositiveBigIntegerField(default=0)
+    status = models.IntegerField(choices=ProcessStatus.choices, default=ProcessStatus.PARTIAL_SUCCESS)
+    last_activity_at = models.DateTimeField(default=timezone.now)
+
+    objects = UmlModelSummaryQuerySet.as_manager()
+
+    STATE_COUNT_FIELDS = {
+        ProcessStatus.QUEUED: "queued_files_count",
+        ProcessStatus.RUNNING: "running_files_count",
+        ProcessStatus.FINISHED: "finished_files_count",
+        ProcessStatus.PARTIAL_SUCCESS: "partial_success_files_count",
+        ProcessStatus.FAILED: "failed_files_count",
+    }
+
+    def derive_status(self) -> ProcessStatus:
+        """Model is as advanced as its least advanced file - it's failed only when all its files failed."""
+        if self.running_files_count:
+            return ProcessStatus.RUNNING
+        if self.queued_files_count:
+            return ProcessStatus.QUEUED
+        if self.finished_files_count:
+            return ProcessStatus.FINISHED
+        if self.failed_files_count and not self.partial_success_files_count:
+            return ProcessStatus.FAILED
+        return ProcessStatus.PARTIAL_SUCCESS
+
+    @staticmethod
+    def derive_status_expression(counters: Dict[str, models.Expression]) -> models.Case:
+        """derive_status() calculated by the database from the expressions of the state counters."""
+        return models.Case(
+            models.When(GreaterThan(counters["running_files_count"], 0), then=models.Value(ProcessStatus.RUNNING)),
+            models.When(GreaterThan(counters["queued_files_count"], 0), then=models.Value(ProcessStatus.QUEUED)),
+            models.When(GreaterThan(counters["finished_files_count"], 0), then=models.Value(ProcessStatus.FINISHED)),
+            models.When(GreaterThan(counters["partial_success_files_count"], 0), then=models.Value(ProcessStatus.PARTIAL_SUCCESS)),
+            models.When(GreaterThan(counters["failed_files_count"], 0), then=models.Value(ProcessStatus.FAILED)),
+            default=models.Value(ProcessStatus.PARTIAL_SUCCESS),
+        )
+
+    def __str__(self):
+        return f"Summary of model {self.model_id}: {self.files_count} files, status {ProcessStatus(self.status).label}"
+
+
+class OutboxMessageStatus(models.IntegerChoices):
+    """Enum representing the publishing status of an outbox message."""
+    PENDING = 10
+    PUBLISHED = 20
+    FAILED = 30
+
+
+class TranslationRequestOrigin(models.IntegerChoices):
+    """Enum representing the action which requested the translation."""
+    INTERACTIVE = 10
+    BULK_UPLOAD = 20
+    MASS_RETRANSLATION = 30
+
+
+class TranslationOutboxMessage(models.Model):
+    """
+    Translation request saved in the same transaction as the model and its files.
+    Messages are published to the broker by the relay_translation_outbox command.
+    """
+    model = models.ForeignKey(
+        UmlModel, on_delete=models.CASCADE, related_name="translation_outbox_messages"
+    )
+    # User who requested the translation - used to share the translation service fairly between users
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, related_name="translation_outbox_messages",
+        blank=True, null=True
+    )
+    # Set when the message requests translation of only a part of the model
+    translation_part = models.ForeignKey(
+        TranslationPart, on_delete=models.SET_NULL, related_name="translation_outbox_messages",
+        blank=True, null=True, default=None
+    )
+    queue_name = models.CharField(max_length=200)
+    payload = models.JSONField()
+    status = models.IntegerField(
+        choices=OutboxMessageStatus.choices, default=OutboxMessageStatus.PENDING
+    )
+    origin = models.IntegerField(
+        choices=TranslationRequestOrigin.choices, default=TranslationRequestOrigin.INTERACTIVE
+    )
+    priority = models.PositiveSmallIntegerField(default=0)
+    publish_attempts_count = models.PositiveIntegerField(default=0)
+    # Number of translation requests merged into this message
+    coalesced_requests_count = models.PositiveIntegerField(default=1)
+    last_error = models.TextField(blank=True, null=True, default=None)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Message isn't published before this time, e.g. when waiting for the retry after failed publishing
+    available_at = models.DateTimeField(default=timezone.now)
+    published_at = models.DateTimeField(blank=True, null=True, default=None)
+    # Time when no file of the model was waiting for the translation anymore
+    completed_at = models.DateTimeField(blank=True, null=True, default=None)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+            models.Index(fields=["user", "status"]),
+        ]
+
+    def __str__(self):
+        return f"Translation request for model {self.model_id} ({self.get_status_display()})"
+
+
+class MessageBrokerQueueSnapshot(models.Model):
+    """Last depth of the queue sampled by the outbox relay, shared with the web workers."""
+    queue_name = models.CharField(max_length=200, unique=True)
+    messages_count = models.PositiveIntegerField(default=0)
+    consumers_count = models.PositiveIntegerField(default=0)
+    # Publishing to the queue is slowed down or deferred
+    is_throttled = models.BooleanField(default=False)
+    sampled_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Queue {self.queue_name}: {self.messages_count} messages, {self.consumers_count} consumers"
+
+
+class BrokerQueueMessage(models.Model):
+    """Message of the database broker backend. Row is deleted when the message is acknowledged."""
+    queue_name = models.CharField(max_length=200)
+    body = models.TextField()
+    priority = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Message is delivered to a single consumer until then - afterwards it is delivered again
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    delivery_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["queue_name", "priority", "id"]),
+        ]
+
+    def __str__(self):
+        return f"Message {self.id} in queue {self.queue_name}"
+
+
+class UserTranslationQuota(models.Model):
+    """Share of the translation service given to the user. Users without quota get the default one."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="translation_quota")
+    weight = models.PositiveSmallIntegerField(default=1)
+    max_in_flight_messages = models.PositiveIntegerField(blank=True, null=True, default=None)
+
+    def __str__(self):
+        return f"Translation quota of user {self.user}: weight {self.weight}"
+
+
 class UserAccessToModel(models.Model):
     """Model representing a user's access to a UML model."""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -93,5 +746,12 @@ class UserAccessToModel(models.Model):
     access_level = models.IntegerField(
         choices=ObjectAccessLevel.choices, default=ObjectAccessLevel.WRITE
     )
+
+    class Meta:
+        constraints = [
+            # Also serves as the index of the access checks filtering by the user
+            models.UniqueConstraint(fields=["user", "model"], name="unique_user_access_to_model"),
+        ]
+
     def __str__(self):
         return f"User {self.user} has access to model {self.model}"
@@ -1,23 +1,52 @@
 from typing import List
 
 from rest_framework import serializers
-from umlars_app.models import UmlModel, UmlFile
+from umlars_app.models import UmlModel, UmlModelSummary, UmlFile, UmlFileRevision
+
+
+class UmlModelSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UmlModelSummary
+        exclude = ["model"]
 
 
 class UmlModelSerializer(serializers.ModelSerializer):
+    # Stored compressed - model field is binary
+    formatted_data = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    summary = UmlModelSummarySerializer(read_only=True)
+
     class Meta:
         model = UmlModel
-        fields = ["name", "description", "source_files", "formatted_data", "accessed_by", "id"]
+        fields = ["name", "description", "source_files", "formatted_data", "accessed_by", "id", "summary"]
         read_only_fields = ["tech_valid_from", "tech_valid_to", "tech_active_flag",]
 
 
 class UmlFileSerializer(serializers.ModelSerializer):
+    # Content is stored in the blob of the file
+    data = serializers.CharField(style={"base_template": "textarea.html"})
+
     class Meta:
         model = UmlFile
         fields = ['id', 'data', 'format', 'filename', 'state']
         read_only_fields = ["tech_valid_from", "tech_valid_to", "tech_active_flag",]
 
 
+class UmlFileRevisionSerializer(serializers.ModelSerializer):
+    is_snapshot = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = UmlFileRevision
+        fields = ["number", "is_snapshot", "content_hash", "size", "tech_valid_from", "tech_valid_to", "tech_active_flag"]
+
+
+class UmlFileRevisionDataSerializer(UmlFileRevisionSerializer):
+    # Reconstructed from the last snapshot and the deltas
+    data = serializers.CharField(source="read_text", read_only=True)
+
+    class Meta(UmlFileRevisionSerializer.Meta):
+        fields = UmlFileRevisionSerializer.Meta.fields + ["data"]
+
+
 class UmlModelFilesSerializer(serializers.ModelSerializer):
     source_files = UmlFileSerializer(many=True)
 
@@ -26,6 +55,21 @@ class UmlModelFilesSerializer(serializers.ModelSerializer):
         fields = ["id", "source_files"]
 
 
+class UmlFileMetadataSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UmlFile
+        fields = ['id', 'format', 'filename', 'state']
+
+
+class UmlModelFilesMetadataSerializer(serializers.ModelSerializer):
+    # Listing of many models doesn't load the contents of their files
+    source_files = UmlFileMetadataSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = UmlModel
+        fields = ["id", "source_files"]
+
+
 class UmlFilesTranslationQueueMessageSerializer(serializers.ModelSerializer):
     ids_of_source_files = serializers.SerializerMethodField('_ids_of_source_files')
     ids_of_edited_files = serializers.SerializerMethodField('_ids_of_edited_files')
@@ -1,23 +1,27 @@
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from umlars_app.models import UmlModel, UmlFile
+from umlars_app.models import UmlModel, UmlModelSummary, UmlFile, UmlFileBlob
 from umlars_app.rest.permissions import IsOwner, IsFileOwner
-from umlars_app.rest.serializers import UmlModelSerializer, UmlFileSerializer, UmlModelFilesSerializer
+from umlars_app.rest.serializers import UmlModelSerializer, UmlFileSerializer, UmlModelFilesSerializer, UmlModelFilesMetadataSerializer, UmlFileRevisionSerializer, UmlFileRevisionDataSerializer
 
 
 class UmlModelViewSet(viewsets.ModelViewSet):
-    queryset = UmlModel.objects.all()
+    queryset = UmlModel.objects.select_related("summary").prefetch_related("source_files", "accessed_by")
     serializer_class = UmlModelSerializer
     authentication_classes = [JWTAuthentication, SessionAuthentication, BasicAuthentication]
     permission_classes = [IsAuthenticated & (IsAdminUser|IsOwner)]
 
     def get_queryset(self):
         if self.request.user.is_superuser:
-            return UmlModel.objects.all()
-        return UmlModel.objects.filter(accessed_by__id=self.request.user.id)
+            return self.queryset.all()
+        return self.queryset.filter(accessed_by__id=self.request.user.id)
     
     def perform_create(self, serializer):
         super().perform_create(serializer)
@@ -25,31 +29,71 @@ class UmlModelViewSet(viewsets.ModelViewSet):
 
 
 class UmlFileViewSet(viewsets.ModelViewSet):
-    queryset = UmlFile.objects.all()
+    queryset = UmlFile.objects.with_data()
     serializer_class = UmlFileSerializer
     authentication_classes = [JWTAuthentication, SessionAuthentication, BasicAuthentication]
     permission_classes = [IsAuthenticated & (IsAdminUser|IsFileOwner)]
 
     def get_queryset(self):
-        if self.request.user.is_superuser:
-            return UmlFile.objects.all()
-        return UmlFile.objects.filter(model__accessed_by__id=self.request.user.id)
+        uml_files = UmlFile.objects.all() if self.request.user.is_superuser else UmlFile.objects.filter(model__accessed_by__id=self.request.user.id)
+        # Revisions are read without the current content of the file
+        if self.action in ("revisions", "revision"):
+            return uml_files
+        return uml_files.with_data()
+
+    def retrieve(self, request, *args, **kwargs):
+        uml_file = self.get_object()
+        UmlFileBlob.objects.mark_accessed([uml_file.blob_id])
+        return Response(self.get_serializer(uml_file).data)
     
+    @action(detail=True, methods=["get"])
+    def revisions(self, request, pk=None):
+        uml_file = self.get_object()
+        return Response(UmlFileRevisionSerializer(uml_file.revisions.order_by("number"), many=True).data)
+
+    @action(detail=True, methods=["get"], url_path=r"revisions/(?P<number>\d+)")
+    def revision(self, request, pk=None, number=None):
+        uml_file = self.get_object()
+        revision = get_object_or_404(uml_file.revisions, number=number)
+        return Response(UmlFileRevisionDataSerializer(revision).data)
+
     def perform_create(self, serializer):
         super().perform_create(serializer)
         serializer.instance.model.accessed_by.add(self.request.user)
+        UmlModelSummary.objects.refresh_for_models([serializer.instance.model_id])
+
+    def perform_update(self, serializer):
+        previous_model_id = serializer.instance.model_id
+        super().perform_update(serializer)
+        UmlModelSummary.objects.refresh_for_models([previous_model_id, serializer.instance.model_id])
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        UmlModelSummary.objects.refresh_for_models([instance.model_id])
 
 
 class UmlModelFilesViewSet(viewsets.ModelViewSet):
-    queryset = UmlModel.objects.all().prefetch_related('source_files')
+    queryset = UmlModel.objects.all().prefetch_related(Prefetch("source_files", queryset=UmlFile.objects.with_data()))
     serializer_class = UmlModelFilesSerializer
     authentication_classes = [JWTAuthentication, SessionAuthentication, BasicAuthentication]
     permission_classes = [IsAuthenticated & (IsAdminUser|IsOwner)]
 
     def get_queryset(self):
-        if self.request.user.is_superuser:
-            return UmlModel.objects.all().prefetch_related('source_files')
-        return UmlModel.objects.filter(accessed_by__id=self.request.user.id).prefetch_related('source_files')
+        uml_models = UmlModel.objects.all() if self.request.user.is_superuser else UmlModel.objects.filter(accessed_by__id=self.request.user.id)
+        # Contents are loaded only for a single model - the listing shows the files without them
+        uml_files = UmlFile.objects.all() if self.action == "list" else UmlFile.objects.with_data()
+        return uml_models.prefetch_related(Prefetch("source_files", queryset=uml_files))
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return UmlModelFilesMetadataSerializer
+        return super().get_serializer_class()
+
+    def retrieve(self, request, *args, **kwargs):
+        uml_model = self.get_object()
+        # Files read for the translation are kept in the hot compression tier
+        UmlFileBlob.objects.mark_accessed(uml_file.blob_id for uml_file in uml_model.source_files.all())
+        return Response(self.get_serializer(uml_model).data)
     
     def perform_create(self, serializer):
         super().perform_create(serializer)
@@ -6,11 +6,75 @@ MESSAGE_BROKER_HOST = os.environ.get("RABBITMQ_HOST", "localhost")
 MESSAGE_BROKER_PORT = os.environ.get("RABBITMQ_NODE_PORT", 5672)
 MESSAGE_BROKER_USER = os.environ.get("RABBITMQ_DEFAULT_USER", "admin")
 MESSAGE_BROKER_PASSWORD = os.environ.get("RABBITMQ_DEFAULT_PASS", "admin")
+# Broker used for the translation requests and statuses: "rabbitmq", "database" (table with SKIP LOCKED claims) or "memory" (single process only)
+MESSAGE_BROKER_BACKEND = os.environ.get("MESSAGE_BROKER_BACKEND", "rabbitmq")
+MESSAGE_BROKER_DATABASE_VISIBILITY_TIMEOUT_SECONDS = float(os.environ.get("MESSAGE_BROKER_DATABASE_VISIBILITY_TIMEOUT_SECONDS", 300))
+MESSAGE_BROKER_DATABASE_POLL_INTERVAL_SECONDS = float(os.environ.get("MESSAGE_BROKER_DATABASE_POLL_INTERVAL_SECONDS", 0.2))
+# Message of the database backend delivered this number of times without being acknowledged is moved to the "<queue>.dead-letter" queue
+MESSAGE_BROKER_DATABASE_MAX_DELIVERIES = int(os.environ.get("MESSAGE_BROKER_DATABASE_MAX_DELIVERIES", 5))
 MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME = os.environ.get("RABBITMQ_QUEUE_NAME_TRANLATED_MODELS", "translated_models")
 MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME = os.environ.get("RABBITMQ_QUEUE_NAME_UPLOADED_FILES", "uploaded_files")
 MESSAGE_BROKER_PREFETCH_COUNT = 100
+# Queues are split into shards named "<queue>.<index>", messages are routed by a consistent hash of the model ID
+MESSAGE_BROKER_SHARDS_COUNT = int(os.environ.get("RABBITMQ_SHARDS_COUNT", 1))
+# Priority levels of the uploaded files queue - 0 disables the priorities. Arguments of an existing queue can't be changed,
+# so enabling them requires deleting the queue (and its shards) and declaring it with the same x-max-priority in the translation service
+MESSAGE_BROKER_QUEUE_MAX_PRIORITY = int(os.environ.get("RABBITMQ_QUEUE_MAX_PRIORITY", 0))
+MESSAGE_BROKER_RECONNECT_BASE_DELAY_SECONDS = float(os.environ.get("RABBITMQ_RECONNECT_BASE_DELAY_SECONDS", 1))
+MESSAGE_BROKER_RECONNECT_MAX_DELAY_SECONDS = float(os.environ.get("RABBITMQ_RECONNECT_MAX_DELAY_SECONDS", 60))
+MESSAGE_BROKER_PRODUCER_POOL_SIZE = int(os.environ.get("RABBITMQ_PRODUCER_POOL_SIZE", 8))
+MESSAGE_BROKER_PRODUCER_HEALTH_CHECK_INTERVAL_SECONDS = float(os.environ.get("RABBITMQ_PRODUCER_HEALTH_CHECK_INTERVAL_SECONDS", 30))
+MESSAGE_BROKER_PRODUCER_ACQUIRE_TIMEOUT_SECONDS = float(os.environ.get("RABBITMQ_PRODUCER_ACQUIRE_TIMEOUT_SECONDS", 10))
+MESSAGE_BROKER_PRODUCER_MAX_UNCONFIRMED_MESSAGES = int(os.environ.get("RABBITMQ_PRODUCER_MAX_UNCONFIRMED_MESSAGES", 1000))
+MESSAGE_BROKER_PRODUCER_CONFIRM_TIMEOUT_SECONDS = float(os.environ.get("RABBITMQ_PRODUCER_CONFIRM_TIMEOUT_SECONDS", 30))
+MESSAGE_BROKER_BLOCKED_CONNECTION_TIMEOUT_SECONDS = float(os.environ.get("RABBITMQ_BLOCKED_CONNECTION_TIMEOUT_SECONDS", 30))
+MESSAGE_BROKER_ADMISSION_SAMPLE_INTERVAL_SECONDS = float(os.environ.get("RABBITMQ_ADMISSION_SAMPLE_INTERVAL_SECONDS", 5))
+MESSAGE_BROKER_ADMISSION_HIGH_WATER_MARK = int(os.environ.get("RABBITMQ_ADMISSION_HIGH_WATER_MARK", 10000))
+MESSAGE_BROKER_ADMISSION_MAX_QUEUE_DEPTH = int(os.environ.get("RABBITMQ_ADMISSION_MAX_QUEUE_DEPTH", 50000))
+MESSAGE_BROKER_ADMISSION_THROTTLED_RATE = float(os.environ.get("RABBITMQ_ADMISSION_THROTTLED_RATE", 50))
+MESSAGE_BROKER_CONSUMER_BATCH_SIZE = int(os.environ.get("RABBITMQ_CONSUMER_BATCH_SIZE", 1))
+MESSAGE_BROKER_CONSUMER_BATCH_TIMEOUT_MS = int(os.environ.get("RABBITMQ_CONSUMER_BATCH_TIMEOUT_MS", 200))
+MESSAGE_BROKER_CONSUMER_MIN_PROCESSES = int(os.environ.get("RABBITMQ_CONSUMER_MIN_PROCESSES", 1))
+MESSAGE_BROKER_CONSUMER_MAX_PROCESSES = int(os.environ.get("RABBITMQ_CONSUMER_MAX_PROCESSES", os.cpu_count() or 1))
+MESSAGE_BROKER_CONSUMER_MESSAGES_PER_PROCESS = int(os.environ.get("RABBITMQ_CONSUMER_MESSAGES_PER_PROCESS", 500))
+MESSAGE_BROKER_CONSUMER_AUTOSCALE_INTERVAL_SECONDS = int(os.environ.get("RABBITMQ_CONSUMER_AUTOSCALE_INTERVAL_SECONDS", 10))
+MESSAGE_BROKER_CONSUMER_ENGINE = os.environ.get("RABBITMQ_CONSUMER_ENGINE", "blocking")
+MESSAGE_BROKER_EVENT_LOOP = os.environ.get("RABBITMQ_CONSUMER_EVENT_LOOP", "asyncio")
+MESSAGE_BROKER_ASYNC_MAX_IN_FLIGHT_MESSAGES = int(os.environ.get("RABBITMQ_CONSUMER_ASYNC_MAX_IN_FLIGHT_MESSAGES", 500))
+MESSAGE_BROKER_ASYNC_DB_WORKERS = int(os.environ.get("RABBITMQ_CONSUMER_ASYNC_DB_WORKERS", 8))
+# File to which the consumers append the received messages, to be replayed by replay_queue_capture - capture is disabled when not set
+MESSAGE_BROKER_CONSUMER_CAPTURE_PATH = os.environ.get("RABBITMQ_CONSUMER_CAPTURE_PATH") or None
 
 
 TRANSLATION_SERVICE_HOST = os.environ.get("TRANSLATION_SERVICE_HOST", "localhost")
 TRANSLATION_SERVICE_PORT = os.environ.get("TRANSLATION_SERVICE_PORT", 8020)
-TRANSLATION_SERVICE_MODELS_ENDPOINT = os.environ.get("TRANSLATION_SERVICE_MODELS_ENDPOINT", "uml-models")
\ No newline at end of file
+TRANSLATION_SERVICE_MODELS_ENDPOINT = os.environ.get("TRANSLATION_SERVICE_MODELS_ENDPOINT", "uml-models")
+TRANSLATION_OUTBOX_BATCH_SIZE = int(os.environ.get("TRANSLATION_OUTBOX_BATCH_SIZE", 500))
+TRANSLATION_OUTBOX_POLL_INTERVAL_SECONDS = float(os.environ.get("TRANSLATION_OUTBOX_POLL_INTERVAL_SECONDS", 0.5))
+TRANSLATION_OUTBOX_MAX_PUBLISH_ATTEMPTS = int(os.environ.get("TRANSLATION_OUTBOX_MAX_PUBLISH_ATTEMPTS", 10))
+TRANSLATION_OUTBOX_RETENTION_HOURS = float(os.environ.get("TRANSLATION_OUTBOX_RETENTION_HOURS", 24))
+TRANSLATION_REQUEST_COALESCING_WINDOW_SECONDS = float(os.environ.get("TRANSLATION_REQUEST_COALESCING_WINDOW_SECONDS", 2))
+TRANSLATION_REQUEST_MAX_DELAY_SECONDS = float(os.environ.get("TRANSLATION_REQUEST_MAX_DELAY_SECONDS", 30))
+TRANSLATION_MAX_IN_FLIGHT_MESSAGES_PER_USER = int(os.environ.get("TRANSLATION_MAX_IN_FLIGHT_MESSAGES_PER_USER", 50))
+TRANSLATION_IN_FLIGHT_TIMEOUT_SECONDS = float(os.environ.get("TRANSLATION_IN_FLIGHT_TIMEOUT_SECONDS", 3600))
+# Models with at least this number of files are translated in parts - 0 disables the fan-out (and the fan-in queries of the status consumers)
+TRANSLATION_FAN_OUT_MIN_FILES = int(os.environ.get("TRANSLATION_FAN_OUT_MIN_FILES", 0))
+
+# Codec of the stored source files and formatted data: "zstd" (falls back to zlib when zstandard isn't installed), "zlib" or "none"
+STORAGE_COMPRESSION_CODEC = os.environ.get("STORAGE_COMPRESSION_CODEC", "zstd")
+# Values smaller than this number of bytes are stored uncompressed
+STORAGE_COMPRESSION_MIN_SIZE = int(os.environ.get("STORAGE_COMPRESSION_MIN_SIZE", 256))
+# Source files not accessed for this number of days are recompressed at a higher level by recompress_cold_uml_files
+STORAGE_COLD_AFTER_DAYS = float(os.environ.get("STORAGE_COLD_AFTER_DAYS", 30))
+# Storage of the new file contents: "database" (compressed column) or "filesystem" (files under MEDIA_ROOT, moved with move_uml_file_blobs)
+UML_FILE_STORAGE_BACKEND = os.environ.get("UML_FILE_STORAGE_BACKEND", "database")
+# Directory under MEDIA_ROOT with the file contents of the filesystem storage
+UML_FILE_STORAGE_DIRECTORY = os.environ.get("UML_FILE_STORAGE_DIRECTORY", "uml-files")
+# Every this number of revisions of a source file is stored whole, the ones in between as deltas against the previous revision
+UML_FILE_REVISION_SNAPSHOT_INTERVAL = int(os.environ.get("UML_FILE_REVISION_SNAPSHOT_INTERVAL", 10))
+# Revisions of larger files (in lines) are always stored whole - matching the lines of the delta is quadratic in the worst case
+UML_FILE_REVISION_DELTA_MAX_LINES = int(os.environ.get("UML_FILE_REVISION_DELTA_MAX_LINES", 10000))
+# Revisions replaced longer than this number of days ago are deleted by prune_uml_file_revisions...
+UML_FILE_REVISION_RETENTION_DAYS = float(os.environ.get("UML_FILE_REVISION_RETENTION_DAYS", 90))
+# ...except for this number of the latest revisions of each file
+UML_FILE_REVISION_KEEP_COUNT = int(os.environ.get("UML_FILE_REVISION_KEEP_COUNT", 10))
@@ -14,6 +14,7 @@ urlpatterns = [
     path("delete-current-user/", views.delete_current_user, name="delete-current-user"),
     path("profile/change-password/", views.change_password, name="profile/change-password"),
     path("uml-model/<int:pk>", views.uml_model, name="uml-model"),
+    path("download-uml-file/<int:pk>", views.download_uml_file, name="download-uml-file"),
     path("delete-uml-model/<int:pk>", views.delete_uml_model, name="delete-uml-model"),
     path("translate-uml-model/<int:pk>", views.translate_uml_model, name="translate-uml-model"),
     path("update-uml-model/<int:pk>", views.update_uml_model, name="update-uml-model"),
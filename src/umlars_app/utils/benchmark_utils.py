@@ -0,0 +1,305 @@
+import itertools
+import math
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from django.contrib.auth.models import User
+from django.db import connection as db_connection
+
+from umlars_app import settings
+from umlars_app.models import UmlModel, UmlFile, UserAccessToModel, ObjectAccessLevel, ProcessStatus
+from umlars_app.message_broker.backends.memory import MemoryBrokerBackend, purge_memory_queues
+from umlars_app.message_broker.capture import read_capture
+from umlars_app.message_broker.consumer import RabbitMQConsumer, BrokerBackendConsumer, PendingMessage
+from umlars_app.message_broker.fake_translator import FakeTranslator
+from umlars_app.message_broker.outbox import TranslationOutboxRelay
+from umlars_app.message_broker.sharding import get_shard_queues_names, assign_shards
+from umlars_app.utils.fan_out_utils import TERMINAL_PROCESS_STATES
+from umlars_app.utils.translation_utils import schedule_translate_uml_model
+
+
+BENCHMARK_USERNAME = "pipeline-benchmark"
+
+
+class PipelineBenchmarkReport(NamedTuple):
+    models_count: int
+    completed_models_count: int
+    failed_files_count: int
+    status_messages_count: int
+    elapsed_seconds: float
+    latency_p50_seconds: Optional[float]
+    latency_p95_seconds: Optional[float]
+    latency_p99_seconds: Optional[float]
+
+    @property
+    def status_messages_per_second(self) -> float:
+        return self.status_messages_count / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def models_per_second(self) -> float:
+        return self.completed_models_count / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class CaptureReplayReport(NamedTuple):
+    messages_count: int
+    acked_count: int
+    rejected_count: int
+    elapsed_seconds: float
+    processing_seconds: float
+    db_queries_count: int
+    db_seconds: float
+    processing_p50_seconds: Optional[float]
+    processing_p95_seconds: Optional[float]
+    processing_p99_seconds: Optional[float]
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages_count / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def max_messages_per_second(self) -> float:
+        """Throughput of the consumer alone, without the pauses between the replayed messages."""
+        return self.messages_count / self.processing_seconds if self.processing_seconds else 0.0
+
+    @property
+    def db_seconds_per_message(self) -> float:
+        return self.db_seconds / self.messages_count if self.messages_count else 0.0
+
+    @property
+    def db_queries_per_message(self) -> float:
+        return self.db_queries_count / self.messages_count if self.messages_count else 0.0
+
+
+def calculate_percentile(sorted_values: Sequence[float], percentile: float) -> Optional[float]:
+    """Nearest-rank percentile of the sorted values."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def _run_closing_db_connection(target: Callable[[], None]) -> Callable[[], None]:
+    def run() -> None:
+        try:
+            target()
+        finally:
+            db_connection.close()
+    return run
+
+
+def create_benchmark_models(user: User, models_count: int, files_per_model: int, file_size: int) -> List[UmlModel]:
+    run_id = uuid.uuid4().hex[:8]
+    models = UmlModel.objects.bulk_create([UmlModel(name=f"benchmark-{run_id}-{index}") for index in range(models_count)])
+    UserAccessToModel.objects.bulk_create([UserAccessToModel(user=user, model=model, access_level=ObjectAccessLevel.WRITE) for model in models])
+    UmlFile.objects.bulk_create([
+        UmlFile(model=model, filename=f"file-{index}.xmi", format=UmlFile.SupportedFormat.EA_XMI, data="x" * file_size)
+        for model in models for index in range(files_per_model)
+    ])
+    return models
+
+
+def run_translation_pipeline_benchmark(
+    models_count: int,
+    files_per_model: int = 1,
+    file_size: int = 1000,
+    latency_seconds: float = 0.0,
+    latency_jitter_seconds: float = 0.0,
+    failure_rate: float = 0.0,
+    translator_threads: int = 1,
+    consumer_threads: int = 1,
+    max_in_flight_messages: int = settings.TRANSLATION_MAX_IN_FLIGHT_MESSAGES_PER_USER,
+    timeout_seconds: float = 300,
+    keep_models: bool = False,
+    report: Optional[Callable[[str], None]] = None,
+) -> PipelineBenchmarkReport:
+    """
+    Drives the models through the whole translation loop: scheduling in the outbox, publishing by the relay,
+    translation by the fake translator and consumption of the statuses. Broker is replaced by the in-memory backend,
+    while the database is the configured one. Latency of the model is measured from scheduling its translation
+    until all its files are in a terminal state.
+    """
+    report = report or (lambda message: None)
+    purge_memory_queues()
+    user, _ = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+    models = create_benchmark_models(user, models_count, files_per_model, file_size)
+    report(f"Created {len(models)} models with {files_per_model} files each")
+
+    status_messages_counter = {"count": 0}
+    counter_lock = threading.Lock()
+
+    def count_status_messages(messages_count: int) -> None:
+        with counter_lock:
+            status_messages_counter["count"] += messages_count
+
+    relay = TranslationOutboxRelay(broker_backend=MemoryBrokerBackend(), max_in_flight_messages_per_user=max_in_flight_messages, poll_interval_seconds=0.01)
+    translators = [FakeTranslator(MemoryBrokerBackend(), latency_seconds, latency_jitter_seconds, failure_rate) for _ in range(translator_threads)]
+    translated_models_queues_names = get_shard_queues_names(settings.MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME)
+    consumers = [
+        BrokerBackendConsumer(
+            settings.MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME, settings.MESSAGE_BROKER_HOST,
+            on_messages_processed=count_status_messages, queues_names=queues_names, broker_backend=MemoryBrokerBackend(),
+        )
+        for queues_names in (assign_shards(translated_models_queues_names, consumer_threads) if len(translated_models_queues_names) > 1 else [None] * consumer_threads)
+    ]
+    threads = [threading.Thread(target=_run_closing_db_connection(worker), daemon=True) for worker in [relay.run] + [translator.run for translator in translators] + [consumer.start_consuming for consumer in consumers]]
+
+    started_at = time.monotonic()
+    for thread in threads:
+        thread.start()
+
+    scheduled_at: Dict[int, float] = dict()
+    for model in models:
+        scheduled_at[model.id] = time.monotonic()
+        schedule_translate_uml_model(None, model, model.source_files.values_list("id", flat=True))
+    report(f"Scheduled translation of {len(models)} models in {time.monotonic() - started_at:.2f}s")
+
+    completed_at: Dict[int, float] = dict()
+    try:
+        while len(completed_at) < len(models) and time.monotonic() - started_at < timeout_seconds:
+            pending_models_ids = [model_id for model_id in scheduled_at if model_id not in completed_at]
+            models_being_translated_ids = set(
+                UmlFile.objects.filter(model_id__in=pending_models_ids).exclude(state__in=TERMINAL_PROCESS_STATES).values_list("model_id", flat=True)
+            )
+            now = time.monotonic()
+            for model_id in pending_models_ids:
+                if model_id not in models_being_translated_ids:
+                    completed_at[model_id] = now
+            time.sleep(0.02)
+        elapsed_seconds = time.monotonic() - started_at
+    finally:
+        relay.stop()
+        for worker in translators + consumers:
+            worker.stop()
+        for thread in threads:
+            thread.join()
+
+    failed_files_count = UmlFile.objects.filter(model__in=models, state=ProcessStatus.FAILED).count()
+    if not keep_models:
+        UmlModel.objects.filter(id__in=[model.id for model in models]).delete()
+
+    latencies = sorted(completed_at[model_id] - scheduled_at[model_id] for model_id in completed_at)
+    return PipelineBenchmarkReport(
+        models_count=len(models),
+        completed_models_count=len(completed_at),
+        failed_files_count=failed_files_count,
+        status_messages_count=status_messages_counter["count"],
+        elapsed_seconds=elapsed_seconds,
+        latency_p50_seconds=calculate_percentile(latencies, 50),
+        latency_p95_seconds=calculate_percentile(latencies, 95),
+        latency_p99_seconds=calculate_percentile(latencies, 99),
+    )
+
+
+class _ReplayChannel:
+    """Stands for the channel of the consumer - records the acknowledgements instead of sending them to the broker."""
+
+    def __init__(self) -> None:
+        self._outstanding_delivery_tags: List[int] = []
+        self.acked_count = 0
+        self.rejected_count = 0
+
+    def deliver(self, delivery_tag: int) -> None:
+        self._outstanding_delivery_tags.append(delivery_tag)
+
+    def basic_ack(self, delivery_tag: int, multiple: bool = False) -> None:
+        acked_delivery_tags = [tag for tag in self._outstanding_delivery_tags if tag == delivery_tag or multiple and tag < delivery_tag]
+        self._outstanding_delivery_tags = [tag for tag in self._outstanding_delivery_tags if tag not in acked_delivery_tags]
+        self.acked_count += len(acked_delivery_tags)
+
+    def basic_nack(self, delivery_tag: int, requeue: bool = True) -> None:
+        self._outstanding_delivery_tags.remove(delivery_tag)
+        self.rejected_count += 1
+
+
+class _DatabaseTimer:
+    """Execute wrapper measuring the time spent in the database queries."""
+
+    def __init__(self) -> None:
+        self.queries_count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started_at
+            self.queries_count += 1
+
+
+def replay_queue_capture(
+    path: str,
+    speed: Optional[float] = 1.0,
+    batch_size: int = settings.MESSAGE_BROKER_CONSUMER_BATCH_SIZE,
+    batch_timeout_ms: int = settings.MESSAGE_BROKER_CONSUMER_BATCH_TIMEOUT_MS,
+    limit: Optional[int] = None,
+) -> CaptureReplayReport:
+    """
+    Feeds the captured messages to the consumer, as if they were delivered by the broker - at the captured pace
+    multiplied by the speed, or as fast as possible when the speed isn't given. Status transitions are applied
+    to the configured database, so the capture should be replayed against a copy of the one it was taken from.
+    """
+    consumer = RabbitMQConsumer(settings.MESSAGE_BROKER_QUEUE_TRANSLATED_MODELS_NAME, settings.MESSAGE_BROKER_HOST, batch_size=batch_size, batch_timeout_ms=batch_timeout_ms, capture_path=None)
+    channel = _ReplayChannel()
+    database_timer = _DatabaseTimer()
+    processing_times: List[float] = []
+    pending_batch: List[PendingMessage] = []
+
+    def process(callback: Callable[[], None], messages_count: int) -> None:
+        started_at = time.perf_counter()
+        callback()
+        processing_time = time.perf_counter() - started_at
+        processing_times.extend([processing_time / messages_count] * messages_count)
+
+    def flush_batch() -> None:
+        batch = list(pending_batch)
+        pending_batch.clear()
+        process(lambda: consumer._process_batch(channel, batch), len(batch))
+
+    messages_count = 0
+    first_captured_at = None
+    batch_started_at = None
+    started_at = time.monotonic()
+    with db_connection.execute_wrapper(database_timer):
+        for delivery_tag, captured_message in enumerate(itertools.islice(read_capture(path), limit), start=1):
+            if speed:
+                if first_captured_at is None:
+                    first_captured_at = captured_message.timestamp
+                due_at = started_at + (captured_message.timestamp - first_captured_at) / speed
+                # Incomplete batch is processed when its timeout passes before the next message arrives
+                if pending_batch and due_at - batch_started_at > batch_timeout_ms / 1000:
+                    flush_batch()
+                time.sleep(max(due_at - time.monotonic(), 0))
+
+            messages_count += 1
+            channel.deliver(delivery_tag)
+            if consumer.is_batch_mode:
+                if not pending_batch:
+                    batch_started_at = time.monotonic()
+                pending_batch.append(PendingMessage(delivery_tag, captured_message.body))
+                if len(pending_batch) >= batch_size:
+                    flush_batch()
+            else:
+                delivery = SimpleNamespace(delivery_tag=delivery_tag, routing_key=captured_message.queue_name)
+                process(lambda: consumer._callback(channel, delivery, None, captured_message.body), 1)
+
+        if pending_batch:
+            flush_batch()
+    elapsed_seconds = time.monotonic() - started_at
+
+    processing_times.sort()
+    return CaptureReplayReport(
+        messages_count=messages_count,
+        acked_count=channel.acked_count,
+        rejected_count=channel.rejected_count,
+        elapsed_seconds=elapsed_seconds,
+        processing_seconds=sum(processing_times),
+        db_queries_count=database_timer.queries_count,
+        db_seconds=database_timer.seconds,
+        processing_p50_seconds=calculate_percentile(processing_times, 50),
+        processing_p95_seconds=calculate_percentile(processing_times, 95),
+        processing_p99_seconds=calculate_percentile(processing_times, 99),
+    )
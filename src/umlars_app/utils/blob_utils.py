@@ -0,0 +1,204 @@
+from collections import Counter
+from datetime import timedelta
+from typing import List, NamedTuple, Optional
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+from umlars_app.fields import CompressedValue
+from umlars_app.models import UmlModel, UmlModelSummary, UmlFile, UmlFileBlob, UmlFileRevision, BlobStorage, calculate_content_hash
+from umlars_app.utils.compression_utils import COLD_TIER_MIN_VALUE, compress_text
+from umlars_app.utils.storage_utils import write_blob_file, delete_blob_file, calculate_blob_file_hash
+
+
+class RecompressionResult(NamedTuple):
+    recompressed_count: int
+    size_before: int
+    size_after: int
+
+
+class MoveBatchResult(NamedTuple):
+    moved_blobs_count: int
+    last_blob_id: Optional[int]
+
+
+class BackfillBatchResult(NamedTuple):
+    moved_files_count: int
+    last_file_id: Optional[int]
+
+
+def backfill_blobs_batch(after_file_id: int, batch_size: int) -> BackfillBatchResult:
+    """
+    Moves the content of the next batch of files saved before the blob store into the blobs.
+    Each batch is a short transaction, and the files locked by the users are skipped, so the backfill can run online.
+    """
+    with transaction.atomic():
+        uml_files = list(
+            UmlFile.objects.select_for_update(skip_locked=True).filter(blob__isnull=True, id__gt=after_file_id)
+            .order_by("id").only("id", "inline_data", "model_id")[:batch_size]
+        )
+        if not uml_files:
+            return BackfillBatchResult(0, None)
+
+        blobs = UmlFileBlob.objects.get_or_create_for_contents(uml_file.inline_data for uml_file in uml_files)
+        for uml_file in uml_files:
+            uml_file.blob = blobs[calculate_content_hash(uml_file.inline_data)]
+            uml_file.inline_data = ""
+        UmlFile.objects.bulk_update(uml_files, ["blob", "inline_data"])
+        UmlFileBlob.objects.add_references(Counter(uml_file.blob_id for uml_file in uml_files))
+        # Sizes of the files are counted from their blobs
+        UmlModelSummary.objects.refresh_for_models({uml_file.model_id for uml_file in uml_files})
+    return BackfillBatchResult(len(uml_files), uml_files[-1].id)
+
+
+def recount_blob_references(batch_size: int) -> int:
+    """Fixes the reference counts which differ from the number of files and revisions referencing the blobs. Returns the number of fixed blobs."""
+    fixed_blobs_count = 0
+    last_blob_id = 0
+    while True:
+        with transaction.atomic():
+            blobs = list(UmlFileBlob.objects.select_for_update().filter(id__gt=last_blob_id).order_by("id").only("id", "ref_count")[:batch_size])
+            if not blobs:
+                return fixed_blobs_count
+            # Counted separately, as rows can't be locked by a query with GROUP BY
+            references_counts = Counter()
+            for referencing_model in (UmlFile, UmlFileRevision):
+                references_counts.update(dict(
+                    referencing_model.objects.filter(blob_id__in=[blob.id for blob in blobs]).values("blob")
+                    .annotate(references_count=Count("id")).order_by().values_list("blob", "references_count")
+                ))
+            blobs_to_fix = [blob for blob in blobs if blob.ref_count != references_counts[blob.id]]
+            for blob in blobs_to_fix:
+                blob.ref_count = references_counts[blob.id]
+            UmlFileBlob.objects.bulk_update(blobs_to_fix, ["ref_count"])
+        fixed_blobs_count += len(blobs_to_fix)
+        last_blob_id = blobs[-1].id
+
+
+def collect_unreferenced_blobs(grace_period_seconds: float, batch_size: int) -> int:
+    """
+    Deletes the blobs without references. Blobs referenced recently are kept for the grace period,
+    as an upload may be about to reference them again. Returns the number of deleted blobs.
+    """
+    deleted_blobs_count = 0
+    while True:
+        with transaction.atomic():
+            blobs = list(
+                UmlFileBlob.objects.select_for_update(skip_locked=True)
+                .filter(ref_count__lte=0, last_referenced_at__lt=timezone.now() - timedelta(seconds=grace_period_seconds))
+                # Reference count is only a hint - blob still referenced by a file or a revision is never deleted
+                .filter(~Exists(UmlFile.objects.filter(blob=OuterRef("pk"))), ~Exists(UmlFileRevision.objects.filter(blob=OuterRef("pk"))))
+                .only("id", "sha256", "storage")[:batch_size]
+            )
+            if not blobs:
+                return deleted_blobs_count
+            UmlFileBlob.objects.filter(id__in=[blob.id for blob in blobs]).delete()
+            files_hashes = [blob.sha256 for blob in blobs if blob.storage == BlobStorage.FILESYSTEM]
+            if files_hashes:
+                transaction.on_commit(lambda files_hashes=files_hashes: _delete_unused_blob_files(files_hashes))
+        deleted_blobs_count += len(blobs)
+
+
+def _delete_unused_blob_files(files_hashes: List[str]) -> None:
+    # Blob with the same content may have been created again since the deletion
+    recreated_hashes = set(UmlFileBlob.objects.filter(sha256__in=files_hashes, storage=BlobStorage.FILESYSTEM).values_list("sha256", flat=True))
+    for sha256 in files_hashes:
+        if sha256 not in recreated_hashes:
+            delete_blob_file(sha256)
+
+
+def move_blobs_batch(after_blob_id: int, batch_size: int, storage: BlobStorage) -> MoveBatchResult:
+    """
+    Moves the next batch of blobs to the given storage. Files written to the filesystem are verified against
+    the hash of the blob before the row is switched to them. Blobs locked by other transactions are skipped.
+    """
+    with transaction.atomic():
+        blobs = list(
+            UmlFileBlob.objects.select_for_update(skip_locked=True).filter(id__gt=after_blob_id).exclude(storage=storage)
+            .order_by("id").only("id", "sha256", "storage", "data")[:batch_size]
+        )
+        if not blobs:
+            return MoveBatchResult(0, None)
+
+        for blob in blobs:
+            if storage == BlobStorage.FILESYSTEM:
+                write_blob_file(blob.sha256, blob.data.encode("utf-8"))
+                if calculate_blob_file_hash(blob.sha256) != blob.sha256:
+                    raise ValueError(f"Content of the blob {blob.id} written to the filesystem doesn't match its hash")
+                UmlFileBlob.objects.filter(id=blob.id).update(storage=storage, data="")
+            else:
+                UmlFileBlob.objects.filter(id=blob.id).update(storage=storage, data=blob.read_text())
+
+        if storage == BlobStorage.DATABASE:
+            # Files are deleted only once the rows no longer point to them
+            files_hashes = [blob.sha256 for blob in blobs]
+            transaction.on_commit(lambda: _delete_unused_blob_files(files_hashes))
+    return MoveBatchResult(len(blobs), blobs[-1].id)
+
+
+def _recompress_cold(value: CompressedValue) -> CompressedValue:
+    recompressed_value = CompressedValue(compress_text(value.text, cold=True))
+    # Values which don't shrink are only marked as cold, to not be tried again
+    if len(recompressed_value.compressed) >= len(value.compressed):
+        return CompressedValue(compress_text(value.text, codec=value.header.codec, cold=True))
+    return recompressed_value
+
+
+def recompress_cold_blobs(cold_after_days: float, batch_size: int) -> RecompressionResult:
+    """
+    Recompresses at the cold level the contents of the files which weren't accessed for the given number of days.
+    Blobs stored in the filesystem are kept uncompressed, so that they can be memory mapped.
+    """
+    data_field = UmlFileBlob._meta.get_field("data")
+    recompressed_count = size_before = size_after = 0
+    last_blob_id = 0
+    while True:
+        with transaction.atomic():
+            blobs = list(
+                UmlFileBlob.objects.select_for_update(skip_locked=True)
+                .filter(id__gt=last_blob_id, storage=BlobStorage.DATABASE, recompressed_at__isnull=True, last_accessed_at__lt=timezone.now() - timedelta(days=cold_after_days))
+                .order_by("id").only("id", "data")[:batch_size]
+            )
+            if not blobs:
+                return RecompressionResult(recompressed_count, size_before, size_after)
+
+            for blob in blobs:
+                value = data_field.get_loaded_value(blob)
+                recompressed_value = _recompress_cold(value)
+                # Queryset update saves the compressed value as it is
+                UmlFileBlob.objects.filter(id=blob.id).update(data=recompressed_value, recompressed_at=timezone.now())
+                size_before += len(value.compressed)
+                size_after += len(recompressed_value.compressed)
+        recompressed_count += len(blobs)
+        last_blob_id = blobs[-1].id
+
+
+def recompress_archived_models_data(cold_after_days: float, batch_size: int) -> RecompressionResult:
+    """
+    Recompresses at the cold level the formatted data of the models archived for the given number of days.
+    Access to the models isn't tracked, so only the archived ones are moved to the cold tier.
+    """
+    formatted_data_field = UmlModel._meta.get_field("formatted_data")
+    recompressed_count = size_before = size_after = 0
+    last_model_id = 0
+    while True:
+        with transaction.atomic():
+            uml_models = list(
+                UmlModel.objects.select_for_update(skip_locked=True)
+                .filter(id__gt=last_model_id, tech_active_flag=False, tech_valid_to__lt=timezone.now() - timedelta(days=cold_after_days))
+                # Values already marked as cold in their header are never loaded again
+                .filter(formatted_data__lt=COLD_TIER_MIN_VALUE)
+                .order_by("id").only("id", "formatted_data")[:batch_size]
+            )
+            if not uml_models:
+                return RecompressionResult(recompressed_count, size_before, size_after)
+
+            for uml_model in uml_models:
+                value = formatted_data_field.get_loaded_value(uml_model)
+                recompressed_value = _recompress_cold(value)
+                UmlModel.objects.filter(id=uml_model.id).update(formatted_data=recompressed_value)
+                recompressed_count += 1
+                size_before += len(value.compressed)
+                size_after += len(recompressed_value.compressed)
+        last_model_id = uml_models[-1].id
@@ -0,0 +1,113 @@
+import zlib
+from enum import IntEnum
+from typing import Iterator, NamedTuple, Optional
+
+from umlars_app import settings
+from umlars_app.utils.logging import get_new_sublogger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+logger = get_new_sublogger(__name__)
+
+
+class CompressionCodec(IntEnum):
+    """Codec of the stored value, saved in the low bits of its header byte."""
+    NONE = 0
+    ZLIB = 1
+    ZSTD = 2
+
+
+# Header bit marking values recompressed at the cold level by recompress_cold_uml_files
+COLD_TIER_FLAG = 0x80
+# Stored values are compared byte by byte, so the ones not marked as cold sort below this one
+COLD_TIER_MIN_VALUE = bytes((COLD_TIER_FLAG,))
+CODECS_NAMES = {"none": CompressionCodec.NONE, "zlib": CompressionCodec.ZLIB, "zstd": CompressionCodec.ZSTD}
+# Compression levels of the codecs - (level used on save, level of the cold tier)
+COMPRESSION_LEVELS = {
+    CompressionCodec.ZLIB: (6, 9),
+    CompressionCodec.ZSTD: (3, 19),
+}
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class CompressionHeader(NamedTuple):
+    codec: CompressionCodec
+    is_cold: bool
+
+
+def is_codec_available(codec: CompressionCodec) -> bool:
+    return codec != CompressionCodec.ZSTD or zstandard is not None
+
+
+def get_default_codec() -> CompressionCodec:
+    codec = CODECS_NAMES[settings.STORAGE_COMPRESSION_CODEC]
+    if not is_codec_available(codec):
+        # zstd is optional - values already compressed with it can't be read without the package either
+        logger.warning("zstandard is not installed - falling back to zlib compression")
+        return CompressionCodec.ZLIB
+    return codec
+
+
+def read_header(compressed: bytes) -> CompressionHeader:
+    if not compressed:
+        return CompressionHeader(CompressionCodec.NONE, False)
+    return CompressionHeader(CompressionCodec(compressed[0] & ~COLD_TIER_FLAG), bool(compressed[0] & COLD_TIER_FLAG))
+
+
+def compress_text(text: str, codec: Optional[CompressionCodec] = None, cold: bool = False) -> bytes:
+    """
+    Encodes the text as UTF-8 and compresses it, prefixed with the header byte naming the codec.
+    Values shorter than STORAGE_COMPRESSION_MIN_SIZE are stored uncompressed.
+    """
+    encoded = text.encode("utf-8")
+    codec = get_default_codec() if codec is None else codec
+    if len(encoded) < settings.STORAGE_COMPRESSION_MIN_SIZE:
+        codec = CompressionCodec.NONE
+
+    if codec == CompressionCodec.NONE:
+        payload = encoded
+    else:
+        level = COMPRESSION_LEVELS[codec][cold]
+        if codec == CompressionCodec.ZLIB:
+            payload = zlib.compress(encoded, level)
+        else:
+            payload = zstandard.ZstdCompressor(level=level).compress(encoded)
+    return bytes((codec | (COLD_TIER_FLAG if cold else 0),)) + payload
+
+
+def decompress_text(compressed: bytes) -> str:
+    return b"".join(iter_decompressed_chunks(compressed)).decode("utf-8")
+
+
+def iter_decompressed_chunks(compressed: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yields the UTF-8 encoded text in chunks, without decompressing the whole value at once."""
+    if not compressed:
+        return
+    codec = read_header(compressed).codec
+    payload = memoryview(compressed)[1:]
+
+    if codec == CompressionCodec.NONE:
+        for offset in range(0, len(payload), chunk_size):
+            yield bytes(payload[offset:offset + chunk_size])
+
+    elif codec == CompressionCodec.ZLIB:
+        decompressor = zlib.decompressobj()
+        for offset in range(0, len(payload), chunk_size):
+            # Output of a single input chunk is bounded, so that highly compressible values don't explode in memory
+            chunk = decompressor.decompress(payload[offset:offset + chunk_size], chunk_size)
+            while chunk:
+                yield chunk
+                chunk = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+        if (chunk := decompressor.flush()):
+            yield chunk
+
+    else:
+        if zstandard is None:
+            raise RuntimeError("Value is compressed with zstd, but zstandard is not installed")
+        reader = zstandard.ZstdDecompressor().stream_reader(payload)
+        while (chunk := reader.read(chunk_size)):
+            yield chunk
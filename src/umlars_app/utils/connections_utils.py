@@ -1,11 +1,24 @@
 from typing import Type, Callable
+import asyncio
+import random
 import time
 from functools import wraps
 
 from umlars_app.exceptions import ServiceConnectionError, NotYetAvailableError
 
 
-def retry(reconnect_attempts: int = 5, sleep_seconds_between_recconnects: int = 5, exception_class_raised_when_all_attempts_failed: Type["Exception"] = ServiceConnectionError) -> Callable:
+def calculate_backoff_delay(attempt_number: int, base_delay_seconds: float = 1, max_delay_seconds: float = 60, use_jitter: bool = True) -> float:
+    """
+    Exponential backoff delay for the given (zero-based) attempt.
+    Jitter keeps half of the delay fixed and randomizes the rest, so that reconnecting clients don't synchronize.
+    """
+    delay_seconds = min(max_delay_seconds, base_delay_seconds * 2 ** attempt_number)
+    if use_jitter:
+        return delay_seconds / 2 + random.uniform(0, delay_seconds / 2)
+    return delay_seconds
+
+
+def retry(reconnect_attempts: int = 5, sleep_seconds_between_recconnects: int = 5, exception_class_raised_when_all_attempts_failed: Type["Exception"] = ServiceConnectionError, max_sleep_seconds: int = 60, use_jitter: bool = True) -> Callable:
     def wrapper(function_to_attempt: Callable) -> Callable:
         @wraps(function_to_attempt)
         def inner(*args, **kwargs):
@@ -16,7 +29,25 @@ def retry(reconnect_attempts: int = 5, sleep_seconds_between_recconnects: int =
                 except NotYetAvailableError as ex:
                     if reconnect_attempt_number == max_reconnect_attempt_number:
                         raise exception_class_raised_when_all_attempts_failed(str(ex)) from ex
-                    time.sleep(sleep_seconds_between_recconnects)
+                    time.sleep(calculate_backoff_delay(reconnect_attempt_number, sleep_seconds_between_recconnects, max_sleep_seconds, use_jitter))
+
+        return inner
+    return wrapper
+
+
+def async_retry(reconnect_attempts: int = 5, sleep_seconds_between_recconnects: int = 5, exception_class_raised_when_all_attempts_failed: Type["Exception"] = ServiceConnectionError, max_sleep_seconds: int = 60, use_jitter: bool = True) -> Callable:
+    """Variant of the retry decorator for coroutines - waiting between attempts doesn't block the event loop."""
+    def wrapper(coroutine_to_attempt: Callable) -> Callable:
+        @wraps(coroutine_to_attempt)
+        async def inner(*args, **kwargs):
+            max_reconnect_attempt_number = reconnect_attempts - 1
+            for reconnect_attempt_number in range(reconnect_attempts):
+                try:
+                    return await coroutine_to_attempt(*args, **kwargs)
+                except NotYetAvailableError as ex:
+                    if reconnect_attempt_number == max_reconnect_attempt_number:
+                        raise exception_class_raised_when_all_attempts_failed(str(ex)) from ex
+                    await asyncio.sleep(calculate_backoff_delay(reconnect_attempt_number, sleep_seconds_between_recconnects, max_sleep_seconds, use_jitter))
 
         return inner
     return wrapper
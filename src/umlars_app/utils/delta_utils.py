@@ -0,0 +1,46 @@
+import json
+from difflib import SequenceMatcher
+from typing import List, Optional, Union
+
+
+# Operations of the delta: positive number copies the lines of the base, negative number skips them
+# and list of lines is inserted. Source files are mostly XML, so lines are the natural unit of the changes.
+DeltaOperation = Union[int, List[str]]
+
+
+def calculate_delta(base: str, target: str, max_lines_count: Optional[int] = None) -> Optional[str]:
+    """
+    Line based delta turning the base into the target, serialized to JSON.
+    Returns None when any of the texts has more than max_lines_count lines, as the matching is quadratic in the worst case.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    if max_lines_count is not None and max(len(base_lines), len(target_lines)) > max_lines_count:
+        return None
+    operations: List[DeltaOperation] = []
+    for tag, base_start, base_end, target_start, target_end in SequenceMatcher(None, base_lines, target_lines).get_opcodes():
+        if tag == "equal":
+            operations.append(base_end - base_start)
+            continue
+        if base_end > base_start:
+            operations.append(base_start - base_end)
+        if target_end > target_start:
+            operations.append(target_lines[target_start:target_end])
+    return json.dumps(operations, separators=(",", ":"))
+
+
+def apply_delta(base: str, delta: str) -> str:
+    base_lines = base.splitlines(keepends=True)
+    target_lines: List[str] = []
+    offset = 0
+    for operation in json.loads(delta):
+        if isinstance(operation, list):
+            target_lines.extend(operation)
+        elif operation > 0:
+            target_lines.extend(base_lines[offset:offset + operation])
+            offset += operation
+        else:
+            offset -= operation
+    if offset != len(base_lines):
+        raise ValueError(f"Delta covers {offset} of {len(base_lines)} lines of the base")
+    return "".join(target_lines)
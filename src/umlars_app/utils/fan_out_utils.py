@@ -0,0 +1,115 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from umlars_app import settings
+from umlars_app.models import UmlModel, UmlFile, ProcessStatus, TranslationFanOut, TranslationPart
+from umlars_app.utils.logging import get_new_sublogger
+
+
+logger = get_new_sublogger(__name__)
+
+
+TERMINAL_PROCESS_STATES = frozenset((ProcessStatus.FINISHED, ProcessStatus.PARTIAL_SUCCESS, ProcessStatus.FAILED))
+
+
+def is_fan_out_enabled() -> bool:
+    """Disabled fan-out lets the status consumers skip the fan-in queries."""
+    return settings.TRANSLATION_FAN_OUT_MIN_FILES > 0
+
+
+def should_fan_out(message_data: dict) -> bool:
+    return is_fan_out_enabled() and settings.TRANSLATION_FAN_OUT_MIN_FILES <= len(message_data["ids_of_source_files"])
+
+
+def group_dependent_files(files: Iterable[Tuple[int, Optional[str]]]) -> List[List[int]]:
+    """
+    Groups the files which have to be translated together. Files with the same base name,
+    e.g. model.uml and model.notation exported from Papyrus, depend on each other.
+    """
+    groups = defaultdict(list)
+    for file_id, filename in files:
+        group_key = ("name", filename.rsplit('.', 1)[0]) if filename else ("id", file_id)
+        groups[group_key].append(file_id)
+    return sorted((sorted(group) for group in groups.values()), key=lambda group: group[0])
+
+
+def aggregate_process_state(states: Iterable[int]) -> ProcessStatus:
+    states = set(states)
+    if states == {ProcessStatus.FINISHED}:
+        return ProcessStatus.FINISHED
+    if states == {ProcessStatus.FAILED}:
+        return ProcessStatus.FAILED
+    return ProcessStatus.PARTIAL_SUCCESS
+
+
+def fan_out_translation_request(model: UmlModel, message_data: dict) -> List[Tuple[TranslationPart, dict]]:
+    """
+    Splits the translation request into parts, which can be translated by different workers.
+    Each part has its own message - deleted files are reported only in the first one.
+    Unfinished fan-outs of the model are superseded, as their files are taken over by the new one.
+    """
+    files_groups = group_dependent_files(UmlFile.objects.filter(id__in=message_data["ids_of_source_files"]).values_list("id", "filename"))
+    TranslationFanOut.objects.filter(model=model, completed_at__isnull=True).update(is_superseded=True, completed_at=timezone.now())
+
+    fan_out = TranslationFanOut.objects.create(model=model, parts_count=len(files_groups))
+    parts = TranslationPart.objects.bulk_create([TranslationPart(fan_out=fan_out, index=index) for index in range(len(files_groups))])
+
+    files_to_update = list()
+    for part, files_group in zip(parts, files_groups):
+        files_to_update.extend(UmlFile(id=file_id, translation_part=part) for file_id in files_group)
+    UmlFile.objects.bulk_update(files_to_update, ["translation_part"])
+
+    edited_files_ids = set(message_data["ids_of_edited_files"])
+    new_files_ids = set(message_data["ids_of_new_submitted_files"])
+    parts_with_messages_data = list()
+    for part, files_group in zip(parts, files_groups):
+        parts_with_messages_data.append((part, {
+            **message_data,
+            "ids_of_source_files": files_group,
+            "ids_of_edited_files": sorted(edited_files_ids.intersection(files_group)),
+            "ids_of_new_submitted_files": sorted(new_files_ids.intersection(files_group)),
+            "ids_of_deleted_files": message_data["ids_of_deleted_files"] if part.index == 0 else [],
+            "fan_out": {"id": fan_out.id, "part_id": part.id, "part_index": part.index, "parts_count": fan_out.parts_count},
+        }))
+
+    logger.info(f"Translation of model {model.id} split into {fan_out.parts_count} parts")
+    return parts_with_messages_data
+
+
+def update_fan_in_progress(ids_of_files: Iterable[int]) -> None:
+    """Completes the parts whose files are all translated, and the fan-outs whose parts are all completed."""
+    parts_ids = set(
+        UmlFile.objects.filter(id__in=list(ids_of_files), translation_part__isnull=False, translation_part__completed_at__isnull=True)
+        .values_list("translation_part_id", flat=True)
+    )
+    if not parts_ids:
+        return
+
+    fan_outs_ids = set(TranslationPart.objects.filter(id__in=parts_ids).values_list("fan_out_id", flat=True))
+    with transaction.atomic():
+        # Lock serializes consumers completing the last parts of the same fan-out - otherwise none of them may see it complete
+        list(TranslationFanOut.objects.select_for_update().filter(id__in=fan_outs_ids).order_by("id").values_list("id", flat=True))
+        now = timezone.now()
+
+        files_states_by_part: Dict[int, Set[int]] = defaultdict(set)
+        for part_id, state in UmlFile.objects.filter(translation_part_id__in=parts_ids).values_list("translation_part_id", "state"):
+            files_states_by_part[part_id].add(state)
+
+        completed_parts = list()
+        for part in TranslationPart.objects.filter(id__in=parts_ids, completed_at__isnull=True):
+            if files_states_by_part[part.id] <= TERMINAL_PROCESS_STATES:
+                part.state = aggregate_process_state(files_states_by_part[part.id])
+                part.completed_at = now
+                completed_parts.append(part)
+        TranslationPart.objects.bulk_update(completed_parts, ["state", "completed_at"])
+
+        for fan_out in TranslationFanOut.objects.filter(id__in={part.fan_out_id for part in completed_parts}, completed_at__isnull=True):
+            parts_states = list(fan_out.parts.values_list("state", "completed_at"))
+            if all(completed_at is not None for _, completed_at in parts_states):
+                fan_out.state = aggregate_process_state(state for state, _ in parts_states)
+                fan_out.completed_at = now
+                fan_out.save(update_fields=["state", "completed_at"])
+                logger.info(f"Translation of model {fan_out.model_id} completed with state {fan_out.get_state_display()}")
@@ -0,0 +1,50 @@
+import re
+from typing import Dict, List, NamedTuple
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from umlars_app.models import UmlModel, UmlFile, UserAccessToModel, ProcessStatus
+
+
+# Scans of the whole table in the plans of PostgreSQL ("Seq Scan on table") and SQLite ("SCAN table", without an index)
+SEQUENTIAL_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"\bSCAN (\w+)(?! USING)(?:\s|$)"),
+}
+
+
+class QueryPlanReport(NamedTuple):
+    name: str
+    plan: str
+    sequentially_scanned_tables: List[str]
+
+
+def get_hot_path_querysets(user_id: int, model_id: int, file_id: int, searched_name: str = "model") -> Dict[str, QuerySet]:
+    """Queries of the main views and the status updates, with the parameters of the given user, model and file."""
+    return {
+        "home - models of the user": UmlModel.objects.defer("formatted_data").filter(accessed_by__id=user_id).order_by("id")[:10],
+        "home - search by name": UmlModel.objects.defer("formatted_data").filter(name__icontains=searched_name, accessed_by__id=user_id).order_by("id")[:10],
+        "active models": UmlModel.objects.defer("formatted_data").filter(tech_active_flag=True).order_by("id")[:10],
+        "uml_model - access check": UmlModel.objects.defer("formatted_data").filter(accessed_by__id=user_id, id=model_id),
+        "uml_model - source files": UmlFile.objects.filter(model_id=model_id),
+        "share_model - access row": UserAccessToModel.objects.filter(user_id=user_id, model_id=model_id),
+        "download - file access check": UmlFile.objects.filter(model__accessed_by__id=user_id, id=file_id),
+        "relay - files being translated": UmlFile.objects.filter(model_id=model_id, state__in=(ProcessStatus.QUEUED, ProcessStatus.RUNNING)),
+    }
+
+
+def explain_queryset(name: str, queryset: QuerySet) -> QueryPlanReport:
+    """
+    Explains the query with the sequential scans disabled on PostgreSQL, so that the plan shows
+    whether an index can be used at all, instead of the cheapest plan for the current size of the tables.
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+
+    pattern = SEQUENTIAL_SCAN_PATTERNS.get(connection.vendor)
+    sequentially_scanned_tables = sorted(set(pattern.findall(plan))) if pattern is not None else []
+    return QueryPlanReport(name, plan, sequentially_scanned_tables)
@@ -0,0 +1,59 @@
+from datetime import timedelta
+from typing import NamedTuple, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from umlars_app.models import UmlFile, UmlFileBlob, UmlFileRevision, calculate_content_hash
+from umlars_app.utils.logging import get_new_sublogger
+
+
+logger = get_new_sublogger(__name__)
+
+
+class PruneBatchResult(NamedTuple):
+    pruned_files_count: int
+    deleted_revisions_count: int
+    last_file_id: Optional[int]
+
+
+def prune_revisions_batch(after_file_id: int, batch_size: int, retention_days: float, keep_count: int) -> PruneBatchResult:
+    """
+    Deletes the revisions of the next batch of files replaced before the retention period, keeping at least
+    the given number of the latest revisions of each file. Oldest kept revision is turned into a snapshot first,
+    so that it can still be reconstructed without the deleted ones.
+    """
+    expired_before = timezone.now() - timedelta(days=retention_days)
+    files_ids = list(
+        UmlFileRevision.objects.filter(file_id__gt=after_file_id, tech_valid_to__lt=expired_before)
+        .order_by("file_id").values_list("file_id", flat=True).distinct()[:batch_size]
+    )
+    if not files_ids:
+        return PruneBatchResult(0, 0, None)
+
+    deleted_revisions_count = 0
+    for file_id in files_ids:
+        with transaction.atomic():
+            # Lock of the file serializes the pruning with the revisions recorded on save
+            if not UmlFile.objects.select_for_update().filter(id=file_id).exists():
+                continue
+            revisions = UmlFileRevision.objects.filter(file_id=file_id)
+            numbers = list(revisions.order_by("number").values_list("number", flat=True))
+            expired_numbers_count = revisions.filter(tech_valid_to__lt=expired_before).count()
+            first_kept_number = numbers[min(expired_numbers_count, max(len(numbers) - keep_count, 0))]
+            if first_kept_number == numbers[0]:
+                continue
+
+            _make_snapshot(revisions.get(number=first_kept_number))
+            deleted_revisions_count += revisions.filter(number__lt=first_kept_number).delete()[1].get(UmlFileRevision._meta.label, 0)
+    logger.info(f"Deleted {deleted_revisions_count} revisions of {len(files_ids)} files")
+    return PruneBatchResult(len(files_ids), deleted_revisions_count, files_ids[-1])
+
+
+def _make_snapshot(revision: UmlFileRevision) -> None:
+    if revision.is_snapshot:
+        return
+    content = revision.read_text()
+    blob = UmlFileBlob.objects.get_or_create_for_contents([content])[calculate_content_hash(content)]
+    UmlFileRevision.objects.filter(id=revision.id).update(blob=blob, delta=None)
+    UmlFileBlob.objects.add_references({blob.id: 1})
@@ -0,0 +1,72 @@
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
+
+from django.conf import settings as django_settings
+
+from umlars_app import settings
+from umlars_app.utils.logging import get_new_sublogger
+
+
+logger = get_new_sublogger(__name__)
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def get_blob_file_path(sha256: str) -> str:
+    """Files are sharded by the first bytes of the hash, so that no directory grows too large."""
+    return os.path.join(django_settings.MEDIA_ROOT, settings.UML_FILE_STORAGE_DIRECTORY, sha256[:2], sha256[2:4], sha256)
+
+
+def write_blob_file(sha256: str, content: bytes) -> str:
+    """
+    Writes the content to a temporary file, which then atomically replaces the blob file.
+    Readers never see a partially written file, and concurrent writes of the same content are harmless.
+    """
+    path = get_blob_file_path(sha256)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary_path = tempfile.mkstemp(dir=directory, prefix=f".{sha256}.")
+    try:
+        with os.fdopen(fd, "wb") as temporary_file:
+            temporary_file.write(content)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+    return path
+
+
+def delete_blob_file(sha256: str) -> None:
+    try:
+        os.unlink(get_blob_file_path(sha256))
+    except FileNotFoundError:
+        logger.warning(f"Blob file {sha256} was already deleted")
+
+
+@contextmanager
+def open_blob_file(sha256: str) -> Iterator[Buffer]:
+    """Maps the blob file into memory - slices of the map are read from the page cache without copying the whole file."""
+    with open(get_blob_file_path(sha256), "rb") as blob_file:
+        if os.fstat(blob_file.fileno()).st_size == 0:
+            # Empty files can't be mapped
+            yield b""
+            return
+        with mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            yield mapped_file
+
+
+def iter_buffer_chunks(buffer: Buffer, chunk_size: int, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    end = len(buffer) if end is None else min(end, len(buffer))
+    for offset in range(start, end, chunk_size):
+        yield buffer[offset:min(offset + chunk_size, end)]
+
+
+def calculate_blob_file_hash(sha256: str) -> str:
+    with open_blob_file(sha256) as buffer:
+        return hashlib.sha256(buffer).hexdigest()
@@ -1,25 +1,126 @@
-from typing import Iterator, Optional
+from datetime import timedelta
+from typing import Iterable, Iterator, Optional
 
-from django.http import HttpRequest, HttpResponse
-from django.shortcuts import redirect
+from django.db import transaction
+from django.db.models import Sum
+from django.http import HttpRequest
 from django.contrib import messages
+from django.utils import timezone
 
-from umlars_app.message_broker.producer import send_uploaded_model_message, create_message_data
-from umlars_app.models import UmlModel, ProcessStatus
+from umlars_app import settings
+from umlars_app.message_broker.producer import create_message_data
+from umlars_app.message_broker.admission import is_publishing_deferred
+from umlars_app.message_broker.sharding import get_shard_queue_name
+from umlars_app.models import UmlModel, UmlModelSummary, UmlFile, ProcessStatus, TranslationOutboxMessage, OutboxMessageStatus, TranslationRequestOrigin
+from umlars_app.utils.fan_out_utils import should_fan_out, fan_out_translation_request
 
 
-def schedule_translate_uml_model(request: HttpRequest, model: UmlModel, ids_of_source_files: Optional[Iterator[int]] = None, ids_of_edited_files: Optional[Iterator[int]] = None, ids_of_new_submitted_files: Optional[Iterator[int]] = None, ids_of_deleted_files: Optional[Iterator[int]] = None, reset_files_status: bool = False) -> HttpResponse:
-    try:
-        message_data = create_message_data(model, ids_of_source_files, ids_of_edited_files, ids_of_new_submitted_files, ids_of_deleted_files)
-        send_uploaded_model_message(
-            message_data=message_data,
-        )
+# Highest priority of the origin - requests with large source files get lower priority
+TRANSLATION_ORIGIN_PRIORITIES = {
+    TranslationRequestOrigin.INTERACTIVE: 9,
+    TranslationRequestOrigin.BULK_UPLOAD: 5,
+    TranslationRequestOrigin.MASS_RETRANSLATION: 3,
+}
+# Total size of the source files (in characters) above which the priority is decreased by one
+TRANSLATION_SIZE_PRIORITY_THRESHOLDS = (100_000, 1_000_000, 10_000_000)
+
+
+def calculate_source_files_size(ids_of_source_files: Iterable[int]) -> int:
+    """Sums the sizes of the blobs of the files, without reading their content. Files not moved to the blobs yet aren't counted."""
+    total_size = UmlFile.objects.filter(id__in=list(ids_of_source_files)).aggregate(total_size=Sum("blob__size"))["total_size"]
+    return total_size or 0
+
+
+def calculate_translation_priority(origin: TranslationRequestOrigin, source_files_size: int) -> int:
+    priority = TRANSLATION_ORIGIN_PRIORITIES[origin] - sum(source_files_size > threshold for threshold in TRANSLATION_SIZE_PRIORITY_THRESHOLDS)
+    return min(max(priority, 0), settings.MESSAGE_BROKER_QUEUE_MAX_PRIORITY)
+
+
+def merge_translation_requests(previous_message_data: dict, message_data: dict) -> dict:
+    """
+    Merges two translation requests of the same model into one, equivalent to processing them in order.
+    Files added and deleted between the requests are never sent to the translation service.
+    """
+    previous_new_files_ids = set(previous_message_data["ids_of_new_submitted_files"])
+    deleted_files_ids = set(previous_message_data["ids_of_deleted_files"]) | set(message_data["ids_of_deleted_files"])
+    new_files_ids = (previous_new_files_ids | set(message_data["ids_of_new_submitted_files"])) - deleted_files_ids
+    edited_files_ids = (set(previous_message_data["ids_of_edited_files"]) | set(message_data["ids_of_edited_files"])) - new_files_ids - deleted_files_ids
+
+    return {
+        **message_data,
+        # Source files reflect the latest state of the model
+        "ids_of_source_files": message_data["ids_of_source_files"],
+        "ids_of_edited_files": sorted(edited_files_ids),
+        "ids_of_new_submitted_files": sorted(new_files_ids),
+        "ids_of_deleted_files": sorted(deleted_files_ids - previous_new_files_ids),
+    }
+
+
+def schedule_translate_uml_model(request: HttpRequest, model: UmlModel, ids_of_source_files: Optional[Iterator[int]] = None, ids_of_edited_files: Optional[Iterator[int]] = None, ids_of_new_submitted_files: Optional[Iterator[int]] = None, ids_of_deleted_files: Optional[Iterator[int]] = None, reset_files_status: bool = False, origin: TranslationRequestOrigin = TranslationRequestOrigin.INTERACTIVE) -> TranslationOutboxMessage:
+    """
+    Saves the translation request in the outbox. When called inside the transaction saving the model and its files,
+    the request is published by the relay only if the transaction is committed - the broker isn't contacted here.
+    Requests for the same model made within the coalescing window are merged into a single message.
+    Priority of the message depends on the origin of the request and the size of the source files.
+    Requests for models with many files may be split into parts translated independently - such requests aren't merged.
+    """
+    message_data = create_message_data(model, ids_of_source_files, ids_of_edited_files, ids_of_new_submitted_files, ids_of_deleted_files)
+    priority = calculate_translation_priority(origin, calculate_source_files_size(message_data["ids_of_source_files"]))
+    coalescing_window = timedelta(seconds=settings.TRANSLATION_REQUEST_COALESCING_WINDOW_SECONDS)
+    now = timezone.now()
+    user = request.user if request is not None and request.user.is_authenticated else None
+    # All messages of the model go to the same shard, so that they are translated in order
+    queue_name = get_shard_queue_name(settings.MESSAGE_BROKER_QUEUE_UPLOADED_FILES_NAME, model.id)
+    with transaction.atomic():
         if reset_files_status:
-            for file in model.source_files.all():
-                file.state = ProcessStatus.QUEUED
-                file.save()
-
-    except Exception as ex:
-        error_message = f"Connection with the translation service cannot be established: {ex}"
-        messages.warning(request, error_message)
-        return redirect("home")
+            UmlFile.objects.filter(model=model).update(state=ProcessStatus.QUEUED)
+            UmlModelSummary.objects.refresh_for_models([model.id])
+
+        if should_fan_out(message_data):
+            outbox_messages = TranslationOutboxMessage.objects.bulk_create([
+                TranslationOutboxMessage(
+                    model=model, user=user, translation_part=part, queue_name=queue_name,
+                    payload=part_message_data, origin=origin, priority=priority, available_at=now,
+                )
+                for part, part_message_data in fan_out_translation_request(model, message_data)
+            ])
+            return outbox_messages[0]
+
+        # Message locked by the relay is being published - it can't be changed anymore
+        pending_message = None
+        if coalescing_window:
+            pending_message = TranslationOutboxMessage.objects.select_for_update(skip_locked=True).filter(
+                model=model, status=OutboxMessageStatus.PENDING, queue_name=queue_name,
+                translation_part__isnull=True,
+            ).order_by("id").first()
+
+        if pending_message is None:
+            return TranslationOutboxMessage.objects.create(
+                model=model,
+                user=user,
+                queue_name=queue_name,
+                payload=message_data,
+                origin=origin,
+                priority=priority,
+                available_at=now + coalescing_window,
+            )
+
+        pending_message.payload = merge_translation_requests(pending_message.payload, message_data)
+        pending_message.coalesced_requests_count += 1
+        # Merged request is as urgent as the most urgent of its parts
+        if priority > pending_message.priority:
+            pending_message.priority = priority
+            pending_message.origin = origin
+        # Each request postpones publishing, but not further than the maximum delay since the first one
+        pending_message.available_at = min(
+            max(pending_message.available_at, now + coalescing_window),
+            pending_message.created_at + timedelta(seconds=settings.TRANSLATION_REQUEST_MAX_DELAY_SECONDS),
+        )
+        pending_message.save(update_fields=["payload", "coalesced_requests_count", "origin", "priority", "available_at"])
+        return pending_message
+
+
+def notify_if_translation_deferred(request: HttpRequest) -> None:
+    """Tells the user that the translation requests wait locally, while the translation service is overloaded."""
+    if is_publishing_deferred():
+        messages.info(request, "Translation service is busy - translation requests have been queued locally and will be sent as soon as possible.")
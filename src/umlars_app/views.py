@@ -1,9 +1,10 @@
-from typing import Deque, Set, Iterator, Tuple
+import re
+from typing import Deque, Set, Iterator, Tuple, Optional
 from collections import deque
 import requests
 
 from django.shortcuts import render, redirect
-from django.http import HttpResponse, HttpRequest
+from django.http import HttpResponse, HttpRequest, StreamingHttpResponse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.db import transaction
@@ -11,9 +12,10 @@ from django.forms.models import model_to_dict
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
+from django.utils.http import content_disposition_header
 
-from umlars_app.utils.translation_utils import schedule_translate_uml_model
-from umlars_app.models import UmlModel, UmlFile, ProcessStatus, UserAccessToModel, ObjectAccessLevel
+from umlars_app.utils.translation_utils import schedule_translate_uml_model, notify_if_translation_deferred
+from umlars_app.models import UmlModel, UmlModelSummary, UmlFile, UmlFileBlob, ProcessStatus, UserAccessToModel, ObjectAccessLevel, TranslationRequestOrigin
 from umlars_app.forms import SignUpForm, EditUserForm, AddUmlModelForm,UpdateUmlModelForm, AddUmlFileFormset, EditUmlFileFormset, FilesGroupingForm, ExtensionsGroupingFormSet, RegexGroupingFormSet, AddUmlModelFormset, ChangePasswordForm, ShareModelForm
 from umlars_app.utils.files_utils import decode_file
 from umlars_app.utils.grouping_utils import group_files, determine_model_name
@@ -30,9 +32,9 @@ def home(request: HttpRequest) -> HttpResponse:
     else:
         searched_model_name = request.GET.get('model_name')
         if searched_model_name is not None:
-            uml_models = UmlModel.objects.prefetch_related("source_files").filter(name__icontains=searched_model_name, accessed_by__id=request.user.id).order_by("id")
+            uml_models = UmlModel.objects.defer("formatted_data").filter(name__icontains=searched_model_name, accessed_by__id=request.user.id).order_by("id")
         else:
-            uml_models = UmlModel.objects.prefetch_related("source_files").filter(accessed_by__id=request.user.id).all().order_by("id")
+            uml_models = UmlModel.objects.defer("formatted_data").filter(accessed_by__id=request.user.id).all().order_by("id")
 
         # Pagination
         paginator = Paginator(uml_models, 10)  # Show 10 models per page
@@ -44,7 +46,12 @@ def home(request: HttpRequest) -> HttpResponse:
         except EmptyPage:
             uml_models = paginator.page(paginator.num_pages)
 
-        return render(request, "home.html", {"uml_models": uml_models})
+        # Files of the models aren't loaded - their counts and statuses are read from the summaries
+        summaries = UmlModelSummary.objects.get_or_refresh(uml_model.id for uml_model in uml_models)
+        for uml_model in uml_models:
+            uml_model.files_summary = summaries.get(uml_model.id)
+
+        return render(request, "home.html", {"uml_models": uml_models, "status_enum": ProcessStatus})
 
 
 def login_user(request: HttpRequest) -> HttpResponse:
@@ -130,7 +137,7 @@ def _get_translated_model(model_id: int) -> dict:
 def uml_model(request: HttpRequest, pk: int) -> HttpResponse:
     if request.user.is_authenticated:
         try:
-            uml_model = UmlModel.objects.prefetch_related("source_files").filter(accessed_by__id=request.user.id).get(id=pk)
+            uml_model = UmlModel.objects.defer("formatted_data").prefetch_related("source_files").filter(accessed_by__id=request.user.id).get(id=pk)
         except UmlModel.DoesNotExist:
             messages.warning(request, "UML model does not exist or you do not have access to it.")
             return redirect("home")
@@ -150,30 +157,8 @@ def uml_model(request: HttpRequest, pk: int) -> HttpResponse:
             messages.warning(request, warning_message)
             logger.warning(warning_message)
 
-        model_status: ProcessStatus = ProcessStatus.PARTIAL_SUCCESS
-        all_failed = True
-        for file in uml_model.source_files.all():
-
-            match file.state:
-                case ProcessStatus.QUEUED:
-                    model_status = ProcessStatus.QUEUED
-                    all_failed = False
-                    break
-
-                case ProcessStatus.RUNNING:
-                    model_status = ProcessStatus.RUNNING
-                    all_failed = False
-                    break
-
-                case ProcessStatus.FINISHED:
-                    model_status = ProcessStatus.FINISHED
-                    all_failed = False
-                
-                case ProcessStatus.PARTIAL_SUCCESS:
-                    all_failed = False
-
-            if all_failed:
-                model_status = ProcessStatus.FAILED
+        model_summary = UmlModelSummary.objects.get_or_refresh([uml_model.id]).get(uml_model.id)
+        model_status = ProcessStatus(model_summary.status) if model_summary is not None else ProcessStatus.PARTIAL_SUCCESS
 
         return render(
             request,
@@ -190,10 +175,58 @@ def uml_model(request: HttpRequest, pk: int) -> HttpResponse:
         return redirect("home")
 
 
+def _parse_byte_range(range_header: str, content_length: int) -> Optional[Tuple[int, int]]:
+    """Parses a single range of the Range header into [start, end). Returns None for unsatisfiable ranges."""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+    if match.group(1) == "":
+        # Suffix range - the last N bytes
+        start, end = max(content_length - int(match.group(2)), 0), content_length
+    else:
+        start = int(match.group(1))
+        end = min(int(match.group(2)) + 1, content_length) if match.group(2) else content_length
+    if start >= end:
+        return None
+    return start, end
+
+
+def download_uml_file(request: HttpRequest, pk: int) -> HttpResponse:
+    if request.user.is_authenticated:
+        try:
+            uml_file = UmlFile.objects.with_data().filter(model__accessed_by__id=request.user.id).get(id=pk)
+        except UmlFile.DoesNotExist:
+            messages.warning(request, "UML file does not exist or you do not have access to it.")
+            return redirect("home")
+        UmlFileBlob.objects.mark_accessed([uml_file.blob_id])
+
+        # Content is streamed from the memory mapped file or decompressed while it's sent, instead of being loaded whole
+        content_length = uml_file.get_data_length()
+        if (range_header := request.headers.get("Range")) is not None:
+            byte_range = _parse_byte_range(range_header, content_length)
+            if byte_range is None:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{content_length}"
+                return response
+            start, end = byte_range
+            response = StreamingHttpResponse(uml_file.iter_data_chunks(start=start, end=end), status=206, content_type="application/octet-stream")
+            response["Content-Range"] = f"bytes {start}-{end - 1}/{content_length}"
+            response["Content-Length"] = end - start
+        else:
+            response = StreamingHttpResponse(uml_file.iter_data_chunks(), content_type="application/octet-stream")
+            response["Content-Length"] = content_length
+        response["Accept-Ranges"] = "bytes"
+        response["Content-Disposition"] = content_disposition_header(as_attachment=True, filename=uml_file.filename or f"uml-file-{uml_file.id}")
+        return response
+    else:
+        messages.warning(request, "You need to be logged in to download the UML file")
+        return redirect("home")
+
+
 def delete_uml_model(request: HttpRequest, pk: int) -> HttpResponse:
     if request.user.is_authenticated:
         try:
-            uml_model_to_delete = UmlModel.objects.filter(accessed_by__id=request.user.id).get(id=pk)
+            uml_model_to_delete = UmlModel.objects.defer("formatted_data").filter(accessed_by__id=request.user.id).get(id=pk)
         except UmlModel.DoesNotExist:
             messages.warning(request, "UML model already does not exist")
             return redirect("home")
@@ -222,10 +255,12 @@ def add_uml_model(request: HttpRequest) -> HttpResponse:
                         logger.info(f"UML files: {added_uml_files} have been added.")
                         
                         source_files_ids = set(added_uml_model.source_files.values_list("id", flat=True))
+                        UmlModelSummary.objects.refresh_for_models([added_uml_model.id])
 
                         schedule_translate_uml_model(request, added_uml_model, source_files_ids, ids_of_new_submitted_files=source_files_ids)
                         # TODO: add translate for each file
                         messages.success(request, f"UML model: {added_uml_model} has been added.")
+                        notify_if_translation_deferred(request)
                         logger.info(f"UML model: {added_uml_model} has been added.")
                         return redirect("home")
                     else:
@@ -256,7 +291,8 @@ def _calculate_files_changes(source_files_ids_before_edit: Set[int], source_file
 def update_uml_model(request: HttpRequest, pk: int) -> HttpResponse:
     SOURCE_FILES_FORMSET_PREFIX = "source_files"
     if request.user.is_authenticated:
-        uml_model_to_update = UmlModel.objects.prefetch_related("source_files").filter(accessed_by__id=request.user.id).get(id=pk)
+        # Files with their content are loaded by the formset
+        uml_model_to_update = UmlModel.objects.filter(accessed_by__id=request.user.id).get(id=pk)
         if request.method == "POST":
             form = UpdateUmlModelForm(request.POST, instance=uml_model_to_update)
             formset = EditUmlFileFormset(request.POST, request.FILES, prefix=SOURCE_FILES_FORMSET_PREFIX, instance=uml_model_to_update)
@@ -271,6 +307,7 @@ def update_uml_model(request: HttpRequest, pk: int) -> HttpResponse:
 
                         # Save formset to update the files
                         updated_uml_files = formset.save()
+                        UmlModelSummary.objects.refresh_for_models([added_uml_model.id])
 
                         
                         if formset.has_changed():
@@ -279,6 +316,7 @@ def update_uml_model(request: HttpRequest, pk: int) -> HttpResponse:
 
                             deleted_files_ids, updated_files_ids, new_submitted_files_ids = _calculate_files_changes(source_files_ids_before_edit, source_files_ids_after_edit, updated_uml_files)
                             schedule_translate_uml_model(request, added_uml_model, source_files_ids_after_edit, updated_files_ids, new_submitted_files_ids, deleted_files_ids)
+                            notify_if_translation_deferred(request)
 
                         logger.info(f"UML model: {added_uml_model} has been updated.")
                         return redirect("home")
@@ -408,7 +446,8 @@ def _try_render_forms_for_models(request: HttpRequest, uml_models: deque[UmlMode
         logger.info(f"Model files: {model_files}")
         models_initial_data.append(model_to_dict(model))
 
-        file_formset_initial_data = list(map(model_to_dict, list(model_files)))
+        # Content of the files isn't a model field
+        file_formset_initial_data = [{**model_to_dict(model_file), "data": model_file.data} for model_file in model_files]
         logger.info(f"file_formset_initial_data: {file_formset_initial_data}")
 
         file_formset = AddUmlFileFormset(instance=model, prefix=f'source_files_{i}', initial=file_formset_initial_data)
@@ -442,24 +481,25 @@ def _try_save_uml_models(request: HttpRequest, uml_models: deque[UmlModel], uml_
             for model_file in model_files:
                 model_file.model = model
                 model_file.save() 
-        
-
-        source_files_ids_after_edit = set(model.source_files.values_list("id", flat=True))        
-        deleted_files_ids, updated_files_ids, new_submitted_files_ids = _calculate_files_changes(source_files_ids_before_edit, source_files_ids_after_edit, model_files)
-        schedule_translate_uml_model(request, model, source_files_ids_after_edit, updated_files_ids, new_submitted_files_ids, deleted_files_ids)
 
+            source_files_ids_after_edit = set(model.source_files.values_list("id", flat=True))        
+            UmlModelSummary.objects.refresh_for_models([model.id])
+            deleted_files_ids, updated_files_ids, new_submitted_files_ids = _calculate_files_changes(source_files_ids_before_edit, source_files_ids_after_edit, model_files)
+            schedule_translate_uml_model(request, model, source_files_ids_after_edit, updated_files_ids, new_submitted_files_ids, deleted_files_ids, origin=TranslationRequestOrigin.BULK_UPLOAD)
 
     messages.success(request, "Files uploaded successfully.")
+    notify_if_translation_deferred(request)
     return redirect('home')
 
 
 def translate_uml_model(request: HttpRequest, pk: int) -> HttpResponse:
     if request.user.is_authenticated:
         try:
-            model = UmlModel.objects.get(id=pk)
+            model = UmlModel.objects.defer("formatted_data").get(id=pk)
             source_files_ids = set(model.source_files.values_list("id", flat=True))        
             schedule_translate_uml_model(request, model, source_files_ids, reset_files_status=True)
             messages.success(request, f"Model {model.name} has been sent for translation.")
+            notify_if_translation_deferred(request)
             return redirect(request.META.get('HTTP_REFERER', '/'))
         except UmlModel.DoesNotExist:
             messages.warning(request, f"Model with id {pk} does not exist.")
@@ -492,12 +532,14 @@ def review_bulk_upload_uml_models(request: HttpRequest) -> HttpResponse:
                             file_formset.save()
                             
                             source_files_ids = set(saved_model.source_files.values_list("id", flat=True))        
-                            schedule_translate_uml_model(request, saved_model, source_files_ids, ids_of_new_submitted_files=source_files_ids)
+                            UmlModelSummary.objects.refresh_for_models([saved_model.id])
+                            schedule_translate_uml_model(request, saved_model, source_files_ids, ids_of_new_submitted_files=source_files_ids, origin=TranslationRequestOrigin.BULK_UPLOAD)
 
                         else:
                             messages.warning(request, f"Files for model: {saved_model.name} could not be uploaded. Errors: {file_formset.errors}")
                     
                 messages.success(request, "Files uploaded successfully.")
+                notify_if_translation_deferred(request)
                 return redirect('home')
             
             else:
@@ -557,13 +599,12 @@ def share_model(request: HttpRequest, model_id: int) -> HttpResponse:
         if form.is_valid():
             user = form.cleaned_data['user']
 
-            # Check if the user already has access
-            if UserAccessToModel.objects.filter(user=user, model=uml_model).exists():
-                messages.warning(request, "This user already has access to the model.")
-            else:
-                # Create a new access record
-                UserAccessToModel.objects.create(user=user, model=uml_model, access_level=ObjectAccessLevel.READ)
+            # Access record is unique - get_or_create is safe when the model is shared twice at once
+            _, is_created = UserAccessToModel.objects.get_or_create(user=user, model=uml_model, defaults={"access_level": ObjectAccessLevel.READ})
+            if is_created:
                 messages.success(request, f"Model successfully shared with {user.username}.")
+            else:
+                messages.warning(request, "This user already has access to the model.")
 
     return redirect(request.META.get('HTTP_REFERER', '/'))
 
@@ -0,0 +1,163 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from umlars_app import settings
+from umlars_app.message_broker.admission import TokenBucket, AdmissionController, is_publishing_deferred
+from umlars_app.message_broker.queues import QueueDepthSampler, QueueStats
+from umlars_app.models import MessageBrokerQueueSnapshot
+
+
+QUEUE_NAME = "uploaded-files"
+
+
+class ManualClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return ManualClock()
+
+
+def test_bucket_allows_burst_up_to_capacity(clock):
+    token_bucket = TokenBucket(rate_per_second=4, capacity=5, clock=clock)
+
+    assert token_bucket.try_acquire(10) == 5
+    assert token_bucket.try_acquire(1) == 0
+
+
+def test_bucket_is_refilled_at_rate(clock):
+    token_bucket = TokenBucket(rate_per_second=4, capacity=5, clock=clock)
+    token_bucket.try_acquire(5)
+
+    clock.advance(0.5)
+    assert token_bucket.try_acquire(10) == 2
+
+    # Fractions of the tokens are kept until they add up to a whole one
+    clock.advance(0.125)
+    assert token_bucket.try_acquire(10) == 0
+    clock.advance(0.125)
+    assert token_bucket.try_acquire(10) == 1
+
+
+def test_bucket_is_not_refilled_over_capacity(clock):
+    token_bucket = TokenBucket(rate_per_second=4, capacity=5, clock=clock)
+    token_bucket.try_acquire(5)
+
+    clock.advance(100)
+
+    assert token_bucket.try_acquire(10) == 5
+
+
+def test_released_tokens_are_returned_up_to_capacity(clock):
+    token_bucket = TokenBucket(rate_per_second=4, capacity=5, clock=clock)
+    token_bucket.try_acquire(3)
+
+    token_bucket.release(2)
+    assert token_bucket.try_acquire(10) == 4
+
+    token_bucket.release(10)
+    assert token_bucket.try_acquire(10) == 5
+
+
+class QueueState:
+    def __init__(self) -> None:
+        self.stats = QueueStats(messages_count=0, consumers_count=1)
+
+    def fetch_stats(self) -> QueueStats:
+        if self.stats is None:
+            raise ConnectionError("Broker unavailable")
+        return self.stats
+
+
+@pytest.fixture
+def queue_state():
+    return QueueState()
+
+
+@pytest.fixture
+def admission_controller(queue_state, clock):
+    sampler = QueueDepthSampler(QUEUE_NAME, "localhost", sample_interval_seconds=0, fetch_stats=queue_state.fetch_stats)
+    return AdmissionController(QUEUE_NAME, high_water_mark=100, max_queue_depth=1000, throttled_rate=10, sampler=sampler, clock=clock)
+
+
+@pytest.mark.django_db
+def test_publishing_below_high_water_mark_is_not_limited(admission_controller, queue_state):
+    queue_state.stats = QueueStats(messages_count=99, consumers_count=1)
+
+    assert admission_controller.admit(500) == 500
+    assert not admission_controller.is_throttled
+    assert not is_publishing_deferred(QUEUE_NAME)
+
+
+@pytest.mark.django_db
+def test_publishing_above_high_water_mark_is_throttled(admission_controller, queue_state, clock):
+    queue_state.stats = QueueStats(messages_count=100, consumers_count=1)
+
+    assert admission_controller.admit(25) == 10
+    assert admission_controller.admit(25) == 0
+    clock.advance(0.5)
+    assert admission_controller.admit(25) == 5
+
+    assert admission_controller.is_throttled
+    assert is_publishing_deferred(QUEUE_NAME)
+
+
+@pytest.mark.django_db
+def test_released_admission_can_be_used_again(admission_controller, queue_state):
+    queue_state.stats = QueueStats(messages_count=100, consumers_count=1)
+
+    assert admission_controller.admit(8) == 8
+    admission_controller.release(8)
+
+    assert admission_controller.admit(25) == 10
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("queue_stats", [
+    QueueStats(messages_count=1000, consumers_count=1),
+    QueueStats(messages_count=100, consumers_count=0),
+])
+def test_publishing_to_full_or_abandoned_queue_is_deferred(admission_controller, queue_state, queue_stats):
+    queue_state.stats = queue_stats
+
+    assert admission_controller.admit(25) == 0
+    assert is_publishing_deferred(QUEUE_NAME)
+
+
+@pytest.mark.django_db
+def test_publishing_is_resumed_when_queue_drains(admission_controller, queue_state):
+    queue_state.stats = QueueStats(messages_count=1000, consumers_count=1)
+    admission_controller.admit(25)
+
+    queue_state.stats = QueueStats(messages_count=10, consumers_count=1)
+
+    assert admission_controller.admit(25) == 25
+    assert not admission_controller.is_throttled
+    assert not is_publishing_deferred(QUEUE_NAME)
+
+
+@pytest.mark.django_db
+def test_publishing_with_unknown_depth_is_not_limited(admission_controller, queue_state):
+    queue_state.stats = None
+
+    assert admission_controller.admit(25) == 25
+
+
+@pytest.mark.django_db
+def test_publishing_is_deferred_when_depth_is_not_sampled():
+    assert not is_publishing_deferred(QUEUE_NAME)
+
+    stale_sampled_at = timezone.now() - timedelta(seconds=11 * settings.MESSAGE_BROKER_ADMISSION_SAMPLE_INTERVAL_SECONDS)
+    MessageBrokerQueueSnapshot.objects.create(queue_name=QUEUE_NAME, is_throttled=False, sampled_at=stale_sampled_at)
+
+    assert is_publishing_deferred(QUEUE_NAME)
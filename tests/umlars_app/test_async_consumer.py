@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from umlars_app.message_broker.async_consumer import AsyncioRabbitMQConsumer
+from umlars_app.models import UmlModel, UmlFile, ProcessStatus
+
+
+QUEUE_NAME = "statuses"
+
+
+class InMemoryChannel:
+    """Stand-in for the channel of the pika asyncio adapter - broker responses are scheduled on the event loop."""
+
+    def __init__(self, loop) -> None:
+        self._loop = loop
+        self._on_close_callbacks = []
+        self._consumers = dict()
+        self._delivery_tags_count = 0
+        self.is_closed = False
+        self.acked_delivery_tags = []
+        self.nacked_delivery_tags = []
+
+    def add_on_close_callback(self, callback) -> None:
+        self._on_close_callbacks.append(callback)
+
+    def queue_declare(self, queue, durable, arguments, callback) -> None:
+        self._loop.call_soon(callback, None)
+
+    def basic_qos(self, prefetch_count, callback) -> None:
+        self._loop.call_soon(callback, None)
+
+    def basic_consume(self, queue, on_message_callback, auto_ack) -> None:
+        self._consumers[queue] = on_message_callback
+
+    def basic_ack(self, delivery_tag) -> None:
+        self.acked_delivery_tags.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue) -> None:
+        self.nacked_delivery_tags.append((delivery_tag, requeue))
+
+    def deliver(self, body: bytes) -> int:
+        self._delivery_tags_count += 1
+        method = SimpleNamespace(delivery_tag=self._delivery_tags_count, routing_key=QUEUE_NAME)
+        self._consumers[QUEUE_NAME](self, method, None, body)
+        return self._delivery_tags_count
+
+    def close_by_broker(self, reason: str) -> None:
+        self.is_closed = True
+        for callback in self._on_close_callbacks:
+            callback(self, reason)
+
+
+class InMemoryConnection:
+    def __init__(self, loop, on_open_callback, on_close_callback) -> None:
+        self._loop = loop
+        self._on_close_callback = on_close_callback
+        self.channels = []
+        self.is_closing = False
+        self.is_closed = False
+        loop.call_soon(on_open_callback, self)
+
+    def channel(self, on_open_callback) -> None:
+        channel = InMemoryChannel(self._loop)
+        self.channels.append(channel)
+        self._loop.call_soon(on_open_callback, channel)
+
+    def close(self) -> None:
+        self.is_closed = True
+        for channel in self.channels:
+            channel.is_closed = True
+        self._loop.call_soon(self._on_close_callback, self, "Closed by client")
+
+
+class InMemoryBrokerConsumer(AsyncioRabbitMQConsumer):
+    connection = None
+
+    def _create_connection(self, parameters, on_open_callback, on_open_error_callback, on_close_callback):
+        self.connection = InMemoryConnection(self._loop, on_open_callback, on_close_callback)
+        return self.connection
+
+
+def wait_until(predicate, timeout_seconds: float = 5) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    while not predicate():
+        assert time.monotonic() < deadline, "Condition not met in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def consumer():
+    consumer = InMemoryBrokerConsumer(QUEUE_NAME, "localhost", max_in_flight_messages=10, db_workers=2)
+    consuming_thread = threading.Thread(target=consumer.start_consuming)
+    consuming_thread.start()
+    wait_until(lambda: consumer.connection is not None and consumer.connection.channels and consumer._channel is consumer.connection.channels[-1])
+    yield consumer
+    consumer.stop()
+    consuming_thread.join(timeout=5)
+    assert not consuming_thread.is_alive()
+
+
+@pytest.fixture
+def uml_file():
+    uml_model = UmlModel.objects.create(name="Model")
+    uml_file = UmlFile(model=uml_model, filename="model.xmi", format=UmlFile.SupportedFormat.EA_XMI, data="<xmi/>")
+    uml_file.save()
+    return uml_file
+
+
+def deliver(consumer: InMemoryBrokerConsumer, channel: InMemoryChannel, body: bytes) -> None:
+    consumer._loop.call_soon_threadsafe(channel.deliver, body)
+
+
+def create_status_body(uml_file: UmlFile, state: ProcessStatus) -> bytes:
+    return json.dumps({"id": uml_file.id, "state": state, "process_id": "process-1"}).encode("utf-8")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_processed_message_is_acknowledged(consumer, uml_file):
+    channel = consumer.connection.channels[0]
+
+    deliver(consumer, channel, create_status_body(uml_file, ProcessStatus.RUNNING))
+
+    wait_until(lambda: channel.acked_delivery_tags == [1])
+    assert UmlFile.objects.get(id=uml_file.id).state == ProcessStatus.RUNNING
+    assert channel.nacked_delivery_tags == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_invalid_message_is_rejected(consumer):
+    channel = consumer.connection.channels[0]
+
+    deliver(consumer, channel, b"not a status message")
+
+    wait_until(lambda: channel.nacked_delivery_tags == [(1, False)])
+    assert channel.acked_delivery_tags == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_channel_closed_by_broker_is_recovered(consumer, uml_file):
+    first_channel = consumer.connection.channels[0]
+
+    consumer._loop.call_soon_threadsafe(first_channel.close_by_broker, "PRECONDITION_FAILED")
+    wait_until(lambda: len(consumer.connection.channels) == 2 and consumer._channel is consumer.connection.channels[1])
+    second_channel = consumer.connection.channels[1]
+    deliver(consumer, second_channel, create_status_body(uml_file, ProcessStatus.RUNNING))
+
+    wait_until(lambda: second_channel.acked_delivery_tags == [1])
+    assert consumer.channel_recoveries_count == 1
+    assert consumer.reconnects_count == 0
+    assert first_channel.acked_delivery_tags == []
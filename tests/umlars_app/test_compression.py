@@ -0,0 +1,96 @@
+import zlib
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from umlars_app import settings
+from umlars_app.models import UmlModel
+from umlars_app.utils.blob_utils import recompress_archived_models_data
+from umlars_app.utils.compression_utils import (
+    COLD_TIER_FLAG, CompressionCodec, compress_text, decompress_text, is_codec_available, iter_decompressed_chunks, read_header
+)
+
+
+TEXT = "".join(f'<packagedElement xmi:id="element-{index}" name="Zażółć {index}"/>\n' for index in range(2000))
+AVAILABLE_CODECS = [codec for codec in CompressionCodec if is_codec_available(codec)]
+
+
+@pytest.mark.parametrize("codec", AVAILABLE_CODECS)
+@pytest.mark.parametrize("cold", [False, True])
+def test_compressed_text_is_decompressed(codec, cold):
+    compressed = compress_text(TEXT, codec, cold)
+
+    assert read_header(compressed) == (codec, cold)
+    assert decompress_text(compressed) == TEXT
+
+
+@pytest.mark.parametrize("codec", AVAILABLE_CODECS)
+def test_chunks_are_bounded_and_join_into_text(codec):
+    compressed = compress_text(TEXT, codec)
+
+    chunks = list(iter_decompressed_chunks(compressed, chunk_size=1000))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert b"".join(chunks).decode("utf-8") == TEXT
+
+
+def test_highly_compressible_value_is_decompressed_in_bounded_chunks():
+    text = "a" * 1_000_000
+    compressed = compress_text(text, CompressionCodec.ZLIB)
+
+    assert len(compressed) < 10_000
+    assert max(len(chunk) for chunk in iter_decompressed_chunks(compressed, chunk_size=4096)) <= 4096
+    assert decompress_text(compressed) == text
+
+
+def test_short_value_is_stored_uncompressed():
+    text = "a" * (settings.STORAGE_COMPRESSION_MIN_SIZE - 1)
+
+    compressed = compress_text(text, CompressionCodec.ZLIB)
+
+    assert read_header(compressed).codec == CompressionCodec.NONE
+    assert compressed[1:] == text.encode("utf-8")
+
+
+def test_cold_value_is_compressed_at_higher_level():
+    compressed = compress_text(TEXT, CompressionCodec.ZLIB, cold=True)
+
+    assert compressed[0] == CompressionCodec.ZLIB | COLD_TIER_FLAG
+    assert compressed[1:] == zlib.compress(TEXT.encode("utf-8"), 9)
+
+
+def test_empty_values():
+    assert decompress_text(b"") == ""
+    assert decompress_text(compress_text("")) == ""
+    assert list(iter_decompressed_chunks(b"")) == []
+
+
+def get_formatted_data_header(uml_model: UmlModel):
+    return UmlModel.objects.values_list("formatted_data", flat=True).get(id=uml_model.id).header
+
+
+@pytest.mark.django_db
+def test_archived_models_data_is_recompressed_once():
+    archived_at = timezone.now() - timedelta(days=100)
+    archived_models = [
+        UmlModel.objects.create(name="Model", formatted_data=formatted_data, tech_active_flag=False, tech_valid_to=archived_at)
+        for formatted_data in (TEXT, "{}", None)
+    ]
+    active_model = UmlModel.objects.create(name="Active model", formatted_data=TEXT)
+
+    result = recompress_archived_models_data(cold_after_days=30, batch_size=1)
+
+    assert result.recompressed_count == 2
+    assert [get_formatted_data_header(uml_model).is_cold for uml_model in archived_models[:2] + [active_model]] == [True, True, False]
+    assert UmlModel.objects.get(id=archived_models[0].id).formatted_data == TEXT
+
+    # Values marked as cold aren't even loaded by the repeated run
+    with CaptureQueriesContext(connection) as captured_queries:
+        result = recompress_archived_models_data(cold_after_days=30, batch_size=1)
+
+    assert result.recompressed_count == 0
+    assert [query["sql"].split()[0] for query in captured_queries if not query["sql"].startswith(("SAVEPOINT", "RELEASE"))] == ["SELECT"]
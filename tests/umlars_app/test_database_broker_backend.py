@@ -0,0 +1,149 @@
+import json
+import threading
+from datetime import timedelta
+
+import pytest
+from django.db import connection, transaction
+from django.utils import timezone
+
+from umlars_app.message_broker.backends.database import DatabaseBrokerBackend, DEAD_LETTER_QUEUE_SUFFIX
+from umlars_app.models import BrokerQueueMessage
+
+
+QUEUE_NAME = "statuses"
+
+
+@pytest.fixture
+def backend():
+    return DatabaseBrokerBackend(visibility_timeout_seconds=60, poll_interval_seconds=0.01, max_deliveries_count=3)
+
+
+def publish(backend: DatabaseBrokerBackend, *messages_ids: int, priorities=None) -> None:
+    backend.publish_messages(QUEUE_NAME, [(message_id, {"id": message_id}) for message_id in messages_ids], priorities)
+
+
+def get_ids(received_messages) -> list:
+    return [json.loads(message.body)["id"] for message in received_messages]
+
+
+def expire_claims() -> None:
+    """Moves the time past the visibility timeout of the claimed messages."""
+    BrokerQueueMessage.objects.filter(claimed_until__isnull=False).update(claimed_until=timezone.now() - timedelta(seconds=1))
+
+
+@pytest.mark.django_db
+def test_claimed_messages_are_not_delivered_again(backend):
+    publish(backend, 1, 2, 3)
+
+    first_batch = backend.get_messages(QUEUE_NAME, 2, 0)
+    second_batch = backend.get_messages(QUEUE_NAME, 2, 0)
+
+    assert get_ids(first_batch) == [1, 2]
+    assert get_ids(second_batch) == [3]
+    assert backend.get_messages(QUEUE_NAME, 2, 0) == []
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="SKIP LOCKED is ignored by SQLite, which serializes the writes")
+@pytest.mark.django_db(transaction=True)
+def test_messages_locked_by_another_consumer_are_skipped(backend):
+    publish(backend, 1, 2)
+    first_message_id = BrokerQueueMessage.objects.order_by("id").values_list("id", flat=True).first()
+    is_locked, is_claimed = threading.Event(), threading.Event()
+
+    def lock_first_message() -> None:
+        try:
+            with transaction.atomic():
+                list(BrokerQueueMessage.objects.select_for_update().filter(id=first_message_id))
+                is_locked.set()
+                is_claimed.wait(timeout=5)
+        finally:
+            connection.close()
+
+    locking_thread = threading.Thread(target=lock_first_message)
+    locking_thread.start()
+    try:
+        assert is_locked.wait(timeout=5)
+        received_messages = backend.get_messages(QUEUE_NAME, 2, 0)
+    finally:
+        is_claimed.set()
+        locking_thread.join()
+
+    assert get_ids(received_messages) == [2]
+
+
+@pytest.mark.django_db
+def test_messages_are_claimed_by_priority(backend):
+    publish(backend, 1, 2, 3, priorities={2: 5, 3: 1})
+
+    assert get_ids(backend.get_messages(QUEUE_NAME, 3, 0)) == [2, 3, 1]
+
+
+@pytest.mark.django_db
+def test_acknowledged_message_is_removed(backend):
+    publish(backend, 1)
+
+    backend.ack(QUEUE_NAME, [message.delivery_tag for message in backend.get_messages(QUEUE_NAME, 1, 0)])
+    expire_claims()
+
+    assert not BrokerQueueMessage.objects.exists()
+    assert backend.get_messages(QUEUE_NAME, 1, 0) == []
+
+
+@pytest.mark.django_db
+def test_message_not_acknowledged_within_visibility_timeout_is_delivered_again(backend):
+    publish(backend, 1)
+    first_delivery, = backend.get_messages(QUEUE_NAME, 1, 0)
+
+    expire_claims()
+    second_delivery, = backend.get_messages(QUEUE_NAME, 1, 0)
+
+    assert second_delivery.body == first_delivery.body
+    assert second_delivery.delivery_tag != first_delivery.delivery_tag
+
+
+@pytest.mark.django_db
+def test_stale_delivery_tag_is_rejected(backend):
+    publish(backend, 1)
+    first_delivery, = backend.get_messages(QUEUE_NAME, 1, 0)
+    expire_claims()
+    second_delivery, = backend.get_messages(QUEUE_NAME, 1, 0)
+
+    # Consumer which overran the timeout can neither acknowledge nor reject the message delivered again
+    backend.ack(QUEUE_NAME, [first_delivery.delivery_tag])
+    backend.nack(QUEUE_NAME, [first_delivery.delivery_tag])
+    assert BrokerQueueMessage.objects.filter(queue_name=QUEUE_NAME).exists()
+
+    backend.ack(QUEUE_NAME, [second_delivery.delivery_tag])
+    assert not BrokerQueueMessage.objects.exists()
+
+
+@pytest.mark.django_db
+def test_requeued_message_is_delivered_again_right_away(backend):
+    publish(backend, 1, 2)
+    received_messages = backend.get_messages(QUEUE_NAME, 2, 0)
+
+    backend.nack(QUEUE_NAME, [received_messages[0].delivery_tag], requeue=True)
+    backend.nack(QUEUE_NAME, [received_messages[1].delivery_tag])
+
+    assert get_ids(backend.get_messages(QUEUE_NAME, 2, 0)) == [1]
+    assert BrokerQueueMessage.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_message_is_dead_lettered_after_max_deliveries(backend):
+    publish(backend, 1, 2)
+    for _ in range(3):
+        received_messages = backend.get_messages(QUEUE_NAME, 2, 0)
+        # Only the message 2 is ever acknowledged - the message 1 keeps failing
+        backend.ack(QUEUE_NAME, [message.delivery_tag for message in received_messages if json.loads(message.body)["id"] == 2])
+        expire_claims()
+
+    assert backend.get_messages(QUEUE_NAME, 2, 0) == []
+    dead_letter_queue_name = f"{QUEUE_NAME}{DEAD_LETTER_QUEUE_SUFFIX}"
+    assert get_ids(backend.get_messages(dead_letter_queue_name, 2, 0)) == [1]
+    assert backend.get_queue_stats(QUEUE_NAME).messages_count == 0
+
+
+@pytest.mark.django_db
+def test_waiting_for_messages_times_out(backend):
+    assert backend.get_messages(QUEUE_NAME, 1, 0.05) == []
@@ -0,0 +1,65 @@
+from collections import Counter
+
+import pytest
+
+from umlars_app.message_broker.sharding import ConsistentHashRing, assign_shards, get_shard_queue_name, get_shard_queues_names
+
+
+def test_ring_maps_key_to_the_same_node():
+    ring = ConsistentHashRing(["a", "b", "c"])
+
+    assert all(ring.get_node(key) == ConsistentHashRing(["c", "b", "a"]).get_node(key) for key in range(100))
+
+
+def test_ring_spreads_keys_between_nodes():
+    nodes = [f"queue.{index}" for index in range(4)]
+    ring = ConsistentHashRing(nodes)
+
+    nodes_counts = Counter(ring.get_node(key) for key in range(10000))
+
+    assert nodes_counts.keys() == set(nodes)
+    assert min(nodes_counts.values()) > 10000 / len(nodes) * 0.7
+
+
+def test_adding_node_moves_only_keys_of_new_node():
+    ring = ConsistentHashRing(["queue.0", "queue.1", "queue.2"])
+    extended_ring = ConsistentHashRing(["queue.0", "queue.1", "queue.2", "queue.3"])
+
+    moved_keys = [key for key in range(10000) if ring.get_node(key) != extended_ring.get_node(key)]
+
+    assert moved_keys
+    assert all(extended_ring.get_node(key) == "queue.3" for key in moved_keys)
+
+
+def test_ring_requires_nodes():
+    with pytest.raises(ValueError):
+        ConsistentHashRing([])
+
+
+def test_unsharded_queue_is_used_directly():
+    assert get_shard_queues_names("uploaded_files", 1) == ["uploaded_files"]
+    assert get_shard_queue_name("uploaded_files", 42, 1) == "uploaded_files"
+
+
+def test_messages_of_key_go_to_one_of_the_shards():
+    shard_queue_name = get_shard_queue_name("uploaded_files", 42, 4)
+
+    assert shard_queue_name in get_shard_queues_names("uploaded_files", 4)
+    assert get_shard_queue_name("uploaded_files", 42, 4) == shard_queue_name
+
+
+def test_every_shard_is_assigned_to_a_single_consumer():
+    queues_names = get_shard_queues_names("uploaded_files", 5)
+
+    assigned_queues_names = assign_shards(queues_names, 2)
+
+    assert len(assigned_queues_names) == 2
+    assert sorted(queue_name for consumer_queues_names in assigned_queues_names for queue_name in consumer_queues_names) == sorted(queues_names)
+
+
+@pytest.mark.parametrize("consumers_count, expected_consumers_count", [(0, 1), (3, 3), (10, 3)])
+def test_there_are_never_more_consumers_than_shards(consumers_count, expected_consumers_count):
+    assigned_queues_names = assign_shards(get_shard_queues_names("uploaded_files", 3), consumers_count)
+
+    assert len(assigned_queues_names) == expected_consumers_count
+    assert all(assigned_queues_names)
@@ -0,0 +1,110 @@
+from unittest import mock
+
+import pytest
+
+from django.db import transaction
+from django.utils import timezone
+
+from umlars_app.message_broker.backends.memory import MemoryBrokerBackend
+from umlars_app.message_broker.outbox import TranslationOutboxRelay, RelayBatchResult, allocate_fair_share_slots
+from umlars_app.models import UmlModel, TranslationOutboxMessage, OutboxMessageStatus, UserTranslationQuota
+
+
+class StaticAdmissionController:
+    """Admits every message and keeps no connection."""
+
+    def admit(self, messages_count: int) -> int:
+        return messages_count
+
+    def release(self, messages_count: int) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def create_relay(batch_size: int = 10, max_in_flight_messages_per_user: int = 100) -> TranslationOutboxRelay:
+    return TranslationOutboxRelay(
+        batch_size=batch_size, poll_interval_seconds=0, max_in_flight_messages_per_user=max_in_flight_messages_per_user,
+        broker_backend=MemoryBrokerBackend(), admission_controller=StaticAdmissionController(),
+    )
+
+
+def test_slots_are_shared_by_round_robin_under_uneven_demand():
+    assert allocate_fair_share_slots({"a": 10, "b": 1, "c": 3}, {}, 6) == {"a": 3, "b": 1, "c": 2}
+
+
+def test_slots_are_shared_by_weights():
+    assert allocate_fair_share_slots({"a": 10, "b": 10}, {"a": 3}, 8) == {"a": 6, "b": 2}
+
+
+def test_slots_left_by_small_backlogs_are_redistributed():
+    assert allocate_fair_share_slots({"a": 1, "b": 2, "c": 10}, {"a": 5, "b": 5}, 10) == {"a": 1, "b": 2, "c": 7}
+
+
+def test_remainder_of_slots_goes_to_users_waiting_longest():
+    assert allocate_fair_share_slots({"a": 10, "b": 10, "c": 10}, {}, 2) == {"a": 1, "b": 1}
+
+
+def test_slots_are_not_allocated_over_backlogs():
+    assert allocate_fair_share_slots({"a": 2, "b": 0, "c": 1}, {"a": 0}, 10) == {"a": 2, "c": 1}
+
+
+def create_outbox_messages(uml_model: UmlModel, user, count: int, status: OutboxMessageStatus = OutboxMessageStatus.PENDING) -> None:
+    TranslationOutboxMessage.objects.bulk_create([
+        TranslationOutboxMessage(
+            model=uml_model, user=user, queue_name="uploaded-files", payload={"id": uml_model.id}, status=status,
+            published_at=timezone.now() if status == OutboxMessageStatus.PUBLISHED else None,
+        )
+        for _ in range(count)
+    ])
+
+
+@pytest.mark.django_db
+def test_batch_respects_in_flight_limits_of_users(django_user_model):
+    uml_model = UmlModel.objects.create(name="Model")
+    busy_user, limited_user, idle_user = [django_user_model.objects.create_user(username=f"user-{index}") for index in range(3)]
+    UserTranslationQuota.objects.create(user=limited_user, max_in_flight_messages=1)
+    create_outbox_messages(uml_model, busy_user, 1, OutboxMessageStatus.PUBLISHED)
+    for user in (busy_user, limited_user, idle_user):
+        create_outbox_messages(uml_model, user, 5)
+
+    with transaction.atomic():
+        outbox_messages = create_relay(batch_size=10, max_in_flight_messages_per_user=2)._lock_fair_share_batch(10)
+
+    messages_counts = {user.id: len([message for message in outbox_messages if message.user_id == user.id]) for user in (busy_user, limited_user, idle_user)}
+    # Each user gets only what its in-flight limit leaves, even though the batch has room for more
+    assert messages_counts == {busy_user.id: 1, limited_user.id: 1, idle_user.id: 2}
+
+
+@pytest.mark.django_db
+def test_relay_recovers_from_failed_batches():
+    relay = create_relay()
+    batch_results = [ConnectionError("Database connection lost"), ConnectionError("Database connection lost"), RelayBatchResult(1, 0), RelayBatchResult(0, 0)]
+
+    def relay_batch():
+        batch_result = batch_results.pop(0)
+        if not batch_results:
+            relay.stop()
+        if isinstance(batch_result, Exception):
+            raise batch_result
+        return batch_result
+
+    with mock.patch.object(relay, "relay_batch", side_effect=relay_batch), mock.patch("umlars_app.message_broker.outbox.time.sleep") as sleep:
+        relay.run()
+
+    assert not batch_results
+    # Growing backoffs after the failures, then the poll interval after the batches which weren't full
+    delays = [call.args[0] for call in sleep.call_args_list]
+    assert len(delays) == 4
+    assert 0 < delays[0] <= delays[1]
+    assert delays[2:] == [0, 0]
+
+
+@pytest.mark.django_db
+def test_single_batch_run_reports_failure():
+    relay = create_relay()
+
+    with mock.patch.object(relay, "relay_batch", side_effect=ConnectionError("Database connection lost")):
+        with pytest.raises(ConnectionError):
+            relay.run(run_once=True)
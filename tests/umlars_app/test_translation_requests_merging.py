@@ -0,0 +1,54 @@
+from umlars_app.utils.translation_utils import merge_translation_requests
+
+
+def create_message_data(source_files=(), edited_files=(), new_submitted_files=(), deleted_files=()):
+    return {
+        "id": 1,
+        "ids_of_source_files": list(source_files),
+        "ids_of_edited_files": list(edited_files),
+        "ids_of_new_submitted_files": list(new_submitted_files),
+        "ids_of_deleted_files": list(deleted_files),
+    }
+
+
+def test_merged_request_contains_changes_of_both_requests():
+    previous_message_data = create_message_data(source_files=[1, 2], edited_files=[1])
+    message_data = create_message_data(source_files=[1, 2, 3], edited_files=[2], new_submitted_files=[3])
+
+    merged_message_data = merge_translation_requests(previous_message_data, message_data)
+
+    assert merged_message_data == create_message_data(source_files=[1, 2, 3], edited_files=[1, 2], new_submitted_files=[3])
+
+
+def test_file_added_and_deleted_between_requests_is_never_sent():
+    previous_message_data = create_message_data(source_files=[1, 2], new_submitted_files=[2])
+    message_data = create_message_data(source_files=[1], deleted_files=[2])
+
+    merged_message_data = merge_translation_requests(previous_message_data, message_data)
+
+    assert merged_message_data == create_message_data(source_files=[1])
+
+
+def test_file_added_and_edited_is_sent_as_new():
+    previous_message_data = create_message_data(source_files=[1, 2], new_submitted_files=[2])
+    message_data = create_message_data(source_files=[1, 2], edited_files=[2])
+
+    merged_message_data = merge_translation_requests(previous_message_data, message_data)
+
+    assert merged_message_data == create_message_data(source_files=[1, 2], new_submitted_files=[2])
+
+
+def test_file_edited_and_deleted_is_sent_as_deleted():
+    previous_message_data = create_message_data(source_files=[1, 2], edited_files=[2])
+    message_data = create_message_data(source_files=[1], deleted_files=[2])
+
+    merged_message_data = merge_translation_requests(previous_message_data, message_data)
+
+    assert merged_message_data == create_message_data(source_files=[1], deleted_files=[2])
+
+
+def test_source_files_are_taken_from_latest_request():
+    previous_message_data = create_message_data(source_files=[1, 2, 3])
+    message_data = create_message_data(source_files=[1])
+
+    assert merge_translation_requests(previous_message_data, message_data)["ids_of_source_files"] == [1]
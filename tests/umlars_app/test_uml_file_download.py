@@ -0,0 +1,52 @@
+import pytest
+
+from umlars_app.models import UmlModel, UmlFile
+
+
+CONTENT = "<xmi>model</xmi>"
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(username="owner", password="password")
+
+
+def create_uml_file(user, filename: str) -> UmlFile:
+    uml_model = UmlModel.objects.create(name="Model")
+    uml_model.accessed_by.add(user)
+    uml_file = UmlFile(model=uml_model, filename=filename, format=UmlFile.SupportedFormat.EA_XMI, data=CONTENT)
+    uml_file.save()
+    return uml_file
+
+
+def download(client, user, uml_file: UmlFile):
+    client.force_login(user)
+    return client.get(f"/download-uml-file/{uml_file.id}")
+
+
+@pytest.mark.django_db
+def test_downloaded_file_is_sent_as_attachment(client, user):
+    uml_file = create_uml_file(user, "model.xmi")
+
+    response = download(client, user, uml_file)
+
+    assert response["Content-Disposition"] == 'attachment; filename="model.xmi"'
+    assert b"".join(response.streaming_content).decode("utf-8") == CONTENT
+
+
+@pytest.mark.django_db
+def test_filename_with_quotes_is_escaped(client, user):
+    uml_file = create_uml_file(user, 'model "v2".xmi')
+
+    response = download(client, user, uml_file)
+
+    assert response["Content-Disposition"] == r'attachment; filename="model \"v2\".xmi"'
+
+
+@pytest.mark.django_db
+def test_non_ascii_filename_is_encoded(client, user):
+    uml_file = create_uml_file(user, "modèl żółw.xmi")
+
+    response = download(client, user, uml_file)
+
+    assert response["Content-Disposition"] == "attachment; filename*=utf-8''mod%C3%A8l%20%C5%BC%C3%B3%C5%82w.xmi"
@@ -0,0 +1,110 @@
+from unittest import mock
+
+import pytest
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from umlars_app.models import UmlModel, UmlFile
+from umlars_app.utils.translation_utils import schedule_translate_uml_model
+
+
+# Columns with the content of the files - the legacy inline one and the one of the blobs
+FILE_CONTENT_COLUMNS = ['"umlars_app_umlfile"."data"', '"umlars_app_umlfileblob"."data"']
+# Selected whenever the blob is joined to load it - aggregates join the blob only for its size
+BLOB_LOADED_COLUMN = '"umlars_app_umlfileblob"."sha256"'
+
+
+def assert_file_content_not_selected(captured_queries):
+    assert captured_queries, "No queries captured"
+    for query in captured_queries:
+        for column in FILE_CONTENT_COLUMNS + [BLOB_LOADED_COLUMN]:
+            assert column not in query["sql"], f"{column} selected by: {query['sql']}"
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(username="owner", password="password")
+
+
+@pytest.fixture
+def uml_model(user):
+    uml_model = UmlModel.objects.create(name="Model")
+    uml_model.accessed_by.add(user)
+    for index in range(2):
+        UmlFile(model=uml_model, filename=f"file-{index}.xmi", format=UmlFile.SupportedFormat.EA_XMI, data=f"<xmi>{index}</xmi>").save()
+    return uml_model
+
+
+@pytest.mark.django_db
+def test_home_does_not_select_file_content(client, user, uml_model):
+    client.force_login(user)
+    with CaptureQueriesContext(connection) as captured_queries:
+        response = client.get("/")
+
+    assert response.status_code == 200
+    assert_file_content_not_selected(captured_queries)
+
+
+@pytest.mark.django_db
+def test_uml_model_does_not_select_file_content(client, user, uml_model):
+    client.force_login(user)
+    with mock.patch("umlars_app.views._get_translated_model", side_effect=ValueError("Translation service unavailable")):
+        with CaptureQueriesContext(connection) as captured_queries:
+            response = client.get(f"/uml-model/{uml_model.id}")
+
+    assert response.status_code == 200
+    assert_file_content_not_selected(captured_queries)
+
+
+@pytest.mark.django_db
+def test_model_files_list_does_not_select_file_content(user, uml_model):
+    api_client = APIClient()
+    api_client.force_authenticate(user)
+    with CaptureQueriesContext(connection) as captured_queries:
+        response = api_client.get("/api/v1/model-files/")
+
+    assert response.status_code == 200
+    assert [uml_file["filename"] for uml_file in response.data[0]["source_files"]] == ["file-0.xmi", "file-1.xmi"]
+    assert_file_content_not_selected(captured_queries)
+
+
+@pytest.mark.django_db
+def test_translation_with_status_reset_does_not_select_file_content(user, uml_model):
+    request = RequestFactory().get("/")
+    request.user = user
+    source_files_ids = set(uml_model.source_files.values_list("id", flat=True))
+    with CaptureQueriesContext(connection) as captured_queries:
+        schedule_translate_uml_model(request, uml_model, source_files_ids, reset_files_status=True)
+
+    assert_file_content_not_selected(captured_queries)
+
+
+@pytest.mark.django_db
+def test_admin_translate_action_does_not_select_file_content(admin_client, uml_model):
+    with CaptureQueriesContext(connection) as captured_queries:
+        response = admin_client.post("/admin/umlars_app/umlmodel/", {"action": "translate_uml_models", "_selected_action": [uml_model.id]})
+
+    assert response.status_code == 302
+    assert_file_content_not_selected(captured_queries)
+
+
+@pytest.mark.django_db
+def test_model_deletion_cascade_does_not_select_file_content(uml_model):
+    with CaptureQueriesContext(connection) as captured_queries:
+        uml_model.delete()
+
+    assert not UmlFile.objects.exists()
+    assert_file_content_not_selected(captured_queries)
+
+
+@pytest.mark.django_db
+def test_with_data_selects_file_content(uml_model):
+    with CaptureQueriesContext(connection) as captured_queries:
+        contents = [uml_file.data for uml_file in UmlFile.objects.with_data().order_by("id")]
+
+    assert contents == ["<xmi>0</xmi>", "<xmi>1</xmi>"]
+    assert len(captured_queries) == 1
+    for column in FILE_CONTENT_COLUMNS + [BLOB_LOADED_COLUMN]:
+        assert column in captured_queries[0]["sql"]
@@ -0,0 +1,170 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from umlars_app import settings
+from umlars_app.models import UmlModel, UmlFile, UmlFileBlob, UmlFileRevision, calculate_content_hash
+from umlars_app.utils.delta_utils import calculate_delta, apply_delta
+from umlars_app.utils.revision_utils import prune_revisions_batch
+
+
+def create_content(changed_lines_count: int) -> str:
+    lines = [f"<line {index}/>\n" for index in range(50)]
+    for index in range(changed_lines_count):
+        lines[index] = f"<line {index} changed/>\n"
+    return "".join(lines) + f"<added {changed_lines_count}/>\n"
+
+
+@pytest.mark.parametrize("base, target", [
+    ("", ""),
+    ("", "a\nb\n"),
+    ("a\nb\n", ""),
+    ("a\nb\nc\n", "a\nc\nd\n"),
+    ("a\nb", "a\nb\nc"),
+    ("a\nb\n", "a\nb"),
+    ("a\r\nb\r\n", "a\r\nc\r\n"),
+    ("a b\n", "a c\n"),
+])
+def test_delta_turns_base_into_target(base, target):
+    assert apply_delta(base, calculate_delta(base, target)) == target
+
+
+def test_delta_of_small_change_is_smaller_than_content():
+    base = create_content(0)
+    target = create_content(1)
+
+    assert len(calculate_delta(base, target)) < len(target) / 4
+
+
+@pytest.mark.parametrize("base_lines_count, target_lines_count", [(4, 3), (3, 4)])
+def test_delta_of_texts_over_lines_limit_is_not_calculated(base_lines_count, target_lines_count):
+    base = "".join(f"{index}\n" for index in range(base_lines_count))
+    target = "".join(f"{index}\n" for index in range(target_lines_count))
+
+    assert calculate_delta(base, target, max_lines_count=3) is None
+    assert apply_delta(base, calculate_delta(base, target, max_lines_count=4)) == target
+
+
+def test_delta_of_different_base_is_rejected():
+    delta = calculate_delta("a\nb\nc\n", "a\nc\n")
+
+    with pytest.raises(ValueError):
+        apply_delta("a\n", delta)
+
+
+@pytest.fixture
+def uml_model():
+    return UmlModel.objects.create(name="Model")
+
+
+def create_uml_file(uml_model: UmlModel, content: str) -> UmlFile:
+    uml_file = UmlFile(model=uml_model, filename="model.xmi", format=UmlFile.SupportedFormat.EA_XMI, data=content)
+    uml_file.save()
+    return uml_file
+
+
+def update_uml_file(uml_file: UmlFile, content: str) -> None:
+    uml_file = UmlFile.objects.get(id=uml_file.id)
+    uml_file.data = content
+    uml_file.save()
+
+
+def get_ref_count(content: str) -> int:
+    return UmlFileBlob.objects.get(sha256=calculate_content_hash(content)).ref_count
+
+
+@pytest.mark.django_db
+def test_every_revision_is_reconstructed(uml_model, monkeypatch):
+    monkeypatch.setattr(settings, "UML_FILE_REVISION_SNAPSHOT_INTERVAL", 3)
+    contents = [create_content(changed_lines_count) for changed_lines_count in range(8)]
+    uml_file = create_uml_file(uml_model, contents[0])
+    for content in contents[1:]:
+        update_uml_file(uml_file, content)
+
+    revisions = list(UmlFileRevision.objects.filter(file=uml_file).order_by("number"))
+
+    assert [revision.number for revision in revisions] == list(range(1, 9))
+    assert [revision.number for revision in revisions if revision.is_snapshot] == [1, 4, 7]
+    assert [revision.number for revision in revisions if revision.tech_active_flag] == [8]
+    assert all(revision.tech_valid_to is not None for revision in revisions[:-1])
+    assert [revision.read_text() for revision in revisions] == contents
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("has_trailing_newline", [True, False])
+def test_revisions_of_files_over_lines_limit_are_snapshots(uml_model, monkeypatch, has_trailing_newline):
+    contents = [create_content(changed_lines_count) for changed_lines_count in range(3)]
+    if not has_trailing_newline:
+        contents = [content.rstrip("\n") for content in contents]
+    monkeypatch.setattr(settings, "UML_FILE_REVISION_DELTA_MAX_LINES", len(contents[0].splitlines()) - 1)
+    uml_file = create_uml_file(uml_model, contents[0])
+    for content in contents[1:]:
+        update_uml_file(uml_file, content)
+
+    revisions = list(UmlFileRevision.objects.filter(file=uml_file).order_by("number"))
+
+    assert all(revision.is_snapshot for revision in revisions)
+    assert [revision.read_text() for revision in revisions] == contents
+
+
+@pytest.mark.django_db
+def test_saving_same_content_does_not_add_revision(uml_model):
+    uml_file = create_uml_file(uml_model, create_content(0))
+
+    update_uml_file(uml_file, create_content(0))
+
+    assert UmlFileRevision.objects.filter(file=uml_file).count() == 1
+
+
+@pytest.mark.django_db
+def test_prune_keeps_latest_revisions_readable(uml_model, monkeypatch):
+    monkeypatch.setattr(settings, "UML_FILE_REVISION_SNAPSHOT_INTERVAL", 10)
+    contents = [create_content(changed_lines_count) for changed_lines_count in range(8)]
+    uml_file = create_uml_file(uml_model, contents[0])
+    for content in contents[1:]:
+        update_uml_file(uml_file, content)
+    UmlFileRevision.objects.filter(file=uml_file, tech_active_flag=False).update(tech_valid_to=timezone.now() - timedelta(days=100))
+
+    result = prune_revisions_batch(0, batch_size=10, retention_days=90, keep_count=3)
+
+    revisions = list(UmlFileRevision.objects.filter(file=uml_file).order_by("number"))
+    assert result.deleted_revisions_count == 5
+    assert [revision.number for revision in revisions] == [6, 7, 8]
+    assert revisions[0].is_snapshot
+    assert [revision.read_text() for revision in revisions] == contents[5:]
+    assert get_ref_count(contents[0]) == 0
+    assert get_ref_count(contents[5]) == 1
+
+
+@pytest.mark.django_db
+def test_prune_keeps_revisions_within_retention_period(uml_model):
+    uml_file = create_uml_file(uml_model, create_content(0))
+    for changed_lines_count in range(1, 5):
+        update_uml_file(uml_file, create_content(changed_lines_count))
+
+    result = prune_revisions_batch(0, batch_size=10, retention_days=90, keep_count=1)
+
+    assert result.deleted_revisions_count == 0
+    assert UmlFileRevision.objects.filter(file=uml_file).count() == 5
+
+
+@pytest.mark.django_db
+def test_blob_references_of_files_and_snapshots(uml_model):
+    first_content, second_content = create_content(0), create_content(1)
+    uml_file = create_uml_file(uml_model, first_content)
+    # Referenced by the file and its first revision
+    assert get_ref_count(first_content) == 2
+
+    update_uml_file(uml_file, second_content)
+    # Second revision is a delta - only the file references the new blob
+    assert get_ref_count(first_content) == 1
+    assert get_ref_count(second_content) == 1
+
+    UmlFile.objects.bulk_create([UmlFile(model=uml_model, filename="copy.xmi", format=UmlFile.SupportedFormat.EA_XMI, data=first_content)])
+    assert get_ref_count(first_content) == 3
+
+    uml_model.delete()
+    assert get_ref_count(first_content) == 0
+    assert get_ref_count(second_content) == 0
+    assert not UmlFileRevision.objects.exists()
@@ -0,0 +1,99 @@
+import itertools
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from umlars_app.exceptions import InputDataError
+from umlars_app.message_broker.consumer import RabbitMQConsumer
+from umlars_app.message_broker.messages import TranslationStatusMessage
+from umlars_app.models import UmlModel, UmlFile, UmlModelSummary, ProcessStatus
+
+
+@pytest.fixture
+def uml_file():
+    uml_model = UmlModel.objects.create(name="Model")
+    uml_file = UmlFile(model=uml_model, filename="model.xmi", format=UmlFile.SupportedFormat.EA_XMI, data="<xmi/>")
+    uml_file.save()
+    return uml_file
+
+
+def set_state(uml_file: UmlFile, state: ProcessStatus, last_process_id: str) -> None:
+    UmlFile.objects.filter(id=uml_file.id).update(state=state, last_process_id=last_process_id)
+
+
+def get_state(uml_file: UmlFile):
+    return UmlFile.objects.filter(id=uml_file.id).values_list("state", "last_process_id").get()
+
+
+@pytest.mark.django_db
+def test_translation_process_moves_file_forward(uml_file):
+    assert UmlFile.objects.transition_state(uml_file.id, ProcessStatus.RUNNING, "process-1") == ProcessStatus.QUEUED
+    assert UmlFile.objects.transition_state(uml_file.id, ProcessStatus.FINISHED, "process-1") == ProcessStatus.RUNNING
+    assert get_state(uml_file) == (ProcessStatus.FINISHED, "process-1")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("current_state, state", [
+    (ProcessStatus.RUNNING, ProcessStatus.RUNNING),
+    (ProcessStatus.FINISHED, ProcessStatus.RUNNING),
+    (ProcessStatus.FINISHED, ProcessStatus.FINISHED),
+    (ProcessStatus.FAILED, ProcessStatus.FINISHED),
+])
+def test_duplicate_or_stale_status_of_same_process_is_rejected(uml_file, current_state, state):
+    set_state(uml_file, current_state, "process-1")
+
+    assert not UmlFile.objects.get(id=uml_file.id).can_transition_to(state, "process-1")
+    assert UmlFile.objects.transition_state(uml_file.id, state, "process-1") is None
+    assert get_state(uml_file) == (current_state, "process-1")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("current_state", [ProcessStatus.RUNNING, ProcessStatus.FINISHED, ProcessStatus.FAILED])
+def test_new_process_restarts_translation(uml_file, current_state):
+    set_state(uml_file, current_state, "process-1")
+
+    assert UmlFile.objects.get(id=uml_file.id).can_transition_to(ProcessStatus.RUNNING, "process-2")
+    assert UmlFile.objects.transition_state(uml_file.id, ProcessStatus.RUNNING, "process-2") == current_state
+    assert get_state(uml_file) == (ProcessStatus.RUNNING, "process-2")
+
+
+@pytest.mark.django_db
+def test_status_without_process_is_always_applied(uml_file):
+    set_state(uml_file, ProcessStatus.FINISHED, "process-1")
+
+    assert UmlFile.objects.transition_state(uml_file.id, ProcessStatus.RUNNING) == ProcessStatus.FINISHED
+    assert get_state(uml_file) == (ProcessStatus.RUNNING, "process-1")
+
+
+@pytest.mark.django_db
+def test_guarded_update_agrees_with_can_transition_to(uml_file):
+    for current_state, state, process_id in itertools.product(ProcessStatus, ProcessStatus, ["process-1", "process-2"]):
+        set_state(uml_file, current_state, "process-1")
+        can_transition = UmlFile.objects.get(id=uml_file.id).can_transition_to(state, process_id)
+
+        previous_state = UmlFile.objects.transition_state(uml_file.id, state, process_id)
+
+        assert previous_state == (current_state if can_transition else None), (current_state, state, process_id)
+
+
+@pytest.mark.django_db
+def test_status_message_is_applied_without_selecting_file(uml_file):
+    UmlModelSummary.objects.refresh_for_models([uml_file.model_id])
+    consumer = RabbitMQConsumer("statuses", "localhost")
+    with CaptureQueriesContext(connection) as captured_queries:
+        consumer.process_message(TranslationStatusMessage(uml_file.id, ProcessStatus.RUNNING, "process-1"))
+
+    assert get_state(uml_file) == (ProcessStatus.RUNNING, "process-1")
+    assert UmlModelSummary.objects.get(model_id=uml_file.model_id).running_files_count == 1
+    assert not [query["sql"] for query in captured_queries if query["sql"].startswith("SELECT")]
+
+
+@pytest.mark.django_db
+def test_status_of_missing_file_is_rejected(uml_file):
+    consumer = RabbitMQConsumer("statuses", "localhost")
+
+    with pytest.raises(InputDataError):
+        consumer.process_message(TranslationStatusMessage(uml_file.id + 1, ProcessStatus.RUNNING, "process-1"))
+    with pytest.raises(InputDataError):
+        consumer.process_messages([TranslationStatusMessage(uml_file.id + 1, ProcessStatus.RUNNING, "process-1")])
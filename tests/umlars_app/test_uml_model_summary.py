@@ -0,0 +1,93 @@
+import pytest
+
+from umlars_app.message_broker.consumer import RabbitMQConsumer
+from umlars_app.message_broker.messages import TranslationStatusMessage
+from umlars_app.models import UmlModel, UmlFile, UmlModelSummary, ProcessStatus
+
+
+SUMMARY_FIELDS = ["files_count", *UmlModelSummary.STATE_COUNT_FIELDS.values(), "status"]
+
+
+@pytest.fixture
+def uml_files():
+    uml_model = UmlModel.objects.create(name="Model")
+    uml_files = [UmlFile(model=uml_model, filename=f"file-{index}.xmi", format=UmlFile.SupportedFormat.EA_XMI, data=f"<xmi>{index}</xmi>") for index in range(3)]
+    for uml_file in uml_files:
+        uml_file.save()
+    return uml_files
+
+
+def get_summary_values(model_id: int) -> dict:
+    return UmlModelSummary.objects.filter(model_id=model_id).values(*SUMMARY_FIELDS).get()
+
+
+def assert_summary_is_consistent(model_id: int) -> dict:
+    summary_values = get_summary_values(model_id)
+    assert summary_values["status"] == UmlModelSummary(**summary_values).derive_status()
+
+    UmlModelSummary.objects.refresh_for_models([model_id])
+    assert summary_values == get_summary_values(model_id)
+    return summary_values
+
+
+# Statuses of the files 0 and 1 - the file 2 stays queued. Includes a duplicate, statuses arriving
+# after the later ones of the same process, a restart by a new process and a status without the process.
+STATUS_MESSAGES = [
+    (0, ProcessStatus.RUNNING, "process-1"),
+    (1, ProcessStatus.RUNNING, "process-1"),
+    (0, ProcessStatus.RUNNING, "process-1"),
+    (1, ProcessStatus.FAILED, "process-1"),
+    (0, ProcessStatus.FINISHED, "process-1"),
+    (0, ProcessStatus.RUNNING, "process-1"),
+    (1, ProcessStatus.RUNNING, "process-1"),
+    (1, ProcessStatus.QUEUED, "process-2"),
+    (1, ProcessStatus.RUNNING, "process-2"),
+    (1, ProcessStatus.PARTIAL_SUCCESS, "process-2"),
+    (0, ProcessStatus.FAILED, None),
+]
+
+
+def create_status_message(uml_files, file_index: int, state: ProcessStatus, process_id) -> TranslationStatusMessage:
+    return TranslationStatusMessage(uml_files[file_index].id, state, process_id)
+
+
+@pytest.mark.django_db
+def test_summary_follows_status_messages(uml_files):
+    model_id = uml_files[0].model_id
+    UmlModelSummary.objects.refresh_for_models([model_id])
+    consumer = RabbitMQConsumer("statuses", "localhost")
+
+    for file_index, state, process_id in STATUS_MESSAGES:
+        consumer.process_message(create_status_message(uml_files, file_index, state, process_id))
+        assert_summary_is_consistent(model_id)
+
+    assert get_summary_values(model_id) == {
+        "files_count": 3, "queued_files_count": 1, "running_files_count": 0, "finished_files_count": 0,
+        "partial_success_files_count": 1, "failed_files_count": 1, "status": ProcessStatus.QUEUED,
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("batch_size", [2, 4, len(STATUS_MESSAGES)])
+def test_summary_follows_batches_of_status_messages(uml_files, batch_size):
+    model_id = uml_files[0].model_id
+    UmlModelSummary.objects.refresh_for_models([model_id])
+    consumer = RabbitMQConsumer("statuses", "localhost")
+
+    for batch_start in range(0, len(STATUS_MESSAGES), batch_size):
+        batch = STATUS_MESSAGES[batch_start:batch_start + batch_size]
+        consumer.process_messages([create_status_message(uml_files, *status_message) for status_message in batch])
+        assert_summary_is_consistent(model_id)
+
+    assert get_summary_values(model_id)["status"] == ProcessStatus.QUEUED
+
+
+@pytest.mark.django_db
+def test_summary_of_model_without_summary_is_calculated(uml_files):
+    model_id = uml_files[0].model_id
+    consumer = RabbitMQConsumer("statuses", "localhost")
+
+    consumer.process_message(create_status_message(uml_files, 0, ProcessStatus.RUNNING, "process-1"))
+
+    summary_values = assert_summary_is_consistent(model_id)
+    assert (summary_values["running_files_count"], summary_values["queued_files_count"]) == (1, 2)